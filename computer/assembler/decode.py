@@ -0,0 +1,132 @@
+"""
+a table decoding every 12-bit word into its instruction and operands.
+
+the table is built from `listings.instructions` and cached on disk, keyed on a hash of the listings,
+so that decoding a word is a single list index.
+"""
+
+import hashlib
+import pickle
+from pathlib import Path
+from typing import NamedTuple
+
+from computer.assembler.instruction import Instruction, GP_NAMES, SCRATCH_NAMES
+from computer.assembler.listings import instructions
+
+WORD_COUNT = 1 << 12
+
+CACHE_DIR = Path(__file__).parent / "__pycache__"
+
+
+class Decoded(NamedTuple):
+    """
+    a decoded word
+    """
+
+    instruction: Instruction
+    operands: tuple[int, ...]
+
+
+def listings_hash() -> str:
+    """
+    hashes the instruction listings, so that cached tables are rebuilt when they change
+    :return: the hex digest of the hash
+    """
+    return hashlib.sha256(repr(instructions).encode()).hexdigest()[:16]
+
+
+def build_table() -> list[int]:
+    """
+    builds the decode table as indices into `instructions`
+    :return: the index of the instruction encoded by each word
+    """
+    table = [-1] * WORD_COUNT
+    for index, inst in enumerate(instructions):
+        base = inst.opcode << (12 - inst.opcode_width)
+        for low in range(1 << (12 - inst.opcode_width)):
+            word = base | low
+            if table[word] != -1:
+                raise ValueError(f"encoding {word:04o} is claimed by both {instructions[table[word]]} and {inst}")
+            table[word] = index
+    if -1 in table:
+        raise ValueError(f"word {table.index(-1):04o} does not encode any instruction")
+    return table
+
+
+def load_table() -> list[Decoded]:
+    """
+    loads the decode table from the cache, building and caching it if necessary
+    :return: the table
+    """
+    path = CACHE_DIR / f"decode-{listings_hash()}.pickle"
+    try:
+        with open(path, "rb") as f:
+            indices, operands = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+        indices = build_table()
+        operands = [
+            tuple(field.get(word) for field in instructions[index].fields)
+            for word, index in enumerate(indices)
+        ]
+        try:
+            CACHE_DIR.mkdir(exist_ok=True)
+            with open(path, "wb") as f:
+                pickle.dump((indices, operands), f)
+        except OSError:
+            pass
+    return [Decoded(instructions[index], args) for index, args in zip(indices, operands)]
+
+
+DECODE_TABLE = load_table()
+
+
+def decode(word: int) -> Decoded:
+    """
+    decodes a word
+    :param word: the word to decode
+    :return: the instruction and its operands
+    """
+    return DECODE_TABLE[word]
+
+
+def sign_extend(n: int, width: int) -> int:
+    """
+    sign extends the low `width` bits of an integer, as for the offsets of relative jumps and signed constants
+    :param n: the integer to sign extend
+    :param width: the width of the field to sign extend from
+    :return: the sign extended value
+    """
+    n &= (1 << width) - 1
+    if n >= 1 << (width - 1):
+        n -= 1 << width
+    return n
+
+
+def show_operand(field_type: str, value: int) -> str:
+    """
+    formats an operand as the assembler would parse it
+    :param field_type: the type of the operand
+    :param value: the value of the operand
+    :return: the formatted operand
+    """
+    match field_type:
+        case "r32":
+            return GP_NAMES[value]
+        case "s32":
+            return SCRATCH_NAMES[value]
+        case "p32":
+            return "*" + GP_NAMES[value]
+        case "ps32":
+            return "*" + SCRATCH_NAMES[value]
+        case _:
+            return str(value)
+
+
+def disassemble(word: int) -> str:
+    """
+    disassembles a word into a line of assembly
+    :param word: the word to disassemble
+    :return: the line of assembly
+    """
+    inst, operands = DECODE_TABLE[word]
+    return " ".join([inst.name] + [show_operand(t, v) for t, v in zip(inst.field_types, operands)])
@@ -0,0 +1,41 @@
+from argparse import ArgumentParser
+
+from computer.assembler.decode import disassemble, decode, sign_extend, WORD_COUNT
+
+RELATIVE_JUMPS = {"jlt", "jle", "jeq", "jge", "jgt", "jne", "jmp"}
+
+
+def target(address: int, word: int) -> str:
+    """
+    describes where a relative jump goes to
+    :param address: the address of the jump
+    :param word: the jump instruction
+    :return: a comment naming the target address, or nothing for other instructions
+    """
+    inst, operands = decode(word)
+    if inst.name not in RELATIVE_JUMPS:
+        return ""
+    return f"  # -> {(address + 1 + sign_extend(operands[0], 7)) % WORD_COUNT:04o}"
+
+
+def main():
+    parser = ArgumentParser(prog="disassembler", description="convert machine code back into assembly")
+    parser.add_argument("file", nargs="?", help="octal machine code, as printed by the assembler")
+    parser.add_argument("--all", action="store_true", help="disassemble the whole opcode space")
+    args = parser.parse_args()
+
+    if args.all:
+        words = range(WORD_COUNT)
+    elif args.file is not None:
+        with open(args.file) as f:
+            words = [int(line.split()[0], 8) for line in f if line.strip()]
+    else:
+        parser.error("please provide a file!")
+
+    for address, word in enumerate(words):
+        comment = "" if args.all else target(address, word)
+        print(f"{address:04o}  {word:04o}  {disassemble(word)}{comment}")
+
+
+if __name__ == "__main__":
+    main()
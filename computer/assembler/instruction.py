@@ -26,7 +26,7 @@ GP_REGISTERS = dict(
     a2=2,
     t0=3,
     t1=4,
-    s0=4,
+    s0=5,
     s1=6,
     s2=7,
 )
@@ -42,6 +42,10 @@ SCRATCH_REGISTERS = dict(
     y3=7
 )
 
+# register names, indexed by register id
+GP_NAMES = list(GP_REGISTERS)
+SCRATCH_NAMES = list(SCRATCH_REGISTERS)
+
 
 def parse_imm(s: str) -> tuple[str, int]:
     return "imm", int(s)
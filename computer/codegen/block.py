@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 
-from computer.codegen.command import Command
+from computer.codegen.command import DataGet, DataTarget
 from computer.codegen.coordinates import Coordinates
 from computer.codegen.execute import StoreLocation
 
@@ -21,10 +21,10 @@ class ItemSlot(StoreLocation):
             scale = args[0]
         else:
             scale = 1
-        self.block.store_location(f"Items[{self.slot}].Count", "byte", scale)
+        return self.block.store_location(f"Items[{self.slot}].Count", "byte", scale)
 
-    def get(self) -> Command:
-        return Command(f"data get block {self.block.position}")
+    def get(self) -> DataGet:
+        return DataGet(self.block.target())
 
 
 @dataclass
@@ -35,14 +35,17 @@ class Block(StoreLocation):
 
     position: Coordinates
 
-    def store_location(self, *args) -> str:
+    def target(self) -> DataTarget:
+        return DataTarget("block", self.position)
+
+    def store_location(self, *args) -> tuple[DataTarget, str, str, float]:
         match args:
             case path, mc_type, scale:
-                return f"block {self.position} {path} {mc_type} {scale}"
+                return self.target(), path, mc_type, scale
             case path, mc_type:
-                return f"block {self.position} {path} {mc_type} 1"
+                return self.target(), path, mc_type, 1
             case (path,):
-                return f"block {self.position} {path} int 1"
+                return self.target(), path, "int", 1
             case _:
                 raise ValueError
 
@@ -0,0 +1,96 @@
+"""
+a cache of generated output, keyed on hashes of its content, so that a build only redoes the work for what changed.
+
+the blocks of each group are kept, keyed on its commands and position, and reused while they stay the same.
+a schematic is only written again once its blocks change.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from computer.codegen.coordinates import Coordinates
+from computer.codegen.output import BlockBuffer
+from computer.codegen.session import settings
+
+if TYPE_CHECKING:
+    from computer.codegen.chain_context import ChainGroup
+
+# the directory the cache is kept in
+DIRECTORY = Path("generated/cache")
+
+
+def group_hash(group: ChainGroup, pos: Coordinates) -> str:
+    """
+    hashes what the schematic assembly of a group is made from: the commands of its chains, lowering them first,
+    and where it is placed
+    :param group: the group
+    :param pos: the position of the group
+    :return: the hash
+    """
+    digest = hashlib.sha256(f"{pos.x} {pos.y} {pos.z}\n".encode())
+    for chain_context in group.chain_contexts:
+        chain_context.lower()
+        digest.update(f"chain {chain_context.only_chain}\n".encode())
+        for cmd in chain_context.contents:
+            digest.update(cmd.command.encode() + b"\n")
+    return digest.hexdigest()
+
+
+def write_group(file, group: ChainGroup, pos: Coordinates) -> bool:
+    """
+    writes a group out to a schematic assembly file or a block buffer, as `ChainGroup.write_out` does,
+    reusing the blocks written for it before if its commands and position are the same
+    :param file: the file or buffer to write to
+    :param group: the group
+    :param pos: the position of the group
+    :return: whether the blocks were reused
+    """
+    if not settings().cache:
+        group.write_out(file, pos)
+        return False
+
+    name = group.name or "group"
+    path = DIRECTORY / f"{name}.{group_hash(group, pos)}.blocks"
+    if path.exists():
+        try:
+            blocks = BlockBuffer.from_bytes(path.read_bytes())
+        except ValueError:
+            # kept by a version that wrote blocks in another form, so it is written again
+            pass
+        else:
+            blocks.write_to(file)
+            return True
+
+    blocks = BlockBuffer()
+    group.write_out(blocks, pos)
+    DIRECTORY.mkdir(parents=True, exist_ok=True)
+    # only the blocks of the latest version of each group are kept
+    for stale in DIRECTORY.glob(f"{name}.*.blocks"):
+        stale.unlink()
+    path.write_bytes(blocks.to_bytes())
+    blocks.write_to(file)
+    return False
+
+
+def up_to_date(dst: str | Path, key: str) -> bool:
+    """
+    checks if a file was made from content with a hash, as recorded by `record`
+    :param dst: the file
+    :param key: the hash of the content it would be made from
+    :return: whether it is up to date
+    """
+    stamp = DIRECTORY / f"{Path(dst).name}.sha256"
+    return settings().cache and Path(dst).exists() and stamp.exists() and stamp.read_text() == key
+
+
+def record(dst: str | Path, key: str) -> None:
+    """
+    records that a file was made from content with a hash
+    :param dst: the file
+    :param key: the hash of the content it was made from
+    """
+    DIRECTORY.mkdir(parents=True, exist_ok=True)
+    (DIRECTORY / f"{Path(dst).name}.sha256").write_text(key)
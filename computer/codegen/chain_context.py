@@ -1,17 +1,22 @@
-from typing import Optional, Callable
+from contextlib import contextmanager
+from typing import Optional, Callable, Iterator
 
-from computer.codegen.command import Command
+from computer.codegen.command import Command, Temporary, Deferred
+from computer.codegen.optimize import optimize as optimize_chain
 from computer.codegen.output import chain
 from computer.codegen.coordinates import Coordinates
+from computer.codegen.session import current
 
-"""
-A LIFO stack of all the chain contexts.
 
-The top element is one that is used to put new commands in.
-To temporarily push a ChainContext to this stack, use a context manager.
-The ChainContext will be removed from the stack when the context manager ends.
-"""
-CHAIN_CONTEXT_STACK: list["ChainContext"] = []
+def chain_context_stack() -> list["ChainContext"]:
+    """
+    A LIFO stack of all the chain contexts, kept in the current build session.
+
+    The top element is one that is used to put new commands in.
+    To temporarily push a ChainContext to this stack, use a context manager.
+    The ChainContext will be removed from the stack when the context manager ends.
+    """
+    return current().chain_context_stack
 
 
 class ChainContext:
@@ -22,25 +27,82 @@ class ChainContext:
 
     contents: list[Command]
     only_chain: bool
+    # a name for the chain, used to attribute commands to it when profiling
+    name: Optional[str]
+    # the part of the chain currently being generated
+    section: Optional[str]
+    # whether the commands run in order as a chain, and so can be optimized
+    optimize: bool
+    # whether the context only collects commands to be added to another context, as `Run` and `capture` do
+    transient: bool
+    # whether the commands are final, which is `None` while they are being lowered
+    lowered: Optional[bool]
+    # the position of the start of the chain, once its group has been placed
+    pos: Optional[Coordinates]
 
-    def __init__(self, only_chain: bool = False):
+    def __init__(
+            self,
+            only_chain: bool = False,
+            name: Optional[str] = None,
+            optimize: bool = True,
+            transient: bool = False,
+    ):
         self.contents = []
         self.only_chain = only_chain
+        self.name = name
+        self.section = None
+        self.optimize = optimize
+        self.transient = transient
+        self.lowered = False
+        self.pos = None
 
     def __enter__(self):
-        CHAIN_CONTEXT_STACK.append(self)
+        chain_context_stack().append(self)
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        CHAIN_CONTEXT_STACK.pop()
+        chain_context_stack().pop()
+
+    def lower(self) -> None:
+        """
+        turns the commands of the chain into the ones that will be written out:
+        pseudo-commands are expanded, the chain is optimized and its temporaries are named.
+        the lowered commands replace the contents of the chain, and lowering a chain again does nothing.
+        """
+        from computer.codegen.variable import allocate_temporaries
+
+        if self.lowered:
+            return
+        if self.lowered is None:
+            raise ValueError(f"chain {self.name} depends on its own length")
+        self.lowered = None
+
+        contents = []
+        for cmd in self.contents:
+            if isinstance(cmd, Deferred):
+                with self:
+                    expanded = capture()(cmd.expand(self))
+                for expanded_command in expanded:
+                    if expanded_command.origin is None:
+                        expanded_command.origin = cmd.origin
+                contents += expanded
+            else:
+                contents.append(cmd)
+        self.contents = contents
+
+        if self.optimize:
+            self.contents = optimize_chain(self.contents)
+        allocate_temporaries(self)
+        self.lowered = True
 
     def write(self, file, pos: Coordinates, **kwargs) -> None:
         """
-        writes schematic assembly for the chain out to a file.
+        writes schematic assembly for the chain out to a file, lowering it first.
         keyword arguments are passed on to `chain`.
         :param file: the file to write to
         :param pos: the position at which to start the chain
         """
+        self.lower()
         chain(file, pos, self.contents, only_chain=self.only_chain, **kwargs)
 
     def add(self, the_command: Command) -> None:
@@ -48,13 +110,33 @@ class ChainContext:
         adds a command to the chain
         :param the_command: the command to add
         """
+        if self.lowered is not False:
+            raise ValueError(f"command added to chain {self.name} after it was lowered: {the_command!r}")
+        if the_command.origin is None and self.name is not None:
+            the_command.origin = self.name if self.section is None else f"{self.name}:{self.section}"
+        if not self.transient:
+            for score in the_command.scores():
+                if isinstance(score, Temporary) and score.home is not self:
+                    if score.named and not score.pinned:
+                        raise ValueError(f"temporary {score.player} is used after its chain context was written out")
+                    score.pinned = True
         self.contents.append(the_command)
 
 
-"""
-The context used for commands to be run at initialize-time.
-"""
-INIT_CONTEXT: Optional[ChainContext] = ChainContext()
+def init_context() -> ChainContext:
+    """
+    :return: the context used for commands to be run at initialize-time, in the current build session
+    """
+    return current().init_context
+
+
+def __getattr__(name: str):
+    # `INIT_CONTEXT` and `CHAIN_CONTEXT_STACK` are those of the session current when they are looked up
+    if name == "INIT_CONTEXT":
+        return init_context()
+    if name == "CHAIN_CONTEXT_STACK":
+        return chain_context_stack()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def command(cmd: Command | str) -> None:
@@ -64,8 +146,30 @@ def command(cmd: Command | str) -> None:
     """
     if isinstance(cmd, str):
         cmd = Command(cmd)
-    # CHAIN_CONTEXT_STACK[-1].add(Command("say DEBUG: " + cmd.command))
-    CHAIN_CONTEXT_STACK[-1].add(cmd)
+    # chain_context_stack()[-1].add(Command("say DEBUG: " + cmd.command))
+    chain_context_stack()[-1].add(cmd)
+
+
+@contextmanager
+def section(name: str) -> Iterator[None]:
+    """
+    attributes the commands generated within to a named section of the innermost named chain context
+    :param name: the name of the section
+    """
+    ctx = next(ctx for ctx in reversed(chain_context_stack()) if ctx.name is not None)
+    previous = ctx.section
+    ctx.section = name
+    try:
+        yield
+    finally:
+        ctx.section = previous
+
+
+def home_context() -> Optional[ChainContext]:
+    """
+    :return: the innermost chain context that commands are being generated for, ignoring transient contexts
+    """
+    return next((ctx for ctx in reversed(chain_context_stack()) if not ctx.transient), None)
 
 
 def init_command(cmd: Command) -> None:
@@ -73,7 +177,7 @@ def init_command(cmd: Command) -> None:
     runs a command at initialize-time
     :param cmd: the command to run
     """
-    INIT_CONTEXT.add(cmd)
+    init_context().add(cmd)
 
 
 class ChainGroup:
@@ -83,20 +187,26 @@ class ChainGroup:
 
     # a list of chain contexts owned by this group
     chain_contexts: list[ChainContext]
+    # a name for the group, prefixed to the names of its chain contexts
+    name: Optional[str]
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, name: Optional[str] = None, **kwargs):
         self.chain_contexts = []
+        self.name = name
         self.args = args
         self.kwargs = kwargs
 
-    def new(self, *args, **kwargs) -> ChainContext:
+    def new(self, *args, name: Optional[str] = None, **kwargs) -> ChainContext:
         """
         Creates a new chain context in the group, returning it.
         :param args: positional arguments to pass on to ChainContext
+        :param name: the name of the chain context within the group
         :param kwargs: keyword arguments to pass on to ChainContext
         :return: the newly-created context
         """
-        chain_context = ChainContext(*(self.args + args), **(self.kwargs | kwargs))
+        if name is not None and self.name is not None:
+            name = f"{self.name}/{name}"
+        chain_context = ChainContext(*(self.args + args), name=name, **(self.kwargs | kwargs))
         self.chain_contexts.append(chain_context)
         return chain_context
 
@@ -107,6 +217,21 @@ class ChainGroup:
         """
         self.chain_contexts.append(ctx)
 
+    def place(self, start_pos: Coordinates) -> None:
+        """
+        records the position of each chain context in the group, as `write_out` lays them out
+        :param start_pos: the world location to start from
+        """
+        for index, chain_context in enumerate(self.chain_contexts):
+            chain_context.pos = start_pos + Coordinates(0, 0, index)
+
+    def lower(self) -> None:
+        """
+        lowers every chain context in the group, see `ChainContext.lower`
+        """
+        for chain_context in self.chain_contexts:
+            chain_context.lower()
+
     def write_out(self, file, start_pos: Coordinates) -> None:
         """
         Writes the chain context out to a schematic assembly file at the given location
@@ -127,7 +252,7 @@ def capture[T]() -> Callable[[T], list[Command]]:
     ```
     :return: a function to be called on the expression
     """
-    ctx = ChainContext()
+    ctx = ChainContext(transient=True)
     ctx.__enter__()
 
     def inner(_: T) -> list[Command]:
@@ -1,9 +1,461 @@
-from dataclasses import dataclass
+"""
+commands, as a tree of typed nodes that later stages can inspect and rewrite.
+
+nodes are only rendered to the text of the command when it is needed, which is normally when it is written out.
+commands that don't have a node type of their own can be made from their text with `Command`.
+"""
+
+from __future__ import annotations
+
+from typing import Iterator, NamedTuple, Optional
+
+from computer.codegen.coordinates import Coordinates
 
 
-@dataclass
 class Command:
     """
     a command
     """
-    command: str
+    __slots__ = "_text", "origin"
+
+    def __init__(self, command: Optional[str] = None, origin: Optional[str] = None):
+        """
+        :param command: the text of the command, or None for subclasses, which render it when needed
+        :param origin: the name of the chain context, and section within it, that the command was generated for
+        """
+        self._text = command
+        self.origin = origin
+
+    @property
+    def command(self) -> str:
+        """
+        the text of the command, which is kept once the names of its temporaries are final
+        """
+        if self._text is not None:
+            return self._text
+        text = self.render()
+        if all(score.named for score in self.scores() if isinstance(score, Temporary)):
+            self._text = text
+        return text
+
+    def render(self) -> str:
+        """
+        renders the command to text
+        :return: the text of the command
+        """
+        raise NotImplementedError
+
+    def scores(self) -> Iterator[Score]:
+        """
+        :return: the scores the command refers to
+        """
+        return iter(())
+
+    def __repr__(self):
+        # rendered without keeping the text, which could hold the names of temporaries from before they are allocated
+        return f"{type(self).__name__}({self._text if self._text is not None else self.render()!r})"
+
+
+class Deferred(Command):
+    """
+    a pseudo-command, which is replaced by the commands it expands to when its chain context is written out,
+    for commands that depend on other chains being finished
+    """
+    __slots__ = ()
+
+    def expand(self, ctx) -> None:
+        """
+        generates the commands that replace the pseudo-command, with `command`
+        :param ctx: the chain context being written out
+        """
+        raise NotImplementedError
+
+    def render(self) -> str:
+        raise ValueError(f"{type(self).__name__} must be expanded before it is written out")
+
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+
+class Fold(Command):
+    """
+    a pseudo-command that moves the rest of its chain to a new row, two blocks south of the one before, which the chain
+    reaches by turning back along the row between them. it takes up no block of its own, and can only be in the last
+    chain of a group, since the rows after it take the place of the chains that would come after
+    """
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__("")
+
+
+class Score:
+    """
+    a score on the scoreboard
+    """
+    __slots__ = "player", "objective"
+
+    def __init__(self, player: str, objective: str):
+        self.player = player
+        self.objective = objective
+
+    def render(self) -> str:
+        return f"{self.player} {self.objective}"
+
+    def __eq__(self, other):
+        # a constant is the same entry as a plain score of the same name, while a temporary is only equal to itself
+        return isinstance(other, Score) and not isinstance(other, Temporary) \
+            and self.player == other.player and self.objective == other.objective
+
+    def __hash__(self):
+        return hash((self.player, self.objective))
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.player!r}, {self.objective!r})"
+
+
+class Constant(Score):
+    """
+    a score that holds a constant, named after its value, which is set by the init chain and never changed
+    """
+    __slots__ = "value",
+
+    def __init__(self, value: int, objective: str):
+        """
+        :param value: the constant
+        :param objective: the objective of the score
+        """
+        super().__init__(str(value), objective)
+        self.value = value
+
+
+class Temporary(Score):
+    """
+    a score for a temporary value, whose player is only named when the chain it is used in is written out,
+    so that it can share a name with other temporaries that are never live at the same time
+    """
+    __slots__ = "home", "pinned", "named"
+
+    def __init__(self, player: str, objective: str, home: Optional[object]):
+        """
+        :param player: the name to base the player's name on
+        :param objective: the objective of the score
+        :param home: the chain context the temporary is used in
+        """
+        super().__init__(player, objective)
+        self.home = home
+        # whether the temporary is used outside of its chain context, and so needs a name of its own
+        self.pinned = home is None
+        self.named = False
+
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
+
+
+class ScoreSet(Command):
+    __slots__ = "target", "value"
+
+    def __init__(self, target: Score, value: int):
+        super().__init__()
+        self.target = target
+        self.value = value
+
+    def render(self) -> str:
+        return f"scoreboard players set {self.target.render()} {self.value}"
+
+    def scores(self) -> Iterator[Score]:
+        yield self.target
+
+
+class ScoreAdd(Command):
+    """
+    adds to a score, rendered as `remove` if the amount is negative
+    """
+    __slots__ = "target", "amount"
+
+    def __init__(self, target: Score, amount: int):
+        super().__init__()
+        self.target = target
+        self.amount = amount
+
+    def render(self) -> str:
+        if self.amount < 0:
+            return f"scoreboard players remove {self.target.render()} {-self.amount}"
+        return f"scoreboard players add {self.target.render()} {self.amount}"
+
+    def scores(self) -> Iterator[Score]:
+        yield self.target
+
+
+class ScoreReset(Command):
+    __slots__ = "target",
+
+    def __init__(self, target: Score):
+        super().__init__()
+        self.target = target
+
+    def render(self) -> str:
+        return f"scoreboard players reset {self.target.render()}"
+
+    def scores(self) -> Iterator[Score]:
+        yield self.target
+
+
+class ScoreGet(Command):
+    __slots__ = "target",
+
+    def __init__(self, target: Score):
+        super().__init__()
+        self.target = target
+
+    def render(self) -> str:
+        return f"scoreboard players get {self.target.render()}"
+
+    def scores(self) -> Iterator[Score]:
+        yield self.target
+
+
+class ScoreOperation(Command):
+    __slots__ = "target", "operator", "source"
+
+    def __init__(self, target: Score, operator: str, source: Score):
+        super().__init__()
+        self.target = target
+        self.operator = operator
+        self.source = source
+
+    def render(self) -> str:
+        return f"scoreboard players operation {self.target.render()} {self.operator} {self.source.render()}"
+
+    def scores(self) -> Iterator[Score]:
+        yield self.target
+        yield self.source
+
+
+class DataTarget(NamedTuple):
+    """
+    a block entity or entity whose nbt is accessed by `data` and `execute store`
+    """
+    # `block` or `entity`
+    kind: str
+    # the position of the block, or a selector for the entity
+    target: Coordinates | str
+
+    def render(self) -> str:
+        return f"{self.kind} {self.target}"
+
+
+class DataGet(Command):
+    __slots__ = "source", "path", "scale"
+
+    def __init__(self, source: DataTarget, path: Optional[str] = None, scale: Optional[float] = None):
+        super().__init__()
+        self.source = source
+        self.path = path
+        self.scale = scale
+
+    def render(self) -> str:
+        parts = ["data get", self.source.render()]
+        if self.path is not None:
+            parts.append(self.path)
+            if self.scale is not None:
+                parts.append(str(self.scale))
+        return " ".join(parts)
+
+
+class DataModify(Command):
+    """
+    sets an nbt path to a value, with `data modify ... set value`
+    """
+    __slots__ = "target", "path", "value"
+
+    def __init__(self, target: DataTarget, path: str, value: str | int):
+        super().__init__()
+        self.target = target
+        self.path = path
+        self.value = value
+
+    def render(self) -> str:
+        return f"data modify {self.target.render()} {self.path} set value {self.value}"
+
+
+class Clone(Command):
+    __slots__ = "begin", "end", "destination", "mode"
+
+    def __init__(self, begin: Coordinates, end: Coordinates, destination: Coordinates, mode: Optional[str] = None):
+        super().__init__()
+        self.begin = begin
+        self.end = end
+        self.destination = destination
+        self.mode = mode
+
+    def render(self) -> str:
+        text = f"clone {self.begin} {self.end} {self.destination}"
+        return text if self.mode is None else f"{text} {self.mode}"
+
+
+class Fill(Command):
+    __slots__ = "begin", "end", "block"
+
+    def __init__(self, begin: Coordinates | str, end: Coordinates | str, block: str):
+        super().__init__()
+        self.begin = begin
+        self.end = end
+        self.block = block
+
+    def render(self) -> str:
+        return f"fill {self.begin} {self.end} {self.block}"
+
+
+class Teleport(Command):
+    __slots__ = "selector", "position"
+
+    def __init__(self, selector: str, position: str):
+        """
+        :param selector: the entity to teleport
+        :param position: the position to teleport to, as text since it may have a fractional part
+        """
+        super().__init__()
+        self.selector = selector
+        self.position = position
+
+    def render(self) -> str:
+        return f"tp {self.selector} {self.position}"
+
+
+class Say(Command):
+    __slots__ = "message",
+
+    def __init__(self, message: str):
+        super().__init__()
+        self.message = message
+
+    def render(self) -> str:
+        return f"say {self.message}"
+
+
+class FunctionCall(Command):
+    __slots__ = "function",
+
+    def __init__(self, function: str):
+        """
+        :param function: the name of the function, including its namespace
+        """
+        super().__init__()
+        self.function = function
+
+    def render(self) -> str:
+        return f"function {self.function}"
+
+
+class ScoreCompare(NamedTuple):
+    """
+    tests a comparison between two scores
+    """
+    left: Score
+    operator: str
+    right: Score
+
+    def render(self) -> str:
+        return f"score {self.left.render()} {self.operator} {self.right.render()}"
+
+
+class ScoreMatches(NamedTuple):
+    """
+    tests whether a score is in a range
+    """
+    score: Score
+    # the range, e.g. `..5`
+    range: str
+
+    def render(self) -> str:
+        return f"score {self.score.render()} matches {self.range}"
+
+
+class EntityExists(NamedTuple):
+    """
+    tests whether an entity exists
+    """
+    selector: str
+
+    def render(self) -> str:
+        return f"entity {self.selector}"
+
+
+# the tests supported by `execute if` and `execute unless`
+Test = ScoreCompare | ScoreMatches | EntityExists
+
+
+class If(NamedTuple):
+    """
+    the `if` and `unless` subcommands of `execute`
+    """
+    test: Test
+    negated: bool = False
+
+    def render(self) -> str:
+        return ("unless " if self.negated else "if ") + self.test.render()
+
+
+class At(NamedTuple):
+    selector: str
+
+    def render(self) -> str:
+        return f"at {self.selector}"
+
+
+class As(NamedTuple):
+    selector: str
+
+    def render(self) -> str:
+        return f"as {self.selector}"
+
+
+class Store(NamedTuple):
+    """
+    the `store` subcommand of `execute`
+    """
+    # `result` or `success`
+    kind: str
+    # a score, or nbt given as the data target, path, type and scale
+    target: Score | tuple[DataTarget, str, str, float]
+
+    def render(self) -> str:
+        if isinstance(self.target, Score):
+            return f"store {self.kind} score {self.target.render()}"
+        data, path, mc_type, scale = self.target
+        return f"store {self.kind} {data.render()} {path} {mc_type} {scale}"
+
+
+Subcommand = If | At | As | Store
+
+
+class ExecuteCommand(Command):
+    """
+    an `execute` command, as a series of subcommands and the command to run, if any
+    """
+    __slots__ = "subcommands", "run"
+
+    def __init__(self, subcommands: tuple[Subcommand, ...], run: Optional[Command] = None):
+        super().__init__()
+        self.subcommands = subcommands
+        self.run = run
+
+    def render(self) -> str:
+        parts = ["execute", *(subcommand.render() for subcommand in self.subcommands)]
+        if self.run is not None:
+            parts += ["run", self.run.command]
+        return " ".join(parts)
+
+    def scores(self) -> Iterator[Score]:
+        for subcommand in self.subcommands:
+            match subcommand:
+                case If(test=ScoreCompare(left, _, right)):
+                    yield left
+                    yield right
+                case If(test=ScoreMatches(score, _)):
+                    yield score
+                case Store(target=Score() as score):
+                    yield score
+        if self.run is not None:
+            yield from self.run.scores()
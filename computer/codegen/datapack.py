@@ -0,0 +1,217 @@
+"""
+a backend that writes chains out as the functions of a datapack, instead of as command blocks.
+
+each chain context becomes a function named after it, and empty commands, which are only padding for clones, are left out.
+code that is chosen at runtime, which the command block backend clones into place, is run with `switch`:
+a binary search over the values of a score, made of `execute if score ... run function` commands.
+"""
+
+import json
+import re
+import shutil
+from pathlib import Path
+from typing import Optional
+
+from computer.codegen.chain_context import ChainContext, ChainGroup, command
+from computer.codegen.command import Command, Score, ExecuteCommand, If, ScoreMatches, FunctionCall
+from computer.codegen.session import current
+
+NAMESPACE = "computer"
+# the pack format of 1.20.2, the last version with a `functions` directory
+PACK_FORMAT = 18
+
+# the largest number of cases a switch tests one by one, instead of splitting them in half
+SWITCH_LEAF_SIZE = 3
+
+
+
+def function_names() -> dict[ChainContext, str]:
+    """
+    :return: the names of the functions of chain contexts, by chain context, in the current build session
+    """
+    return current().function_names
+
+
+def functions() -> list[ChainContext]:
+    """
+    :return: the chain contexts that were made for functions outside of any group, such as those of switches,
+    in the current build session
+    """
+    return current().functions
+
+
+def function_name(ctx: ChainContext) -> str:
+    """
+    finds the name of the function for a chain context, based on the name of the context
+    :param ctx: the chain context
+    :return: the name of the function, including the namespace
+    """
+    names = function_names()
+    if ctx not in names:
+        path = re.sub(r"[^a-z0-9_./-]", "_", (ctx.name or "chain").lower())
+        taken = set(names.values())
+        name = f"{NAMESPACE}:{path}"
+        n = 0
+        while name in taken:
+            name = f"{NAMESPACE}:{path}_{n}"
+            n += 1
+        names[ctx] = name
+    return names[ctx]
+
+
+def function(name: str) -> ChainContext:
+    """
+    makes a chain context for a function outside of any group, which is written out with the datapack
+    :param name: the name of the chain context
+    :return: the chain context
+    """
+    ctx = ChainContext(name=name)
+    functions().append(ctx)
+    return ctx
+
+
+def call(ctx: ChainContext) -> FunctionCall:
+    """
+    :return: a command that runs the function for a chain context
+    """
+    return FunctionCall(function_name(ctx))
+
+
+def switch(score: Score, cases: list[tuple[int, Command]], name: str, origin: Optional[str] = None) -> None:
+    """
+    runs the command for the value of a score, if there is one.
+    the values are searched in halves, with a function for each half, so the search takes logarithmic time.
+    the commands run must not change the score.
+    :param score: the score to switch on
+    :param cases: the value for each command
+    :param name: the name of the chain the switch is for, which its functions are named after
+    :param origin: the chain context and section that the commands of the switch are attributed to
+    """
+    cases = sorted(cases, key=lambda case: case[0])
+    if len(cases) <= SWITCH_LEAF_SIZE:
+        for value, cmd in cases:
+            test = ExecuteCommand((If(ScoreMatches(score, str(value))),), cmd)
+            test.origin = origin
+            command(test)
+        return
+
+    middle = len(cases) // 2
+    for half, values in (cases[:middle], f"..{cases[middle - 1][0]}"), (cases[middle:], f"{cases[middle][0]}.."):
+        half_function = function(f"{name}/{half[0][0]}_{half[-1][0]}")
+        with half_function:
+            switch(score, half, name, origin)
+        test = ExecuteCommand((If(ScoreMatches(score, values)),), call(half_function))
+        test.origin = origin
+        command(test)
+
+
+def switch_cost(cases: int) -> int:
+    """
+    :param cases: the number of cases of a switch
+    :return: the largest number of commands a switch over that many cases runs, not counting the command for the case
+    """
+    if cases <= SWITCH_LEAF_SIZE:
+        return cases
+    return 2 + switch_cost(cases - cases // 2)
+
+
+def worst_case(ctx: ChainContext) -> int:
+    """
+    estimates the most commands that running the function for a chain context takes, following the functions it calls.
+    of each run of commands that only call a function if a condition holds, only the most expensive call is counted,
+    as they are the cases of a switch.
+    :param ctx: the chain context, which is lowered
+    :return: the number of commands
+    """
+    contexts: dict[str, ChainContext] = {}
+    costs: dict[ChainContext, int] = {}
+
+    def called(name: str) -> int:
+        # lowering makes more functions, such as those of switches
+        if name not in contexts:
+            contexts.update((function_name, function_ctx) for function_ctx, function_name in function_names().items())
+        return cost(contexts[name])
+
+    def cost(function_ctx: ChainContext) -> int:
+        if function_ctx not in costs:
+            function_ctx.lower()
+            total = 0
+            # the most expensive of the current run of conditional calls
+            case = 0
+            for cmd in function_ctx.contents:
+                if not cmd.command:
+                    continue
+                total += 1
+                match cmd:
+                    case ExecuteCommand(run=FunctionCall(function=name)):
+                        case = max(case, called(name))
+                        continue
+                    case FunctionCall(function=name):
+                        total += called(name)
+                total += case
+                case = 0
+            costs[function_ctx] = total + case
+        return costs[function_ctx]
+
+    return cost(ctx)
+
+
+def write_function(directory: Path, ctx: ChainContext) -> None:
+    """
+    writes the function for a chain context, lowering it first
+    :param directory: the directory of the datapack
+    :param ctx: the chain context
+    """
+    ctx.lower()
+    namespace, path = function_name(ctx).split(":")
+    file = directory / "data" / namespace / "functions" / f"{path}.mcfunction"
+    file.parent.mkdir(parents=True, exist_ok=True)
+    file.write_text("".join(cmd.command + "\n" for cmd in ctx.contents if cmd.command))
+
+
+def write_tag(directory: Path, tag: str, functions: list[ChainContext]) -> None:
+    """
+    writes a function tag, such as `minecraft:tick`
+    :param directory: the directory of the datapack
+    :param tag: the tag
+    :param functions: the chain contexts whose functions are in the tag
+    """
+    namespace, path = tag.split(":")
+    file = directory / "data" / namespace / "tags" / "functions" / f"{path}.json"
+    file.parent.mkdir(parents=True, exist_ok=True)
+    file.write_text(json.dumps({"values": [function_name(ctx) for ctx in functions]}, indent=2))
+
+
+def write_datapack(
+        directory: str,
+        groups: list[ChainGroup],
+        load: list[ChainContext],
+        tick: list[ChainContext],
+        description: str = "",
+) -> None:
+    """
+    writes a datapack with a function for every chain context of some groups, and for those made with `function`,
+    replacing the functions already in the directory
+    :param directory: the directory to write the datapack to
+    :param groups: the groups of chain contexts
+    :param load: the chain contexts to run when the datapack is loaded
+    :param tick: the chain contexts to run every tick
+    :param description: the description of the datapack
+    """
+    root = Path(directory)
+    root.mkdir(parents=True, exist_ok=True)
+    # functions left from an earlier build would otherwise still be loaded
+    shutil.rmtree(root / "data" / NAMESPACE / "functions", ignore_errors=True)
+    (root / "pack.mcmeta").write_text(json.dumps({
+        "pack": {"pack_format": PACK_FORMAT, "description": description}
+    }, indent=2))
+    for group in groups:
+        for ctx in group.chain_contexts:
+            write_function(root, ctx)
+    # lowering may make more functions
+    written = 0
+    while written < len(functions()):
+        write_function(root, functions()[written])
+        written += 1
+    write_tag(root, "minecraft:load", load)
+    write_tag(root, "minecraft:tick", tick)
@@ -0,0 +1,159 @@
+"""
+differences between the blocks of two builds, so that a change can be deployed without pasting the whole computer.
+
+the blocks that changed are written as a patch: a schematic of the smallest box holding them,
+and the `fill` and `setblock` commands that make the same change in place.
+"""
+
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Optional
+
+from computer.codegen import schematic
+from computer.codegen.coordinates import Coordinates
+from computer.codegen.output import BlockBuffer, BlockFile, read_blocks
+
+AIR = "minecraft:air"
+
+# the number of blocks a single fill command may touch
+FILL_LIMIT = 32768
+
+# a block, as its block state and its nbt as snbt, or None if it is not a block entity
+Block = tuple[str, Optional[str]]
+
+
+def block_map(blocks: BlockBuffer | BlockFile) -> dict[tuple[int, int, int], Block]:
+    """
+    finds the block at each position, where a block added where there already is one replaces it, as in a schematic
+    :param blocks: the blocks
+    :return: the blocks, by position
+    """
+    nbt_table = [None] + list(blocks.nbt_table)
+    return {
+        (x, y, z): (blocks.state_table[state], nbt_table[nbt + 1])
+        for x, y, z, state, nbt in zip(blocks.xs, blocks.ys, blocks.zs, blocks.states, blocks.nbts)
+    }
+
+
+def changes(
+        old: dict[tuple[int, int, int], Block],
+        new: dict[tuple[int, int, int], Block],
+) -> dict[tuple[int, int, int], Block]:
+    """
+    finds the blocks that differ between two builds, including those that are gone from the new one, which become air
+    :param old: the blocks of the old build, by position
+    :param new: the blocks of the new build, by position
+    :return: the blocks of the new build that differ, by position, ordered by y, then z, then x
+    """
+    changed = {pos: block for pos, block in new.items() if old.get(pos) != block}
+    changed.update((pos, (AIR, None)) for pos in old.keys() - new.keys())
+    return dict(sorted(changed.items(), key=lambda item: (item[0][1], item[0][2], item[0][0])))
+
+
+def patch_schematic(
+        new: dict[tuple[int, int, int], Block],
+        changed: dict[tuple[int, int, int], Block],
+) -> tuple[BlockBuffer, Coordinates]:
+    """
+    lays the changed blocks out in the smallest box holding them.
+    the rest of the box holds the blocks of the new build, which are unchanged, so that pasting it leaves them as they are
+    :param new: the blocks of the new build, by position
+    :param changed: the blocks that changed, as found by `changes`
+    :return: the blocks of the box, from its corner, and the position of its corner
+    """
+    low = Coordinates(*(min(pos[axis] for pos in changed) for axis in range(3)))
+    high = Coordinates(*(max(pos[axis] for pos in changed) for axis in range(3)))
+    blocks = BlockBuffer()
+    for (x, y, z), (block_id, snbt) in (new | changed).items():
+        if low.x <= x <= high.x and low.y <= y <= high.y and low.z <= z <= high.z:
+            blocks.add(Coordinates(x, y, z) - low, block_id, snbt)
+    return blocks, low
+
+
+def patch_commands(old: dict[tuple[int, int, int], Block], changed: dict[tuple[int, int, int], Block]) -> list[str]:
+    """
+    makes the commands that change the blocks in place.
+    runs of the same block going east are filled in one command.
+    a block whose block state is unchanged is set to air first, since `setblock` does not replace the nbt of a block
+    with the same block state
+    :param old: the blocks of the old build, by position
+    :param changed: the blocks that changed, as found by `changes`
+    :return: the commands
+    """
+    commands = []
+    run: list[tuple[int, int, int]] = []
+
+    def flush():
+        x, y, z = run[0]
+        block_id, snbt = changed[run[0]]
+        block = block_id if snbt is None else block_id + snbt
+        if len(run) == 1:
+            commands.append(f"setblock {x} {y} {z} {block}")
+        else:
+            commands.append(f"fill {x} {y} {z} {x + len(run) - 1} {y} {z} {block}")
+        run.clear()
+
+    for pos, block in changed.items():
+        x, y, z = pos
+        replaced = pos in old and old[pos][0] == block[0]
+        if run and (run[-1] != (x - 1, y, z) or changed[run[-1]] != block or replaced or len(run) == FILL_LIMIT):
+            flush()
+        if replaced:
+            commands.append(f"setblock {x} {y} {z} {AIR}")
+        run.append(pos)
+        if replaced:
+            flush()
+    if run:
+        flush()
+    return commands
+
+
+def write_patch(
+        old: BlockBuffer | BlockFile,
+        new: BlockBuffer | BlockFile,
+        schematic_path: str | Path,
+        commands_path: str | Path,
+) -> int:
+    """
+    writes the patch from one build to the next, as a schematic and as a function of commands.
+    the schematic is offset to the corner of its box, so that it is pasted where the whole computer would be
+    :param old: the blocks of the old build
+    :param new: the blocks of the new build
+    :param schematic_path: the path of the schematic
+    :param commands_path: the path of the function
+    :return: the number of blocks that changed, for which nothing is written if it is 0
+    """
+    old_blocks = block_map(old)
+    new_blocks = block_map(new)
+    changed = changes(old_blocks, new_blocks)
+    if not changed:
+        return 0
+
+    blocks, offset = patch_schematic(new_blocks, changed)
+    Path(schematic_path).parent.mkdir(parents=True, exist_ok=True)
+    schematic.save(blocks, schematic_path, "patch", offset)
+
+    Path(commands_path).parent.mkdir(parents=True, exist_ok=True)
+    Path(commands_path).write_text("".join(command + "\n" for command in patch_commands(old_blocks, changed)))
+    return len(changed)
+
+
+def main():
+    parser = ArgumentParser(prog="schematic_diff", description="write the blocks that changed between two builds")
+    parser.add_argument("old", help="the blocks of the old build, as schematic assembly or in binary form")
+    parser.add_argument("new", help="the blocks of the new build, as schematic assembly or in binary form")
+    parser.add_argument("--schematic", default="schematics/patch.schematic",
+                        help="where to write the schematic of the changed blocks")
+    parser.add_argument("--commands", default="generated/patch.mcfunction",
+                        help="where to write the commands that change the blocks in place")
+    args = parser.parse_args()
+
+    count = write_patch(read_blocks(args.old), read_blocks(args.new), args.schematic, args.commands)
+    if count == 0:
+        print("no blocks changed")
+    else:
+        print(f"{count} blocks changed, written to {args.schematic} and {args.commands}")
+
+
+if __name__ == "__main__":
+    main()
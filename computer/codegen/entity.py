@@ -1,21 +1,20 @@
 from computer.codegen.chain_context import command
-from computer.codegen.command import Command
+from computer.codegen.command import Command, EntityExists, DataModify, DataTarget, Teleport
 from computer.codegen.coordinates import Coordinates
 from computer.codegen.execute import Execute, StoreLocation, Condition
+from computer.codegen.session import current
 from computer.codegen.variable import Variable
 from computer.codegen.vector_variable import VectorVariable
 
-max_tag = 0
-
 
 def new_tag() -> str:
     """
-    gets a new unique tag
+    gets a new unique tag, in the current build session
     :return:
     """
-    global max_tag
-    name = "e" + str(max_tag)
-    max_tag += 1
+    session = current()
+    name = session.namespace + "e" + str(session.max_tag)
+    session.max_tag += 1
     return name
 
 
@@ -29,12 +28,12 @@ class Entity(StoreLocation, Condition):
         self.summon = f"summon {self.kind} ~ ~ ~" + " {Tags:[" + repr(self.uid) + "]}"
         self._selector = f"@e[tag={self.uid},limit=1]"
 
-    def condition(self, *_) -> str:
+    def condition(self, *_) -> EntityExists:
         """
         returns a condition for whether the entity exists, to be used by `execute if` and `execute unless`
         :return: the formatted condition
         """
-        return f"entity {self.selector()}"
+        return EntityExists(self.selector())
 
     def create(self) -> None:
         """
@@ -68,9 +67,7 @@ class Entity(StoreLocation, Condition):
         :param scale: the amount to multiply the value by, if using a variable
         """
         if isinstance(value, str) or isinstance(value, int):
-            command(f"data modify"
-                    f" entity {self.selector()}"
-                    f" set {path} {value}")
+            command(DataModify(DataTarget("entity", self.selector()), path, value))
         elif isinstance(value, Variable):
             (
                 Execute()
@@ -92,22 +89,23 @@ class Entity(StoreLocation, Condition):
                 self.set_nbt("Pos[1]", y, "double")
                 self.set_nbt("Pos[2]", z, "double")
             case Coordinates() as c:
-                command(f"tp {self.selector()} {c.exact()}")
+                command(Teleport(self.selector(), c.exact()))
             case _:
                 raise ValueError(f"{coords}")
 
-    def store_location(self, *args) -> str:
+    def store_location(self, *args) -> tuple[DataTarget, str, str, float]:
         """
         stores a value into the entity's nbt
         :param args: (path: str, mc_type: str = "int", scale: float = 1)
-        :return: the formatted store location
+        :return: the store location
         """
+        target = DataTarget("entity", self.selector())
         match args:
             case (path, mc_type, scale):
-                return f"entity {self.selector()} {path} {mc_type} {scale}"
+                return target, path, mc_type, scale
             case (path, mc_type):
-                return f"entity {self.selector()} {path} {mc_type} 1"
+                return target, path, mc_type, 1
             case (path,):
-                return f"entity {self.selector()} {path} int 1"
+                return target, path, "int", 1
             case _:
                 raise ValueError
@@ -4,8 +4,10 @@ from abc import ABC
 from dataclasses import dataclass
 from typing import Iterable, Optional
 
-from computer.codegen.chain_context import command, ChainContext
-from computer.codegen.command import Command
+from computer.codegen.chain_context import command, chain_context_stack, home_context, ChainContext
+from computer.codegen.command import Command, Test, Subcommand, If, At, As, Store, Score, DataTarget, \
+    ExecuteCommand, ScoreMatches, Temporary
+from computer.codegen.session import current, settings
 
 
 class StoreLocation(ABC):
@@ -13,11 +15,11 @@ class StoreLocation(ABC):
     base class for constructs that can function as an argument to `execute store`
     """
 
-    def store_location(self, *args) -> str:
+    def store_location(self, *args) -> Score | tuple[DataTarget, str, str, float]:
         """
-        gets a string that can be used as an argument to `execute store` in order to put a value into `self`
+        gets the target of an `execute store` that puts a value into `self`
         :param args: additional arguments needed to specify the location to store to
-        :return: a string that can be used with `execute store`
+        :return: a score, or nbt given as the data target, path, type and scale
         """
         pass
 
@@ -27,11 +29,11 @@ class Condition(ABC):
     base class for constructs that can function as an argument to `execute if` and `execute unless`
     """
 
-    def condition(self, *args) -> str:
+    def condition(self, *args) -> Test:
         """
-        gets a string that can be used as an argument to `execute if` and `execute unless`
+        gets the test used by `execute if` and `execute unless` to check the condition
         :param args: additional arguments needed to specify the condition
-        :return: a string that can be used with `execute if` and execute unless``
+        :return: the test
         """
         pass
 
@@ -68,7 +70,7 @@ class Execute:
     """
 
     def __init__(self):
-        self.parts = []
+        self.parts: list[Subcommand] = []
 
     def at_entity(self, entity: "Entity") -> Execute:
         """
@@ -76,7 +78,7 @@ class Execute:
         :param entity: the entity to execute at
         :return: the builder
         """
-        self.parts.append(f"at {entity.selector()}")
+        self.parts.append(At(entity.selector()))
         return self
 
     def as_entity(self, entity: "Entity") -> Execute:
@@ -85,7 +87,7 @@ class Execute:
         :param entity: the entity to execute as
         :return: the builder
         """
-        self.parts.append(f"as {entity.selector()}")
+        self.parts.append(As(entity.selector()))
         return self
 
     def if_condition(self, condition: Condition) -> Execute:
@@ -94,7 +96,7 @@ class Execute:
         :param condition: the condition to check
         :return: the builder
         """
-        self.parts.append(f"if {condition.condition()}")
+        self.parts.append(If(condition.condition()))
         return self
 
     def unless_condition(self, condition: Condition) -> Execute:
@@ -103,7 +105,7 @@ class Execute:
         :param condition: the condition to check
         :return: the builder
         """
-        self.parts.append(f"unless {condition.condition()}")
+        self.parts.append(If(condition.condition(), negated=True))
         return self
 
     def store_result(self, store_location: StoreLocation, *args) -> Execute:
@@ -113,7 +115,7 @@ class Execute:
         :param args: additional arguments needed to specify where to store to
         :return: the builder
         """
-        self.parts.append(f"store result {store_location.store_location(*args)}")
+        self.parts.append(Store("result", store_location.store_location(*args)))
         return self
 
     def store_success(self, store_location: StoreLocation, *args) -> Execute:
@@ -123,7 +125,7 @@ class Execute:
         :param args: additional arguments needed to specify where to store to
         :return: the builder
         """
-        self.parts.append(f"store success {store_location.store_location(*args)}")
+        self.parts.append(Store("success", store_location.store_location(*args)))
         return self
 
     def run(self, cmd: Command = None) -> Optional[Run]:
@@ -133,19 +135,80 @@ class Execute:
         :return: returns a `Run` instance if no command is specified.
         """
         if cmd is not None:
-            self.parts.append(f"run {cmd.command}")
-            command("execute " + " ".join(self.parts))
+            command(ExecuteCommand(tuple(self.parts), cmd))
         else:
             return Run(self)
 
-    def run_all(self, cmds: Iterable[Command]) -> None:
+    def materializable(self) -> bool:
+        """
+        :return: whether the builder is a single condition, which `materialize` can evaluate once,
+        and which is not already the test of a score it was evaluated into
+        """
+        if len(self.parts) != 1 or not isinstance(self.parts[0], If):
+            return False
+        return not (isinstance(self.parts[0].test, ScoreMatches) and isinstance(self.parts[0].test.score, Temporary))
+
+    def materialize(self) -> Score:
+        """
+        evaluates the condition of the builder once, storing whether it passed
+        :return: a temporary score that is 1 if the condition passed, and 0 if it failed
+        """
+        flag = Temporary("cond", "vars", home_context())
+        # a trailing condition stores its success whether it passes or not
+        command(ExecuteCommand((Store("success", flag), *self.parts)))
+        return flag
+
+    def run_all(self, cmds: Iterable[Command]) -> Optional[Score]:
         """
         runs a series of commands, using multiple command blocks if necessary.
-        warning: evaluates all parts of the execute command for each command to run.
+        warning: evaluates all parts of the execute command for each command to run, unless conditions are materialized
+        and the builder is a single condition, which is then evaluated once before the commands
         :param cmds: the commands to run
+        :return: the score the condition was evaluated into, if it was
         """
+        cmds = list(cmds)
+        parts = tuple(self.parts)
+        flag = None
+        if settings().materialize_conditions and len(cmds) > 1 and self.materializable():
+            flag = self.materialize()
+            parts = (If(ScoreMatches(flag, "1")),)
         for cmd in cmds:
-            command("execute " + " ".join(self.parts) + f" run {cmd.command}")
+            command(ExecuteCommand(parts, cmd))
+        return flag
+
+
+@dataclass
+class Branch:
+    """
+    the commands of a `run_if` or `run_unless`, as added to the chain context, for the `run_else` after it
+    """
+
+    # the context the commands were added to
+    ctx: ChainContext
+    # the commands that were added, from the start to the end of them
+    start: int
+    end: int
+    execute: Execute
+    # the score the condition was evaluated into, if it was
+    flag: Optional[Score]
+
+    def materialize(self) -> Score:
+        """
+        evaluates the condition into a score before the commands, if it was not, and has the commands test it instead
+        :return: the score
+        """
+        if self.flag is not None:
+            return self.flag
+        if chain_context_stack()[-1] is not self.ctx or len(self.ctx.contents) != self.end:
+            raise ValueError("run_else must directly follow the run_if or run_unless it belongs to")
+        cmds = self.ctx.contents[self.start:]
+        del self.ctx.contents[self.start:]
+        self.flag = self.execute.materialize()
+        for cmd in cmds:
+            materialized = ExecuteCommand((If(ScoreMatches(self.flag, "1")),), cmd.run)
+            materialized.origin = cmd.origin
+            command(materialized)
+        return self.flag
 
 
 @dataclass
@@ -155,17 +218,21 @@ class Run:
     """
 
     execute: Execute
+    # whether a `run_else` may follow, which needs to know where the commands were added
+    branch: bool = False
 
     def __enter__(self):
-        self.ctx = ChainContext().__enter__()
+        self.ctx = ChainContext(transient=True).__enter__()
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.ctx.__exit__(None, None, None)
-        self.execute.run_all(self.ctx.contents)
-
-
-last_cond: Optional[Condition] = None
-last_negated: Optional[Condition] = None
+        if not self.branch:
+            self.execute.run_all(self.ctx.contents)
+            return
+        target = chain_context_stack()[-1]
+        start = len(target.contents)
+        flag = self.execute.run_all(self.ctx.contents)
+        current().last_branch = Branch(target, start, len(target.contents), self.execute, flag)
 
 
 def run_if(condition: Condition) -> Run:
@@ -174,10 +241,10 @@ def run_if(condition: Condition) -> Run:
     :param condition: the condition to check
     :return: a `Run` instance
     """
-    global last_negated, last_cond
-    last_negated = False
-    last_cond = condition
-    return Execute().if_condition(condition).run()
+    session = current()
+    session.last_negated = False
+    session.last_cond = condition
+    return Run(Execute().if_condition(condition), branch=True)
 
 
 def run_unless(condition: Condition) -> Run:
@@ -186,16 +253,24 @@ def run_unless(condition: Condition) -> Run:
     :param condition: the condition to check
     :return: a `Run` instance
     """
-    global last_negated, last_cond
-    last_negated = True
-    last_cond = condition
-    return Execute().unless_condition(condition).run()
+    session = current()
+    session.last_negated = True
+    session.last_cond = condition
+    return Run(Execute().unless_condition(condition), branch=True)
 
 
 def run_else() -> Run:
     """
     returns a `Run` instance that executes commands it captures if the previous call to `run_if` or `run_unless`
     did not run anything.
+    without materialized conditions, the condition is tested again, so the commands of the `run_if` must not change its outcome.
+    with it, the condition is evaluated once, before the commands of the `run_if`, and both branches test the result.
     :return: a `Run` instance
     """
-    return (run_unless if last_negated else run_if)(last_cond)
+    session = current()
+    if not session.settings.materialize_conditions:
+        return (run_if if session.last_negated else run_unless)(session.last_cond)
+    flag = session.last_branch.materialize()
+    execute = Execute()
+    execute.parts.append(If(ScoreMatches(flag, "0")))
+    return execute.run()
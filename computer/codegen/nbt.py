@@ -0,0 +1,237 @@
+"""
+writing and reading of binary nbt, as in schematic files.
+
+values are given as the python types that `snbt` parses to, so that anything that can be written as snbt can be
+written as binary nbt as well. `bytes` and `bytearray` are written as byte arrays, without converting them to lists,
+and byte arrays are read as `bytes`.
+"""
+
+import gzip
+import struct
+from pathlib import Path
+
+from computer.codegen.snbt import Byte, Short, Long, Float, ByteArray, IntArray, LongArray
+
+END = 0
+BYTE = 1
+SHORT = 2
+INT = 3
+LONG = 4
+FLOAT = 5
+DOUBLE = 6
+BYTE_ARRAY = 7
+STRING = 8
+LIST = 9
+COMPOUND = 10
+INT_ARRAY = 11
+LONG_ARRAY = 12
+
+# the struct formats of the numeric tags, by type
+NUMBER_FORMATS = {
+    BYTE: ">b",
+    SHORT: ">h",
+    INT: ">i",
+    LONG: ">q",
+    FLOAT: ">f",
+    DOUBLE: ">d",
+}
+
+
+def tag_type(value) -> int:
+    """
+    :return: the type of the tag that a value is written as
+    """
+    match value:
+        case dict():
+            return COMPOUND
+        case ByteArray() | bytes() | bytearray():
+            return BYTE_ARRAY
+        case IntArray():
+            return INT_ARRAY
+        case LongArray():
+            return LONG_ARRAY
+        case list():
+            return LIST
+        case str():
+            return STRING
+        case Byte() | bool():
+            return BYTE
+        case Short():
+            return SHORT
+        case Long():
+            return LONG
+        case int():
+            return INT
+        case Float():
+            return FLOAT
+        case float():
+            return DOUBLE
+        case _:
+            raise ValueError(f"can't write {value!r} as nbt")
+
+
+def string(s: str) -> bytes:
+    """
+    encodes a string as java's modified utf-8 does, with its length in front
+    """
+    if all(0 < ord(c) < 0x10000 for c in s):
+        encoded = s.encode("utf-8", "surrogatepass")
+    else:
+        # nul is written as two bytes, and characters outside the basic multilingual plane as surrogate pairs
+        encoded = bytearray()
+        for c in s:
+            code = ord(c)
+            if code == 0:
+                encoded += b"\xc0\x80"
+            elif code < 0x10000:
+                encoded += c.encode("utf-8", "surrogatepass")
+            else:
+                code -= 0x10000
+                encoded += (chr(0xd800 + (code >> 10)) + chr(0xdc00 + (code & 0x3ff))).encode("utf-8", "surrogatepass")
+    return struct.pack(">H", len(encoded)) + encoded
+
+
+def write_payload(out: bytearray, value) -> None:
+    """
+    appends the payload of a tag, without its type and name
+    :param out: the buffer to append to
+    :param value: the value of the tag
+    """
+    tag = tag_type(value)
+    if tag in NUMBER_FORMATS:
+        out += struct.pack(NUMBER_FORMATS[tag], value)
+    elif tag == BYTE_ARRAY:
+        out += struct.pack(">i", len(value))
+        out += value if isinstance(value, (bytes, bytearray)) else struct.pack(f">{len(value)}b", *value)
+    elif tag == STRING:
+        out += string(value)
+    elif tag == LIST:
+        element = tag_type(value[0]) if value else END
+        out += struct.pack(">bi", element, len(value))
+        for item in value:
+            if tag_type(item) != element:
+                raise ValueError(f"list of mixed tags: {value!r}")
+            write_payload(out, item)
+    elif tag == COMPOUND:
+        for key, item in value.items():
+            out += struct.pack(">b", tag_type(item))
+            out += string(key)
+            write_payload(out, item)
+        out += struct.pack(">b", END)
+    elif tag == INT_ARRAY:
+        out += struct.pack(f">i{len(value)}i", len(value), *value)
+    else:
+        out += struct.pack(f">i{len(value)}q", len(value), *value)
+
+
+def dumps(value: dict, name: str = "") -> bytes:
+    """
+    writes a compound as the root tag of an nbt file
+    :param value: the compound
+    :param name: the name of the root tag
+    :return: the uncompressed nbt
+    """
+    out = bytearray(struct.pack(">b", COMPOUND))
+    out += string(name)
+    write_payload(out, value)
+    return bytes(out)
+
+
+def write_gzip(path: str | Path, value: dict, name: str = "") -> None:
+    """
+    writes a compound to a gzipped nbt file, such as a schematic
+    :param path: the path of the file
+    :param value: the compound
+    :param name: the name of the root tag
+    """
+    with gzip.open(path, "wb") as file:
+        file.write(dumps(value, name))
+
+
+# the types that numeric tags are read as, by type
+NUMBER_TYPES = {
+    BYTE: Byte,
+    SHORT: Short,
+    INT: int,
+    LONG: Long,
+    FLOAT: Float,
+    DOUBLE: float,
+}
+
+
+def read_string(data: bytes, pos: int) -> tuple[str, int]:
+    """
+    decodes a string written by `string`
+    :param data: the nbt
+    :param pos: the position of its length
+    :return: the string, and the position after it
+    """
+    (length,) = struct.unpack_from(">H", data, pos)
+    pos += 2
+    text = data[pos:pos + length].replace(b"\xc0\x80", b"\x00").decode("utf-8", "surrogatepass")
+    # characters outside the basic multilingual plane were written as surrogate pairs
+    return text.encode("utf-16-le", "surrogatepass").decode("utf-16-le"), pos + length
+
+
+def read_payload(data: bytes, pos: int, tag: int) -> tuple[object, int]:
+    """
+    decodes the payload of a tag
+    :param data: the nbt
+    :param pos: the position of the payload
+    :param tag: the type of the tag
+    :return: the value of the tag, and the position after it
+    """
+    if tag in NUMBER_FORMATS:
+        (value,) = struct.unpack_from(NUMBER_FORMATS[tag], data, pos)
+        return NUMBER_TYPES[tag](value), pos + struct.calcsize(NUMBER_FORMATS[tag])
+    if tag == STRING:
+        return read_string(data, pos)
+    if tag == COMPOUND:
+        value = {}
+        while data[pos] != END:
+            item_tag = data[pos]
+            key, pos = read_string(data, pos + 1)
+            value[key], pos = read_payload(data, pos, item_tag)
+        return value, pos + 1
+    if tag == LIST:
+        element, length = struct.unpack_from(">bi", data, pos)
+        pos += 5
+        items = []
+        for _ in range(length):
+            item, pos = read_payload(data, pos, element)
+            items.append(item)
+        return items, pos
+    (length,) = struct.unpack_from(">i", data, pos)
+    pos += 4
+    if tag == BYTE_ARRAY:
+        return data[pos:pos + length], pos + length
+    if tag == INT_ARRAY:
+        return IntArray(struct.unpack_from(f">{length}i", data, pos)), pos + 4 * length
+    if tag == LONG_ARRAY:
+        return LongArray(struct.unpack_from(f">{length}q", data, pos)), pos + 8 * length
+    raise ValueError(f"unknown tag type {tag}")
+
+
+def loads(data: bytes) -> tuple[dict, str]:
+    """
+    reads the root tag of an nbt file, as written by `dumps`
+    :param data: the uncompressed nbt
+    :return: the compound in the root tag, and its name
+    """
+    if not data or data[0] != COMPOUND:
+        raise ValueError("the root tag of nbt must be a compound")
+    name, pos = read_string(data, 1)
+    value, pos = read_payload(data, pos, COMPOUND)
+    if pos != len(data):
+        raise ValueError(f"trailing data after the root tag, at {pos}")
+    return value, name
+
+
+def read_gzip(path: str | Path) -> tuple[dict, str]:
+    """
+    reads a compound from a gzipped nbt file, such as a schematic
+    :param path: the path of the file
+    :return: the compound, and the name of the root tag
+    """
+    with gzip.open(path, "rb") as file:
+        return loads(file.read())
@@ -0,0 +1,264 @@
+"""
+a peephole optimizer for the commands of a chain.
+
+the chain is rewritten until none of these apply:
+- operations with a constant are turned into `set`, `add` and `remove`, and self-assignments are removed
+- arithmetic on a score whose value is known from earlier in the chain is folded into a `set`,
+  or into a copy if it adds to zero or multiplies one
+- consecutive `add` and `remove` on the same score are merged
+- stores that are overwritten later in the chain before being read are removed
+
+scores are global, so nothing is known at the start of a chain and everything is live at its end.
+commands that may run code which is not in the chain, such as `clone` and the empty padding that code is cloned into,
+are barriers that nothing is moved past. empty commands are never removed, so the layout of the chain is kept.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Optional
+
+from computer.codegen.command import Command, Score, Constant, ScoreSet, ScoreAdd, ScoreReset, ScoreGet, ScoreOperation, \
+    ExecuteCommand, If, Store, ScoreCompare, ScoreMatches, DataGet, DataModify, Teleport, Say
+from computer.codegen.session import settings
+from computer.emulator.scoreboard import OPERATIONS, INT_MIN, INT_MAX
+
+# `Variable.constant` names its players after their value
+def constant_value(score: Score) -> Optional[int]:
+    """
+    :return: the value of a score, if it is a constant
+    """
+    if isinstance(score, Constant):
+        return score.value
+    return None
+
+
+@dataclass
+class Effects:
+    """
+    the scores a command reads and writes
+    """
+
+    reads: set[Score] = field(default_factory=set)
+    # scores that are always overwritten, without being read
+    kills: set[Score] = field(default_factory=set)
+    # scores that may be changed
+    clobbers: set[Score] = field(default_factory=set)
+    # whether the command may read or write anything
+    barrier: bool = False
+
+    def writes(self) -> set[Score]:
+        return self.kills | self.clobbers
+
+
+BARRIER = Effects(barrier=True)
+
+
+def effects(cmd: Command) -> Effects:
+    """
+    finds the scores a command reads and writes
+    :param cmd: the command
+    :return: its effects
+    """
+    match cmd:
+        case ScoreSet() | ScoreReset():
+            return Effects(kills={cmd.target})
+        case ScoreGet():
+            return Effects(reads={cmd.target})
+        case ScoreAdd():
+            return Effects(reads={cmd.target}, clobbers={cmd.target})
+        case ScoreOperation(operator="="):
+            return Effects(reads={cmd.source}, kills={cmd.target})
+        case ScoreOperation(operator="><"):
+            return Effects(reads={cmd.target, cmd.source}, clobbers={cmd.target, cmd.source})
+        case ScoreOperation():
+            return Effects(reads={cmd.target, cmd.source}, clobbers={cmd.target})
+        case DataModify():
+            # setting the nbt of a block may change a command block
+            return BARRIER if cmd.target.kind == "block" else Effects()
+        case ExecuteCommand():
+            return execute_effects(cmd)
+        # commands that neither touch scores nor change command blocks
+        case DataGet() | Teleport() | Say():
+            return Effects()
+    return BARRIER
+
+
+def execute_effects(cmd: ExecuteCommand) -> Effects:
+    result = Effects()
+    for subcommand in cmd.subcommands:
+        match subcommand:
+            case If(test=ScoreCompare(left, _, right)):
+                result.reads |= {left, right}
+            case If(test=ScoreMatches(score, _)):
+                result.reads.add(score)
+            case Store(target=Score() as score):
+                result.clobbers.add(score)
+    if cmd.run is None and isinstance(cmd.subcommands[-1], If) \
+            and all(isinstance(subcommand, Store) for subcommand in cmd.subcommands[:-1]):
+        # a trailing condition stores its success or result whether it passes or not
+        result.kills, result.clobbers = result.clobbers, result.kills
+    if cmd.run is not None:
+        inner = effects(cmd.run)
+        if inner.barrier:
+            return BARRIER
+        # the command only runs if the conditions pass, so it may not write anything
+        result.reads |= inner.reads
+        result.clobbers |= inner.writes()
+    return result
+
+
+class Chain:
+    """
+    the commands of a chain, as they are rewritten
+    """
+
+    def __init__(self, commands: list[Command]):
+        self.commands: list[Optional[Command]] = list(commands)
+        self.changed = False
+
+    def replace(self, index: int, cmd: Command) -> None:
+        """
+        replaces a command, keeping the origin of the command it replaces
+        """
+        cmd.origin = self.commands[index].origin
+        self.commands[index] = cmd
+        self.changed = True
+
+    def remove(self, index: int) -> None:
+        self.commands[index] = None
+        self.changed = True
+
+    def compact(self) -> None:
+        self.commands = [cmd for cmd in self.commands if cmd is not None]
+
+
+def simplify(chain: Chain) -> None:
+    """
+    turns operations with constants into commands with literals, and removes operations that do nothing
+    """
+    for i, cmd in enumerate(chain.commands):
+        match cmd:
+            case ScoreAdd(amount=0):
+                chain.remove(i)
+            case ScoreOperation(operator="=" | "<" | ">") if cmd.source == cmd.target:
+                chain.remove(i)
+            case ScoreOperation(operator="="):
+                constant = constant_value(cmd.source)
+                if constant is not None:
+                    chain.replace(i, ScoreSet(cmd.target, constant))
+            case ScoreOperation(operator="+=" | "-="):
+                constant = constant_value(cmd.source)
+                if constant is not None and constant != INT_MIN:
+                    chain.replace(i, ScoreAdd(cmd.target, constant if cmd.operator == "+=" else -constant))
+
+
+def propagate_constants(chain: Chain) -> None:
+    """
+    folds arithmetic on scores with values known from earlier in the chain into `set`,
+    turns arithmetic that adds to zero or multiplies one into a copy,
+    and removes `set` commands that do not change the score
+    """
+    known: dict[Score, int] = {}
+    for i, cmd in enumerate(chain.commands):
+        value = None
+        match cmd:
+            case ScoreSet():
+                value = cmd.value
+            case ScoreOperation(operator="="):
+                value = known.get(cmd.source)
+            case ScoreAdd() if cmd.target in known:
+                value = OPERATIONS["+="](known[cmd.target], cmd.amount)
+            case ScoreOperation() if cmd.operator in OPERATIONS and cmd.target in known:
+                source = constant_value(cmd.source)
+                if source is None:
+                    source = known.get(cmd.source)
+                # division by zero fails, which is left to happen at runtime
+                if source is not None and not (cmd.operator in ("/=", "%=") and source == 0):
+                    value = OPERATIONS[cmd.operator](known[cmd.target], source)
+                elif source is None and (cmd.operator, known[cmd.target]) in (("+=", 0), ("*=", 1)):
+                    # the operation copies the source, which collapses the `set` before it
+                    cmd = ScoreOperation(cmd.target, "=", cmd.source)
+                    chain.replace(i, cmd)
+        if value is not None:
+            if known.get(cmd.target) == value:
+                chain.remove(i)
+                continue
+            if not isinstance(cmd, ScoreSet):
+                chain.replace(i, ScoreSet(cmd.target, value))
+            known[cmd.target] = value
+            continue
+
+        e = effects(cmd)
+        if e.barrier:
+            known.clear()
+        for score in e.writes():
+            known.pop(score, None)
+
+
+def merge_additions(chain: Chain) -> None:
+    """
+    merges an `add` or `remove` into the previous one on the same score, if the score is not used in between
+    """
+    pending: dict[Score, int] = {}
+    for i, cmd in enumerate(chain.commands):
+        if isinstance(cmd, ScoreAdd):
+            previous = pending.get(cmd.target)
+            if previous is not None:
+                total = chain.commands[previous].amount + cmd.amount
+                if INT_MIN < total <= INT_MAX:
+                    chain.replace(previous, ScoreAdd(cmd.target, total))
+                    chain.remove(i)
+                    continue
+            pending[cmd.target] = i
+            continue
+
+        e = effects(cmd)
+        if e.barrier:
+            pending.clear()
+        for score in e.reads | e.writes():
+            pending.pop(score, None)
+
+
+def eliminate_dead_stores(chain: Chain) -> None:
+    """
+    removes scoreboard commands whose result is overwritten later in the chain before it is read
+    """
+    overwritten: set[Score] = set()
+    for i in reversed(range(len(chain.commands))):
+        cmd = chain.commands[i]
+        match cmd:
+            case ScoreSet() | ScoreAdd() if cmd.target in overwritten:
+                chain.remove(i)
+                continue
+            case ScoreOperation() if cmd.target in overwritten and cmd.operator != "><":
+                chain.remove(i)
+                continue
+
+        e = effects(cmd)
+        if e.barrier:
+            overwritten.clear()
+            continue
+        overwritten |= e.kills
+        overwritten -= e.reads
+
+
+PASSES = [simplify, propagate_constants, merge_additions, eliminate_dead_stores]
+
+
+def optimize(commands: list[Command]) -> list[Command]:
+    """
+    optimizes the commands of a chain
+    :param commands: the commands to optimize
+    :return: the optimized commands
+    """
+    if not settings().optimize:
+        return commands
+    chain = Chain(commands)
+    while True:
+        chain.changed = False
+        for optimization_pass in PASSES:
+            optimization_pass(chain)
+            chain.compact()
+        if not chain.changed:
+            return chain.commands
@@ -1,23 +1,410 @@
-import subprocess
+import hashlib
+import io
+import mmap
+import struct
+import sys
+from array import array
+from itertools import repeat
 from pathlib import Path
-from typing import Callable, TextIO
+from typing import BinaryIO, Callable, Iterable, Optional, Sequence, TextIO, TYPE_CHECKING
 
-from computer.codegen import coordinates
-from computer.codegen.command import Command
+from computer.codegen.command import Command, Fold
 from computer.codegen.coordinates import Coordinates
+from computer.codegen.session import settings
+from computer.codegen.snbt import Byte, parse, quote
 
+if TYPE_CHECKING:
+    import numpy
 
-def emit(file, pos: Coordinates, block_id: str, snbt=None):
+# the start of a file of blocks in binary form, see `BlockBuffer.to_bytes`
+MAGIC = b"BLK\x02"
+# the number of blocks, block states and nbt values, after the magic
+HEADER = struct.Struct("<4sIII")
+# the columns of each block in binary form, in order
+COLUMNS = ["xs", "ys", "zs", "states", "nbts"]
+
+
+class BlockBuffer:
     """
-    writes a line of schematic assembly to a file
-    :param file: the file to write to
+    blocks to be written out, such as to a schematic.
+    each block is kept as its position, in arrays of each coordinate, and indices into tables of the block states and
+    of the snbt that blocks have, in which each is only kept once
+    """
+
+    def __init__(self):
+        self.xs = array("i")
+        self.ys = array("i")
+        self.zs = array("i")
+        # the index of the block state of each block
+        self.states = array("i")
+        # the index of the nbt of each block, or -1 if it is not a block entity
+        self.nbts = array("i")
+
+        # the block states, with their indices
+        self.state_table: list[str] = []
+        self.state_ids: dict[str, int] = {}
+        # the nbt of block entities, as snbt, with their indices
+        self.nbt_table: list[str] = []
+        self.nbt_ids: dict[str, int] = {}
+        # the parsed nbt of each entry of the nbt table, or None where it has not been parsed
+        self.nbt_values: list[Optional[dict]] = []
+
+    def __len__(self) -> int:
+        return len(self.xs)
+
+    def state_id(self, block_id: str) -> int:
+        """
+        :return: the index of a block state, adding it to the table if it is not there yet
+        """
+        index = self.state_ids.get(block_id)
+        if index is None:
+            index = self.state_ids[block_id] = len(self.state_table)
+            self.state_table.append(block_id)
+        return index
+
+    def nbt_id(self, snbt: Optional[str], value: Optional[dict] = None) -> int:
+        """
+        :param snbt: the nbt, as snbt, or None for a block that is not a block entity
+        :param value: the nbt, parsed, if it is at hand
+        :return: the index of the nbt, adding it to the table if it is not there yet, or -1 for None
+        """
+        if snbt is None:
+            return -1
+        index = self.nbt_ids.get(snbt)
+        if index is None:
+            index = self.nbt_ids[snbt] = len(self.nbt_table)
+            self.nbt_table.append(snbt)
+            self.nbt_values.append(value)
+        return index
+
+    def nbt_value(self, index: int) -> dict:
+        """
+        :return: the parsed nbt of an entry of the nbt table
+        """
+        if self.nbt_values[index] is None:
+            self.nbt_values[index] = parse(self.nbt_table[index])
+        return self.nbt_values[index]
+
+    def add(self, pos: Coordinates, block_id: str, snbt: Optional[str] = None, value: Optional[dict] = None) -> None:
+        """
+        adds a block
+        :param pos: the position of the block
+        :param block_id: the id of the block, with its block state
+        :param snbt: the nbt of the block as snbt, if it is a block entity
+        :param value: the nbt, parsed, if it is at hand
+        """
+        self.xs.append(pos.x)
+        self.ys.append(pos.y)
+        self.zs.append(pos.z)
+        self.states.append(self.state_id(block_id))
+        self.nbts.append(self.nbt_id(snbt, value))
+
+    def add_row(
+            self,
+            pos: Coordinates,
+            block_ids: list[str],
+            snbts: Iterable[Optional[str]],
+            values: Iterable[Optional[dict]],
+    ) -> None:
+        """
+        adds a row of blocks going east
+        :param pos: the position of the first block
+        :param block_ids: the id of each block
+        :param snbts: the nbt of each block as snbt, or None for blocks that are not block entities
+        :param values: the nbt of each block, parsed, or None where it is not at hand
+        """
+        count = len(block_ids)
+        self.xs.extend(range(pos.x, pos.x + count))
+        self.ys.extend(repeat(pos.y, count))
+        self.zs.extend(repeat(pos.z, count))
+        self.states.extend(map(self.state_id, block_ids))
+        self.nbts.extend(map(self.nbt_id, snbts, values))
+
+    def extend(self, other: "BlockBuffer") -> None:
+        """
+        adds the blocks of another buffer after those of this one
+        """
+        states = [self.state_id(block_id) for block_id in other.state_table]
+        nbts = [self.nbt_id(snbt, value) for snbt, value in zip(other.nbt_table, other.nbt_values)] + [-1]
+        self.xs.extend(other.xs)
+        self.ys.extend(other.ys)
+        self.zs.extend(other.zs)
+        self.states.extend(map(states.__getitem__, other.states))
+        self.nbts.extend(map(nbts.__getitem__, other.nbts))
+
+    def add_assembly(self, assembly: str) -> None:
+        """
+        adds the blocks of some schematic assembly
+        :param assembly: lines of schematic assembly
+        """
+        for line in assembly.splitlines():
+            if line:
+                x, y, z, block_id, *snbt = line.split(" ", 4)
+                self.add(Coordinates(int(x), int(y), int(z)), block_id, snbt[0] if snbt else None)
+
+    def write_to(self, file: "TextIO | BlockBuffer") -> None:
+        """
+        adds the blocks to another buffer, or writes them to a file as schematic assembly
+        """
+        if isinstance(file, BlockBuffer):
+            file.extend(self)
+        else:
+            self.write_blk(file)
+
+    def write_blk(self, file: TextIO) -> None:
+        """
+        writes the blocks out as schematic assembly, in the order they were added, in a single write
+        :param file: the file to write to
+        """
+        lines = [f"{block_id}\n" for block_id in self.state_table]
+        entities = [f"{block_id} " for block_id in self.state_table]
+        file.writelines(
+            f"{x} {y} {z} " + (lines[state] if nbt < 0 else entities[state] + self.nbt_table[nbt] + "\n")
+            for x, y, z, state, nbt in zip(self.xs, self.ys, self.zs, self.states, self.nbts)
+        )
+
+    def to_bytes(self) -> bytes:
+        """
+        serializes the blocks in binary form, which `BlockFile` reads:
+        a header with the number of blocks, block states and snbt,
+        the columns of the blocks, each a little-endian 32-bit int per block, in the order of `COLUMNS`,
+        the offsets of the block states and the snbt in the string table, and of its end, as little-endian 32-bit ints,
+        then the string table, of each block state and snbt in utf-8
+        :return: the serialized blocks
+        """
+        columns = [getattr(self, column) for column in COLUMNS]
+        strings = [text.encode() for text in self.state_table + self.nbt_table]
+        offsets = array("i", [0])
+        for encoded in strings:
+            offsets.append(offsets[-1] + len(encoded))
+        if sys.byteorder != "little":
+            columns = [array("i", column) for column in columns]
+            for column in columns + [offsets]:
+                column.byteswap()
+        out = bytearray(HEADER.pack(MAGIC, len(self), len(self.state_table), len(self.nbt_table)))
+        for column in columns + [offsets]:
+            out += column.tobytes()
+        out += b"".join(strings)
+        return bytes(out)
+
+    @staticmethod
+    def from_bytes(data: bytes) -> "BlockBuffer":
+        """
+        reads blocks serialized with `to_bytes`
+        :param data: the serialized blocks
+        :return: the blocks
+        """
+        return BlockFile(data).to_buffer()
+
+    def content_hash(self) -> str:
+        """
+        :return: a hash of the blocks, which is the same for the same blocks added in the same order
+        """
+        digest = hashlib.sha256()
+        for column in self.xs, self.ys, self.zs, self.states, self.nbts:
+            digest.update(column.tobytes())
+        for text in self.state_table + self.nbt_table:
+            digest.update(text.encode() + b"\0")
+        return digest.hexdigest()
+
+
+class StringTable(Sequence[str]):
+    """
+    strings stored one after another in a buffer, decoded when they are looked up
+    """
+
+    def __init__(self, data: memoryview, offsets: list[int]):
+        """
+        :param data: the strings, in utf-8
+        :param offsets: the offset of each string in the data, and of the end of the last
+        """
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return str(self.data[self.offsets[index]:self.offsets[index + 1]], "utf-8")
+
+
+class BlockFile:
+    """
+    blocks in binary form, as written by `BlockBuffer.to_bytes`, read without copying them.
+    the columns of the blocks are memoryviews into the data, which for a file is memory-mapped,
+    so only the parts of it that are used are ever read.
+    it has the attributes of a `BlockBuffer` that are used to read blocks, so it can be used in its place for that.
+    """
+
+    xs: memoryview
+    ys: memoryview
+    zs: memoryview
+    states: memoryview
+    nbts: memoryview
+
+    def __init__(self, data, file: Optional[BinaryIO] = None):
+        """
+        :param data: the blocks in binary form, as anything that supports the buffer protocol
+        :param file: the file that the data is mapped from, to close with it
+        """
+        self.file = file
+        self.data = data
+        # the views into the data, to release before it is closed
+        self.views: list[memoryview] = [memoryview(data)]
+        if len(self.views[0]) < HEADER.size:
+            raise ValueError("file of blocks is truncated")
+        magic, count, state_count, nbt_count = HEADER.unpack_from(self.views[0])
+        if magic != MAGIC:
+            raise ValueError("not a file of blocks, or one of another version")
+
+        self.count = count
+        offset = HEADER.size
+        for column in COLUMNS:
+            setattr(self, column, self.ints(offset, count))
+            offset += 4 * count
+        offsets = self.ints(offset, state_count + nbt_count + 1).tolist()
+        strings = self.view(offset + 4 * len(offsets), offsets[-1])
+
+        # the block states are few, and used for every block, so they are decoded up front
+        self.state_table = StringTable(strings, offsets[:state_count + 1])[:]
+        self.nbt_table = StringTable(strings, offsets[state_count:])
+        self.parsed: dict[int, dict] = {}
+
+    def view(self, offset: int, length: int) -> memoryview:
+        """
+        :return: a view of part of the data
+        """
+        if offset + length > len(self.views[0]):
+            raise ValueError("file of blocks is truncated")
+        view = self.views[0][offset:offset + length]
+        self.views.append(view)
+        return view
+
+    def ints(self, offset: int, count: int) -> memoryview:
+        """
+        :return: a view of little-endian 32-bit ints in the data, which is a copy on big-endian machines
+        """
+        view = self.view(offset, 4 * count).cast("i")
+        self.views.append(view)
+        if sys.byteorder != "little":
+            values = array("i", view.tobytes())
+            values.byteswap()
+            view = memoryview(values)
+        return view
+
+    @staticmethod
+    def open(path: str | Path) -> "BlockFile":
+        """
+        memory-maps a file of blocks in binary form
+        :param path: the path of the file
+        :return: the blocks
+        """
+        file = open(path, "rb")
+        try:
+            return BlockFile(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ), file)
+        except ValueError:
+            file.close()
+            raise
+
+    def close(self) -> None:
+        """
+        unmaps the file. the columns can not be used after, and arrays made from them by `arrays` must be gone
+        """
+        for view in reversed(self.views):
+            view.release()
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        if self.file is not None:
+            self.file.close()
+
+    def __enter__(self) -> "BlockFile":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def nbt_value(self, index: int) -> dict:
+        """
+        :return: the parsed nbt of an entry of the nbt table
+        """
+        if index not in self.parsed:
+            self.parsed[index] = parse(self.nbt_table[index])
+        return self.parsed[index]
+
+    def arrays(self) -> dict[str, "numpy.ndarray"]:
+        """
+        :return: the columns of the blocks as numpy arrays, by name, without copying them. this needs numpy
+        """
+        import numpy
+
+        return {column: numpy.frombuffer(getattr(self, column), dtype=numpy.int32) for column in COLUMNS}
+
+    def to_buffer(self) -> BlockBuffer:
+        """
+        copies the blocks into a buffer
+        """
+        buffer = BlockBuffer()
+        for column in COLUMNS:
+            getattr(buffer, column).frombytes(getattr(self, column).cast("B"))
+        for block_id in self.state_table:
+            buffer.state_id(block_id)
+        for snbt in self.nbt_table:
+            buffer.nbt_id(snbt)
+        return buffer
+
+
+def read_blocks(path: str | Path) -> BlockFile | BlockBuffer:
+    """
+    reads blocks from a file, in binary form or as schematic assembly
+    :param path: the path of the file
+    :return: the blocks, memory-mapped if they are in binary form
+    """
+    with open(path, "rb") as file:
+        binary = file.read(len(MAGIC)) == MAGIC
+    if binary:
+        return BlockFile.open(path)
+    buffer = BlockBuffer()
+    with open(path) as file:
+        buffer.add_assembly(file.read())
+    return buffer
+
+
+def emit(file: TextIO | BlockBuffer, pos: Coordinates, block_id: str, snbt: Optional[str] = None,
+         value: Optional[dict] = None):
+    """
+    writes a line of schematic assembly to a file, or adds the block to a buffer
+    :param file: the file or buffer to write to
     :param pos: the position to put the block at
     :param block_id: the id of the block
     :param snbt: nbt data in snbt form for if the block is a block entity
+    :param value: the nbt data, parsed, if it is at hand
     """
+    if isinstance(file, BlockBuffer):
+        file.add(pos, block_id, snbt, value)
+        return
     file.write(f"{pos.x} {pos.y} {pos.z} " + (block_id if snbt is None else (block_id + " " + snbt)) + "\n")
 
 
+def command_block_nbt(command: str, auto: bool) -> tuple[str, dict]:
+    """
+    :param command: the command executed by the command block
+    :param auto: False if the command block is "Needs Redstone", True if it is "Always"
+    :return: the nbt of a command block, as snbt and parsed
+    """
+    if auto:
+        return "{Command:" + quote(command) + ",auto:1b}", {"Command": command, "auto": Byte(1)}
+    return "{Command:" + quote(command) + "}", {"Command": command}
+
+
 def command_block(file, pos: Coordinates, command: str, kind="minecraft:command_block", auto=False) -> None:
     """
     writes a command block to a file
@@ -27,11 +414,41 @@ def command_block(file, pos: Coordinates, command: str, kind="minecraft:command_
     :param kind: the type of command block to use
     :param auto: False if the command block is "Needs Redstone", True if it is "Always"
     """
-    snbt_parts = [f"Command:{repr(command)}"]
-    if auto:
-        snbt_parts.append(f"auto:1b")
-    snbt = "{" + ",".join(snbt_parts) + "}"
-    emit(file, pos, kind, snbt=snbt)
+    emit(file, pos, kind, *command_block_nbt(command, auto))
+
+
+def chain_rows(commands: list[Command]) -> list[list[Command]]:
+    """
+    splits a chain into the rows it is laid out in, at each `Fold`
+    :param commands: the commands of the chain
+    :return: the commands of each row
+    """
+    rows = [[]]
+    for command in commands:
+        if isinstance(command, Fold):
+            rows.append([])
+        else:
+            rows[-1].append(command)
+    return rows
+
+
+def chain_positions(pos: Coordinates, commands: list[Command]) -> list[Optional[Coordinates]]:
+    """
+    finds where `chain` puts each command of a chain
+    :param pos: the position the chain starts at
+    :param commands: the commands of the chain
+    :return: the position of each command, or None for a `Fold`, which has no block
+    """
+    positions = []
+    row_pos = pos
+    for command in commands:
+        if isinstance(command, Fold):
+            positions.append(None)
+            row_pos = Coordinates(pos.x, pos.y, row_pos.z + 2)
+        else:
+            positions.append(row_pos)
+            row_pos += Coordinates(1, 0, 0)
+    return positions
 
 
 def chain(
@@ -42,8 +459,10 @@ def chain(
         only_chain=False,
 ) -> None:
     """
-    writes a chain of command blocks to a file
-    :param file: the file to write to
+    writes a chain of command blocks to a file, or adds them to a buffer, all at once.
+    the chain goes east, and at each `Fold` turns south and back west along the next row, through chain command blocks
+    with no command, to turn south again into the start of the row after
+    :param file: the file or buffer to write to
     :param pos: the position to start the chain at
     :param commands: the commands to put in the chain
     :param start_block: the block to start at
@@ -51,35 +470,68 @@ def chain(
     """
     if len(commands) == 0 and not only_chain:
         raise ValueError("chains must have at least one command")
-    it = iter(commands)
-    if not only_chain:
-        command_block(file, pos, next(it).command, kind=start_block + "[facing=east]")
-        pos += coordinates.EAST
-    for command in it:
-        command_block(file, pos, command.command, kind="minecraft:chain_command_block[facing=east]", auto=True)
-        pos += coordinates.EAST
+    buffer = file if isinstance(file, BlockBuffer) else BlockBuffer()
+    blank = command_block_nbt("", True)
+    rows = chain_rows(commands)
+    for index, row in enumerate(rows):
+        row_pos = pos + Coordinates(0, 0, 2 * index)
+        kinds = ["minecraft:chain_command_block[facing=east]"] * len(row)
+        nbts = [command_block_nbt(command.command, True) for command in row]
+        if index == 0 and not only_chain:
+            kinds[0] = start_block + "[facing=east]"
+            nbts[0] = command_block_nbt(row[0].command, False)
+        buffer.add_row(row_pos, kinds, (snbt for snbt, _ in nbts), (value for _, value in nbts))
+        if index == len(rows) - 1:
+            break
+        buffer.add(row_pos + Coordinates(len(row), 0, 0), "minecraft:chain_command_block[facing=south]", *blank)
+        buffer.add_row(
+            row_pos + Coordinates(1, 0, 1),
+            ["minecraft:chain_command_block[facing=west]"] * len(row),
+            repeat(blank[0], len(row)),
+            repeat(blank[1], len(row)),
+        )
+        buffer.add(row_pos + Coordinates(0, 0, 1), "minecraft:chain_command_block[facing=south]", *blank)
+    if buffer is not file:
+        buffer.write_blk(file)
 
 
-def run_schematic_assembler(src: str, dst: str) -> None:
+def assemble_schematic(function: Callable[[BlockBuffer], None], name: str = None) -> None:
     """
-    invokes the schematic assembler program
-    :param src: source file
-    :param dst: destination file
-    """
-    subprocess.Popen(["bin/schematic_assembler", src, dst])
-
-
-def assemble_schematic(function: Callable[[TextIO], None], name: str = None) -> None:
-    """
-    assembles a schematic with a function
+    generates a schematic with a function, which writes its blocks to the buffer it is given as it would to a file
+    of schematic assembly, and writes it to `schematics`, returning once it is written.
+    the schematic is only written again if its blocks changed. with the `blk` setting, the blocks are written to `generated`
+    as well, as schematic assembly or in binary form, if they changed.
     :param function: the function to use
     :param name: the name of the schematic, defaults to function name
     """
+    from computer.codegen import cache, schematic
 
     if name is None:
         name = function.__name__
 
-    Path("generated").mkdir(exist_ok=True)
-    with open(f"generated/{name}.blk", "w") as file:
-        function(file)
-        run_schematic_assembler(f"generated/{name}.blk", f"schematics/{name}.schematic")
+    blocks = BlockBuffer()
+    function(blocks)
+
+    blk = settings().blk
+    if blk == "text":
+        Path("generated").mkdir(exist_ok=True)
+        src = Path(f"generated/{name}.blk")
+        assembly = io.StringIO()
+        blocks.write_blk(assembly)
+        if not src.exists() or src.read_text() != assembly.getvalue():
+            src.write_text(assembly.getvalue())
+    elif blk == "binary":
+        Path("generated").mkdir(exist_ok=True)
+        src = Path(f"generated/{name}.blkb")
+        data = blocks.to_bytes()
+        if not src.exists() or src.read_bytes() != data:
+            src.write_bytes(data)
+
+    dst = Path(f"schematics/{name}.schematic")
+    key = blocks.content_hash()
+    if cache.up_to_date(dst, key):
+        print(f"{dst} is up to date")
+        return
+    dst.parent.mkdir(exist_ok=True)
+    schematic.save(blocks, dst, name)
+    cache.record(dst, key)
@@ -0,0 +1,115 @@
+"""
+writing of sponge schematics, version 3, straight from a buffer of the blocks that are generated,
+without writing schematic assembly for the schematic assembler to parse again.
+"""
+
+from __future__ import annotations
+
+import time
+from array import array
+from pathlib import Path
+from typing import Optional, TYPE_CHECKING
+
+from computer.codegen import nbt
+from computer.codegen.coordinates import Coordinates
+from computer.codegen.snbt import IntArray, Long, Short
+
+if TYPE_CHECKING:
+    from computer.codegen.output import BlockBuffer
+
+# the version of the schematic format
+VERSION = 3
+# the version of the game that the blocks are written for, 1.20.2
+DATA_VERSION = 3578
+
+AIR = "minecraft:air"
+
+
+def varint(value: int) -> bytes:
+    """
+    encodes an unsigned int as a varint, seven bits at a time, least significant first
+    """
+    encoded = bytearray()
+    while value & ~0x7f:
+        encoded.append(value & 0x7f | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def unsigned_short(value: int) -> Short:
+    """
+    encodes a dimension of the schematic, which is an unsigned short, as the signed short that nbt stores
+    """
+    if not 0 <= value <= 0xffff:
+        raise ValueError(f"schematic is {value} blocks long, more than the {0xffff} a schematic can hold")
+    return Short(value - 0x10000 if value > 0x7fff else value)
+
+
+def to_nbt(blocks: BlockBuffer, name: str = "Schematic", offset: Optional[Coordinates] = None) -> dict:
+    """
+    lays blocks out in a schematic.
+    the schematic spans from the origin to the furthest block, and is filled with air where there are no blocks.
+    a block added where there already is one replaces it.
+    :param blocks: the blocks
+    :param name: the name of the schematic
+    :param offset: where the origin of the blocks is, relative to where the schematic is pasted
+    :return: the schematic, as the compound in the root tag of its file
+    """
+    if len(blocks) and min(min(blocks.xs), min(blocks.ys), min(blocks.zs)) < 0:
+        raise ValueError("blocks with negative coordinates are outside the schematic")
+    width = max(blocks.xs, default=-1) + 1
+    height = max(blocks.ys, default=-1) + 1
+    length = max(blocks.zs, default=-1) + 1
+
+    # the palette holds the block states that are used, in the order they were first used
+    used = sorted(set(blocks.states))
+    palette = {blocks.state_table[state]: index for index, state in enumerate(used)}
+    states = dict(zip(used, range(len(used))))
+    air = palette.setdefault(AIR, len(palette))
+    # the blocks are stored by x, then z, then y
+    cells = array("I", [air]) * (width * height * length)
+    for x, y, z, state in zip(blocks.xs, blocks.ys, blocks.zs, blocks.states):
+        cells[x + z * width + y * width * length] = states[state]
+
+    block_entities = [
+        # the id of the block entity is that of the block, without its block state
+        {"Pos": IntArray([x, y, z]), "Id": blocks.state_table[state].split("[")[0], "Data": blocks.nbt_value(nbt)}
+        for x, y, z, state, nbt in zip(blocks.xs, blocks.ys, blocks.zs, blocks.states, blocks.nbts)
+        if nbt >= 0
+    ]
+
+    encoded = [varint(state) for state in range(len(palette))]
+    schematic_blocks = {
+        "Palette": palette,
+        "Data": b"".join(map(encoded.__getitem__, cells)),
+    }
+    if block_entities:
+        schematic_blocks["BlockEntities"] = block_entities
+
+    result = {
+        "Version": VERSION,
+        "DataVersion": DATA_VERSION,
+        "Metadata": {
+            "Name": name,
+            "Date": Long(time.time_ns() // 1_000_000),
+        },
+        "Width": unsigned_short(width),
+        "Height": unsigned_short(height),
+        "Length": unsigned_short(length),
+        "Blocks": schematic_blocks,
+    }
+    if offset is not None:
+        result["Offset"] = IntArray([offset.x, offset.y, offset.z])
+    return {"Schematic": result}
+
+
+def save(blocks: BlockBuffer, path: str | Path, name: str = "Schematic", offset: Optional[Coordinates] = None) -> None:
+    """
+    writes blocks to a schematic file, as gzipped nbt, returning once it is complete
+    :param blocks: the blocks
+    :param path: the path of the file
+    :param name: the name of the schematic
+    :param offset: where the origin of the blocks is, relative to where the schematic is pasted
+    """
+    nbt.write_gzip(path, to_nbt(blocks, name, offset))
@@ -0,0 +1,204 @@
+"""
+the state of a build, kept in a `BuildSession` instead of in modules.
+
+the code generator finds the current session through a context variable, so one process can build many variants of
+the computer, each in a session of its own. outside any session, the default session is used,
+which is the one that state made at import time, such as the registers, belongs to.
+
+    with BuildSession():
+        groups = build_computer()
+
+the settings of a build, such as whether it is a datapack, are part of its session, as `Settings`.
+a new session takes a copy of those of the current session unless it is given its own.
+
+    with BuildSession(settings=Settings(datapack=True)):
+        groups = build_computer()
+"""
+
+from __future__ import annotations
+
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from computer.codegen.chain_context import ChainContext
+    from computer.codegen.execute import Branch, Condition
+    from computer.codegen.variable import Variable
+
+# functions that set up each new session, such as by declaring the registers in it
+initializers: list[Callable[[], None]] = []
+
+# the current session
+SESSION: ContextVar[BuildSession] = ContextVar("session")
+# the session used outside any other, which is made when it is first needed
+DEFAULT_SESSION: Optional[BuildSession] = None
+
+
+@dataclass
+class Settings:
+    """
+    the settings that the computer is built with, as given to `generate_computer`
+    """
+
+    # whether chains are optimized by the peephole optimizer
+    optimize: bool = True
+    # whether output is reused from the cache
+    cache: bool = True
+    # how `assemble_schematic` also writes the blocks of a schematic out, for debugging and the interpreter:
+    # "text" for schematic assembly, "binary" for binary form, or None not to
+    blk: Optional[str] = None
+    # whether chain contexts are written out as the functions of a datapack, instead of as command blocks
+    datapack: bool = False
+    # the number of lines in the instruction cache, or 0 if there is no cache
+    icache: int = 0
+    # the number of slots in the stack cache, or 0 if there is no cache
+    stack_cache: int = 0
+    # whether a compare only records its operands, for the conditional jumps to compare, instead of setting the flags
+    lazy_flags: bool = False
+    # whether a condition that more than one command depends on, such as the condition of a `run_if` with more than
+    # one command or with a `run_else`, is evaluated once into a score that the commands test, instead of for each
+    # command
+    materialize_conditions: bool = False
+    # how registers are accessed, by register id:
+    # "bank", by running a copy of the register's command from the register bank, or calling a function that switches
+    # on the register id in a datapack,
+    # or "fan-out", by testing the register id against every register, with a command for each
+    registers: str = "bank"
+    # whether the r32, r32 arithmetic instructions have a handler for every pair of registers
+    specialise: bool = False
+    # where memory is kept: "barrel", in the items of a cube of barrels, or "scoreboard", which needs a datapack
+    memory: str = "barrel"
+    # the number of words of scoreboard memory
+    memory_size: int = 256
+    # whether each word of barrel memory is stored as a single int, instead of in the counts of two items
+    packed_memory: bool = False
+    # the number of instructions the primary chain runs each tick, or 0 to run as many as `tick_budget` allows
+    steps: int = 1
+    # the most commands the primary chain may run in a tick, which is the default of the maxCommandChainLength game rule
+    tick_budget: int = 65536
+    # the number of processes to build the groups in, each in a build session of its own, or 0 to build them in this one
+    jobs: int = 0
+
+
+class BuildSession:
+    """
+    the state of a build: its chain contexts, names, constants and entity tags.
+    a session is made current with `with`, and can be entered more than once.
+    """
+
+    # the chain contexts that commands are being generated for, innermost last
+    chain_context_stack: list[ChainContext]
+    # the context for commands to be run at initialize-time
+    init_context: ChainContext
+    # the names of variables taken
+    registered_names: set[str]
+    # the next number to try appending to each base name
+    name_counters: dict[str, int]
+    # the names that temporaries share, in the order they were made
+    temporary_pool: list[str]
+    # the variables holding constants, by value
+    registered_constants: dict[int, Variable]
+    # the number of entity tags taken
+    max_tag: int
+    # the condition of the last `run_if` or `run_unless`, for `run_else`
+    last_cond: Optional[Condition]
+    last_negated: Optional[bool]
+    # the commands of the last `run_if` or `run_unless`, for `run_else` to evaluate its condition once
+    last_branch: Optional[Branch]
+    # the names of the functions of chain contexts in a datapack, by chain context
+    function_names: dict[ChainContext, str]
+    # the chain contexts that were made for functions outside of any group
+    functions: list[ChainContext]
+    # the state of the modules that build the computer, by name, see `state`
+    modules: dict[str, Any]
+    # a prefix for the names and tags taken from now on, so that they are not taken by sessions built apart from this
+    # one, whose output is merged with its own
+    namespace: str
+    # the settings the build is made with
+    settings: Settings
+
+    def __init__(self, max_tag: Optional[int] = None, settings: Optional[Settings] = None):
+        """
+        :param max_tag: the number of entity tags taken. by default, those of the default session, so that the
+        entities made at import time keep tags of their own
+        :param settings: the settings of the build. by default, a copy of those of the current session
+        """
+        from computer.codegen.chain_context import ChainContext
+
+        self.chain_context_stack = []
+        self.init_context = ChainContext(name="init")
+        self.registered_names = set()
+        self.name_counters = {}
+        self.temporary_pool = []
+        self.registered_constants = {}
+        if max_tag is None:
+            max_tag = DEFAULT_SESSION.max_tag if DEFAULT_SESSION is not None else 0
+        self.max_tag = max_tag
+        self.last_cond = None
+        self.last_negated = None
+        self.last_branch = None
+        self.function_names = {}
+        self.functions = []
+        self.modules = {}
+        self.namespace = ""
+        if settings is None:
+            session = SESSION.get(None) or DEFAULT_SESSION
+            settings = replace(session.settings) if session is not None else Settings()
+        self.settings = settings
+        self.tokens: list[Token] = []
+
+        with self:
+            for initializer in initializers:
+                initializer()
+
+    def __enter__(self) -> BuildSession:
+        self.tokens.append(SESSION.set(self))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        SESSION.reset(self.tokens.pop())
+
+
+def current() -> BuildSession:
+    """
+    :return: the current session
+    """
+    global DEFAULT_SESSION
+
+    session = SESSION.get(None)
+    if session is not None:
+        return session
+    if DEFAULT_SESSION is None:
+        DEFAULT_SESSION = BuildSession()
+    return DEFAULT_SESSION
+
+
+def settings() -> Settings:
+    """
+    :return: the settings of the current session
+    """
+    return current().settings
+
+
+def state(name: str, factory: Callable[[], Any]) -> Any:
+    """
+    finds the state a module keeps in the current session, making it if there is none yet
+    :param name: the name of the state
+    :param factory: makes the state
+    :return: the state
+    """
+    modules = current().modules
+    if name not in modules:
+        modules[name] = factory()
+    return modules[name]
+
+
+def initializer(function: Callable[[], None]) -> Callable[[], None]:
+    """
+    registers a function to set up every session made from now on, for use as a decorator
+    :param function: the function
+    :return: the function
+    """
+    initializers.append(function)
+    return function
@@ -0,0 +1,248 @@
+"""
+parsing and formatting of stringified nbt, as used in block entity data and commands.
+
+nbt values are represented with plain python types where the mapping is unambiguous:
+compounds are dicts, lists are lists, strings are strs, ints are TAG_Int and floats are TAG_Double.
+the other numeric and array tags get their own subclasses, so that the tag type survives a round trip.
+"""
+
+import re
+
+
+class Byte(int):
+    pass
+
+
+class Short(int):
+    pass
+
+
+class Long(int):
+    pass
+
+
+class Float(float):
+    pass
+
+
+class ByteArray(list):
+    pass
+
+
+class IntArray(list):
+    pass
+
+
+class LongArray(list):
+    pass
+
+
+NUMBER_SUFFIXES = {
+    "b": Byte,
+    "s": Short,
+    "l": Long,
+    "f": Float,
+    "d": float,
+}
+
+ARRAY_PREFIXES = {
+    "B": (ByteArray, Byte),
+    "I": (IntArray, int),
+    "L": (LongArray, Long),
+}
+
+UNQUOTED = re.compile(r"[A-Za-z0-9._+\-]+")
+INTEGER = re.compile(r"[+-]?\d+")
+DECIMAL = re.compile(r"[+-]?(\d+\.?\d*|\.\d+)(e[+-]?\d+)?", re.IGNORECASE)
+
+
+class SnbtError(ValueError):
+    pass
+
+
+class Parser:
+    """
+    a recursive descent parser over a single snbt string
+    """
+
+    def __init__(self, s: str, pos: int = 0):
+        self.s = s
+        self.pos = pos
+
+    def error(self, message: str) -> SnbtError:
+        return SnbtError(f"{message} at position {self.pos} in {self.s!r}")
+
+    def skip_whitespace(self) -> None:
+        while self.pos < len(self.s) and self.s[self.pos].isspace():
+            self.pos += 1
+
+    def peek(self) -> str:
+        self.skip_whitespace()
+        if self.pos >= len(self.s):
+            raise self.error("unexpected end of input")
+        return self.s[self.pos]
+
+    def expect(self, c: str) -> None:
+        if self.peek() != c:
+            raise self.error(f"expected {c!r}")
+        self.pos += 1
+
+    def value(self):
+        match self.peek():
+            case "{":
+                return self.compound()
+            case "[":
+                return self.list()
+            case "'" | '"':
+                return self.quoted()
+            case _:
+                return self.literal(self.unquoted())
+
+    def compound(self) -> dict:
+        self.expect("{")
+        compound = {}
+        if self.peek() == "}":
+            self.pos += 1
+            return compound
+        while True:
+            key = self.quoted() if self.peek() in "'\"" else self.unquoted()
+            self.expect(":")
+            compound[key] = self.value()
+            if self.peek() == ",":
+                self.pos += 1
+            else:
+                self.expect("}")
+                return compound
+
+    def list(self) -> list:
+        self.expect("[")
+        result = []
+        element = None
+        if self.s[self.pos:self.pos + 2] in ("B;", "I;", "L;"):
+            result, element = ARRAY_PREFIXES[self.s[self.pos]]
+            result = result()
+            self.pos += 2
+        if self.peek() == "]":
+            self.pos += 1
+            return result
+        while True:
+            item = self.value()
+            result.append(item if element is None else element(item))
+            if self.peek() == ",":
+                self.pos += 1
+            else:
+                self.expect("]")
+                return result
+
+    def quoted(self) -> str:
+        quote = self.peek()
+        self.pos += 1
+        chars = []
+        while True:
+            if self.pos >= len(self.s):
+                raise self.error("unterminated string")
+            c = self.s[self.pos]
+            self.pos += 1
+            if c == "\\":
+                chars.append(self.s[self.pos])
+                self.pos += 1
+            elif c == quote:
+                return "".join(chars)
+            else:
+                chars.append(c)
+
+    def unquoted(self) -> str:
+        self.skip_whitespace()
+        m = UNQUOTED.match(self.s, self.pos)
+        if m is None:
+            raise self.error("expected a value")
+        self.pos = m.end()
+        return m[0]
+
+    @staticmethod
+    def literal(token: str):
+        lower = token.lower()
+        if lower == "true":
+            return Byte(1)
+        if lower == "false":
+            return Byte(0)
+        suffix = NUMBER_SUFFIXES.get(lower[-1])
+        if suffix is not None and DECIMAL.fullmatch(token[:-1]):
+            if suffix in (Byte, Short, Long) and not INTEGER.fullmatch(token[:-1]):
+                return token
+            return suffix(float(token[:-1])) if suffix in (Float, float) else suffix(int(token[:-1]))
+        if INTEGER.fullmatch(token):
+            return int(token)
+        if DECIMAL.fullmatch(token):
+            return float(token)
+        return token
+
+
+def parse(s: str):
+    """
+    parses an snbt string
+    :param s: the string to parse
+    :return: the parsed value
+    """
+    parser = Parser(s)
+    value = parser.value()
+    parser.skip_whitespace()
+    if parser.pos != len(s):
+        raise parser.error("trailing characters")
+    return value
+
+
+def parse_prefix(s: str, pos: int = 0) -> tuple[object, int]:
+    """
+    parses an snbt value at the start of a string, returning the position after it
+    :param s: the string to parse
+    :param pos: the position to start at
+    :return: the parsed value and the position of the rest of the string
+    """
+    parser = Parser(s, pos)
+    value = parser.value()
+    return value, parser.pos
+
+
+def quote(s: str) -> str:
+    """
+    quotes a string for snbt, preferring single quotes as `repr` does
+    """
+    q = '"' if "'" in s and '"' not in s else "'"
+    return q + s.replace("\\", "\\\\").replace(q, "\\" + q) + q
+
+
+def to_snbt(value) -> str:
+    """
+    formats a value as snbt, inverse to `parse`
+    :param value: the value to format
+    :return: the snbt string
+    """
+    match value:
+        case dict():
+            return "{" + ",".join(
+                (k if UNQUOTED.fullmatch(k) else quote(k)) + ":" + to_snbt(v) for k, v in value.items()
+            ) + "}"
+        case ByteArray() | IntArray() | LongArray():
+            prefix = {ByteArray: "B", IntArray: "I", LongArray: "L"}[type(value)]
+            return f"[{prefix};" + ",".join(to_snbt(v) for v in value) + "]"
+        case list():
+            return "[" + ",".join(to_snbt(v) for v in value) + "]"
+        case str():
+            return quote(value)
+        case Byte():
+            return f"{int(value)}b"
+        case Short():
+            return f"{int(value)}s"
+        case Long():
+            return f"{int(value)}L"
+        case Float():
+            return f"{float(value)}f"
+        case bool():
+            return "1b" if value else "0b"
+        case int():
+            return str(value)
+        case float():
+            return f"{value}d"
+        case _:
+            raise ValueError(f"can't format {value!r} as snbt")
@@ -1,31 +1,94 @@
 from __future__ import annotations
 
+import bisect
+import heapq
 from dataclasses import dataclass
 from typing import Optional
 
-from computer.codegen.chain_context import command, capture, INIT_CONTEXT
-from computer.codegen.command import Command
+from computer.codegen.chain_context import command, capture, init_context, ChainContext, home_context
+from computer.codegen.command import Command, Score, Constant, Temporary, ScoreCompare, ScoreMatches, ScoreSet, ScoreAdd, \
+    ScoreReset, ScoreGet, ScoreOperation
 from computer.codegen.execute import StoreLocation, Condition
-
-registered_names = set()
+from computer.codegen.optimize import effects
+from computer.codegen.session import current
 
 
 def find_name(base_name: str) -> str:
     """
-    finds a name for a variable, adding numbers to the end if necessary
+    finds a name for a variable, adding numbers to the end if necessary.
+    the name starts with the namespace of the current session
     :param base_name: the name to try first or append numbers to if it is taken
     :return: the found name
     """
+    base_name = current().namespace + base_name
+    registered_names = current().registered_names
     if base_name in registered_names:
-        n = 0
-        while True:
-            trial = base_name + str(n)
-            if trial not in registered_names:
-                return trial
+        name_counters = current().name_counters
+        n = name_counters.get(base_name, 0)
+        while base_name + str(n) in registered_names:
             n += 1
+        name_counters[base_name] = n + 1
+        return base_name + str(n)
     return base_name
 
 
+def register_name(base_name: str) -> str:
+    """
+    finds a name for a variable and registers it
+    :param base_name: the name to try first or append numbers to if it is taken
+    :return: the registered name
+    """
+    name = find_name(base_name)
+    current().registered_names.add(name)
+    return name
+
+
+def allocate_temporaries(ctx: ChainContext) -> None:
+    """
+    names the temporaries in a chain context that have not been named yet.
+    a temporary is live from the command that sets it to the last command that uses it.
+    if no other code can run while it is live, it takes a name from a pool shared by every chain,
+    which it shares with temporaries that are never live at the same time.
+    temporaries that are used in other contexts, read before they are set or live across a command that may run other
+    code, such as a `clone`, get names of their own.
+    :param ctx: the context being written out
+    """
+    first: dict[Temporary, int] = {}
+    last: dict[Temporary, int] = {}
+    barriers = []
+    for i, cmd in enumerate(ctx.contents):
+        for score in cmd.scores():
+            if isinstance(score, Temporary) and not score.named:
+                first.setdefault(score, i)
+                last[score] = i
+        if effects(cmd).barrier:
+            barriers.append(i)
+    if not first:
+        return
+
+    temporary_pool = current().temporary_pool
+    free = temporary_pool[::-1]
+    # the pooled names in use, with the index of the command that last uses them
+    live: list[tuple[int, str]] = []
+    for temporary, start in first.items():
+        end = last[temporary]
+        temporary.named = True
+        if (temporary.pinned or temporary.home is not ctx
+                or temporary not in effects(ctx.contents[start]).kills
+                or bisect.bisect_left(barriers, end) > bisect.bisect_right(barriers, start)):
+            temporary.pinned = True
+            temporary.player = register_name(temporary.player)
+            continue
+        while live and live[0][0] < start:
+            free.append(heapq.heappop(live)[1])
+        if free:
+            temporary.player = free.pop()
+        else:
+            temporary.player = register_name(f"tmp{len(temporary_pool)}")
+            temporary_pool.append(temporary.player)
+        heapq.heappush(live, (end, temporary.player))
+
+
 @dataclass
 class VariableComparison(Condition):
     """
@@ -36,8 +99,8 @@ class VariableComparison(Condition):
     operator: str
     right: Variable
 
-    def condition(self, *args):
-        return f"score {self.left.name} vars {self.operator} {self.right.name} vars"
+    def condition(self, *args) -> ScoreCompare:
+        return ScoreCompare(self.left.score, self.operator, self.right.score)
 
 
 @dataclass
@@ -71,11 +134,8 @@ class VariableMatches(Condition):
     variable: Variable
     int_range: IntRange | int
 
-    def condition(self, *args) -> str:
-        return f"score {self.variable.name} vars matches {self.int_range}"
-
-
-registered_constants: dict[int, Variable] = {}
+    def condition(self, *args) -> ScoreMatches:
+        return ScoreMatches(self.variable.score, f"{self.int_range}")
 
 
 class Variable(StoreLocation):
@@ -83,20 +143,35 @@ class Variable(StoreLocation):
     a scoreboard variable for use in runtime computations
     """
 
-    def __init__(self, name: str, value: int = 0):
-        name = find_name(name)
-        if name in registered_names:
-            raise Exception(f"duplicate name: {name}")
-        self.name = name
-        registered_names.add(name)
+    def __init__(self, name: str, value: int = 0, temporary: bool = False, constant: bool = False):
+        """
+        :param name: the name of the variable, which has a number added to it if it is taken
+        :param value: the initial value of the variable
+        :param temporary: whether the variable only holds a value within the current chain context,
+        in which case its name is allocated when the chain context is written out
+        :param constant: whether the variable holds the constant `value`, in which case it is named after it
+        without the namespace, since every namespace shares it
+        """
+        self.temporary = temporary
+        if temporary:
+            self.name = name
+            self.score = Temporary(name, "vars", home_context())
+        else:
+            name = str(value) if constant else find_name(name)
+            if name in current().registered_names:
+                raise Exception(f"duplicate name: {name}")
+            self.name = name
+            self.score = Constant(value, "vars") if constant else Score(name, "vars")
+            current().registered_names.add(name)
         self.set(value)
 
     def delete(self) -> None:
         """
         removes the variable from the scoreboard and the registered name list
         """
-        registered_names.remove(self.name)
-        command(f"scoreboard players reset {self.name} vars")
+        if not self.temporary:
+            current().registered_names.remove(self.name)
+        command(ScoreReset(self.score))
 
     @staticmethod
     def constant(const: int) -> Variable:
@@ -105,9 +180,10 @@ class Variable(StoreLocation):
         :param const: the constant
         :return: the variable
         """
+        registered_constants = current().registered_constants
         if const not in registered_constants:
-            with INIT_CONTEXT:
-                var = Variable(str(const), const)
+            with init_context():
+                var = Variable(str(const), const, constant=True)
             registered_constants[const] = var
             return var
         return registered_constants[const]
@@ -122,11 +198,8 @@ class Variable(StoreLocation):
         """
         if inplace:
             if isinstance(src, int):
-                Variable.constant(src)
-                src_name = str(src)
-            else:
-                src_name = src.name
-            command(f"scoreboard players operation {self.name} vars {op} {src_name} vars")
+                src = Variable.constant(src)
+            command(ScoreOperation(self.score, op, src.score))
             return self
         else:
             var = self.clone()
@@ -141,7 +214,7 @@ class Variable(StoreLocation):
         if isinstance(other, Variable):
             self.operation("=", other)
         else:
-            command(f"scoreboard players set {self.name} vars {other}")
+            command(ScoreSet(self.score, other))
 
     def __add__(self, other):
         if isinstance(other, Variable):
@@ -153,7 +226,7 @@ class Variable(StoreLocation):
     def __iadd__(self, other):
         if isinstance(other, Variable):
             return self.operation("+=", other)
-        command(f"scoreboard players add {self.name} vars {other}")
+        command(ScoreAdd(self.score, other))
         return self
 
     def __sub__(self, other):
@@ -166,7 +239,7 @@ class Variable(StoreLocation):
     def __isub__(self, other):
         if isinstance(other, Variable):
             return self.operation("-=", other)
-        command(f"scoreboard players remove {self.name} vars {other}")
+        command(ScoreAdd(self.score, -other))
         return self
 
     def __mul__(self, other):
@@ -243,7 +316,7 @@ class Variable(StoreLocation):
         returns a copy of the variable with the same value
         :return: the new variable
         """
-        var = Variable(find_name(base_name))
+        var = Variable(base_name, temporary=True)
         var.set(self)
         return var
 
@@ -273,8 +346,7 @@ class Variable(StoreLocation):
         sign extends the current value in place
         :param width: the width to sign extend from
         """
-        n = 1 << (width - 1)
-        (self >= n).if_true(capture()(self.__isub__(n)))
+        (self >= 1 << (width - 1)).if_true(capture()(self.__isub__(1 << width)))
 
     def sign_extended(self, width: int) -> Variable:
         """
@@ -286,15 +358,15 @@ class Variable(StoreLocation):
         var.sign_extend(width)
         return var
 
-    def store_location(self) -> str:
-        return f"score {self.name} vars"
+    def store_location(self) -> Score:
+        return self.score
 
     def get(self) -> Command:
         """
         returns a command to get the value of the variable
         :return: the command
         """
-        return Command(f"scoreboard players get {self.name} vars")
+        return ScoreGet(self.score)
 
     def matches(self, int_range: IntRange) -> VariableMatches:
         return VariableMatches(self, int_range)
@@ -1,3 +1,3 @@
-from computer.computer.generate_computer import generate_computer
+from computer.computer.generate_computer import main
 
-generate_computer()
+main()
@@ -1,35 +1,68 @@
-from computer.codegen.chain_context import ChainGroup, INIT_CONTEXT, command
+from computer.assembler.instruction import GP_NAMES
+from computer.assembler.listings import instructions
+from computer.codegen.chain_context import ChainGroup, init_context, command
+from computer.codegen.command import Say
 from computer.codegen.execute import run_if, run_else
+from computer.codegen.session import settings
 from computer.codegen.variable import Variable
 from computer.codegen.vector_variable import VectorVariable
-from computer.computer import memory
+from computer.computer import memory, stack, flags
 from computer.computer.clone import execute_arbitrary_code
-from computer.computer.layout import ARITHMETIC_GROUP_POS, BINARY_OP_BASE, UNARY_OP_BASE
-from computer.computer.memory import memory_load, memory_store
-from computer.computer.registers import OPCODE, get_gpr, set_gpr, LF, LE, EQ, NE, GE, GT, get_scratch, set_scratch, \
-    CONSTANT_REGISTER
+from computer.computer.layout import ARITHMETIC_GROUP_POS, BINARY_OP_BASE, UNARY_OP_BASE, SPECIALISED_OP_BASE
+from computer.computer.registers import OPCODE, get_gpr, set_gpr, get_scratch, set_scratch, CONSTANT_REGISTER, \
+    GP_REGISTERS
 from computer.computer.logging import log
 
+# the instructions that are specialised, whose words start at 0 and follow on from each other
+SPECIALISED_INSTRUCTIONS = [instruction for instruction in instructions if instruction.field_types == ["r32", "r32"]]
+SPECIALISED_WORDS = len(SPECIALISED_INSTRUCTIONS) * len(GP_REGISTERS) ** 2
+
+
+def split(dst: Variable, src: Variable) -> None:
+    """
+    splits a register into its low 9 bits, which go into another register, and the rest
+    :param dst: the register for the low bits
+    :param src: the register to split, which keeps the rest
+    """
+    if dst is not src:
+        dst.set(src)
+        dst %= 0o1000
+    src /= 0o1000
+
+
+# the operations of the specialised instructions, by mnemonic, on the registers they name
+SPECIALISED_OPERATIONS = {
+    "mov": Variable.set,
+    "add": Variable.__iadd__,
+    "sub": Variable.__isub__,
+    "mul": Variable.__imul__,
+    "div": Variable.__itruediv__,
+    "mod": Variable.__imod__,
+    "min": lambda dst, src: dst.min(src, inplace=True),
+    "max": lambda dst, src: dst.max(src, inplace=True),
+    "split": split,
+    "cmp": lambda dst, src: flags.compare(dst, src),
+}
+
 
 def arithmetic_instructions() -> ChainGroup:
-    with INIT_CONTEXT:
+    with init_context():
         log("init: initialize a and b")
         a = Variable("a")
         b = Variable("b")
 
-    group = ChainGroup(only_chain=True)
+    group = ChainGroup(name="arithmetic", only_chain=True)
 
     first_argument: Variable
     second_argument: Variable
 
-    with (group.new()):  # dispatch
+    with group.new(name="dispatch"):
         log("dispatching arithmetic instruction")
         binary_offset = OPCODE.clone("binary_offset")
         binary_offset /= 64
-        binary_offset %= 8
 
         unary_offset = OPCODE.clone("unary_offset")
-        unary_offset -= 1600
+        unary_offset -= 0o1600
         unary_offset /= 8
 
         first_argument = OPCODE.clone("first_argument")
@@ -53,13 +86,18 @@ def arithmetic_instructions() -> ChainGroup:
             log("running unary operation")
             indirect_z.set(UNARY_OP_BASE.z)
             indirect_z += unary_offset
+        if settings().specialise:
+            with run_if(OPCODE < SPECIALISED_WORDS):
+                # run the handler for the instruction word
+                indirect_z.set(OPCODE)
+                indirect_z += SPECIALISED_OP_BASE.z
         indirect = VectorVariable(
             "arithmetic_indirect",
             indirect_x,
             indirect_y,
             indirect_z)
 
-        execute_arbitrary_code(indirect, 50)
+        execute_arbitrary_code(indirect, group)
 
     def binary_op(f):
         get_gpr(second_argument, a)
@@ -68,117 +106,138 @@ def arithmetic_instructions() -> ChainGroup:
         set_gpr(second_argument, a)
 
     # first eight: simple binary operations
-    with group.new():  # move
+    with group.new(name="move"):
         binary_op(Variable.set)
-    with group.new():  # add
+    with group.new(name="add"):
         binary_op(Variable.__iadd__)
-    with group.new():  # subtract
+    with group.new(name="subtract"):
         binary_op(Variable.__isub__)
-    with group.new():  # multiply
+    with group.new(name="multiply"):
         binary_op(Variable.__imul__)
-    with group.new():  # divide
+    with group.new(name="divide"):
         binary_op(Variable.__itruediv__)
-    with group.new():  # modulo
+    with group.new(name="modulo"):
         binary_op(Variable.__imod__)
-    with group.new():  # minimum
-        binary_op(lambda dst, src: dst.min(src))
-    with group.new():  # maximum
-        binary_op(lambda dst, src: dst.max(src))
+    with group.new(name="minimum"):
+        binary_op(lambda dst, src: dst.min(src, inplace=True))
+    with group.new(name="maximum"):
+        binary_op(lambda dst, src: dst.max(src, inplace=True))
 
     # next six: complex binary operations
-    with group.new():  # split
-        def split(dst: Variable, src: Variable):
-            dst.set(src)
-            dst %= 0o1000
-            src /= 0o1000
-        binary_op(split)
-    with group.new():  # cmp
-        def cmp(dst: Variable, src: Variable | int):
-            with run_if(dst < src):
-                LF.set(1)
-            with run_else():
-                LF.set(0)
-            with run_if(dst <= src):
-                LE.set(1)
-            with run_else():
-                LE.set(0)
-            with run_if(dst == src):
-                EQ.set(1)
-                NE.set(0)
-            with run_else():
-                EQ.set(0)
-                NE.set(1)
-            with run_if(dst >= src):
-                GE.set(1)
-            with run_else():
-                GE.set(0)
-            with run_if(dst > src):
-                GT.set(1)
-            with run_else():
-                GT.set(0)
-        binary_op(cmp)
-
-    with group.new():  # mov from scratch
+    with group.new(name="split"):
+        # both registers are written back, the source last, so that it wins when they are the same register
+        get_gpr(second_argument, a)
+        get_gpr(first_argument, b)
+        split(a, b)
+        set_gpr(second_argument, a)
+        set_gpr(first_argument, b)
+    with group.new(name="cmp"):
+        binary_op(flags.compare)
+
+    with group.new(name="mov from scratch"):
         get_scratch(first_argument, a)
         set_gpr(second_argument, a)
-    with group.new():  # mov into scratch
+    with group.new(name="mov into scratch"):
         get_gpr(first_argument, a)
         set_scratch(second_argument, a)
-    with group.new():  # memory load
+    with group.new(name="memory load"):
         get_gpr(first_argument, a)
-        get_gpr(second_argument, b)
-
-        memory_load(a, b)
-    with group.new():  # memory store
+        stack.load(a, b)
+        set_gpr(second_argument, b)
+    with group.new(name="memory store"):
         get_gpr(second_argument, a)
         get_gpr(first_argument, b)
 
-        memory_store(a, b)
+        stack.store(a, b)
 
-    # next eight: simple unary operations
-    with group.new():  # load from cr
-        set_gpr(second_argument, CONSTANT_REGISTER)
-    with group.new():  # increment
+    # next eight: simple unary operations, on the register in the low bits
+    with group.new(name="load from cr"):
+        set_gpr(first_argument, CONSTANT_REGISTER)
+    with group.new(name="increment"):
         log("incrementing")
-        get_gpr(second_argument, a)
-        a += 1
-        set_gpr(second_argument, a)
-    with group.new():  # decrement
-        get_gpr(second_argument, a)
+        get_gpr(first_argument, a)
         a += 1
-        set_gpr(second_argument, a)
-    with group.new():  # negate
-        get_gpr(second_argument, a)
+        set_gpr(first_argument, a)
+    with group.new(name="decrement"):
+        get_gpr(first_argument, a)
+        a -= 1
+        set_gpr(first_argument, a)
+    with group.new(name="negate"):
+        get_gpr(first_argument, a)
         a *= -1
-        set_gpr(second_argument, a)
-    with group.new():  # clear
-        set_gpr(second_argument, Variable.constant(0))
-    with group.new():  # arithmetic shift right 12
-        second_argument /= Variable.constant(4096)
-    with group.new():  # arithmetic shift left 12
-        second_argument *= Variable.constant(4096)
-    with group.new():  # RESERVED
-        command("say ILLEGAL CALL OF RESERVED INSTRUCTION")
+        set_gpr(first_argument, a)
+    with group.new(name="clear"):
+        set_gpr(first_argument, Variable.constant(0))
+    with group.new(name="arithmetic shift right 12"):
+        get_gpr(first_argument, a)
+        a /= 4096
+        set_gpr(first_argument, a)
+    with group.new(name="arithmetic shift left 12"):
+        get_gpr(first_argument, a)
+        a *= 4096
+        set_gpr(first_argument, a)
+    with group.new(name="reserved"):
+        command(Say("ILLEGAL CALL OF RESERVED INSTRUCTION"))
 
     # last eight: complex unary operations
-    with group.new():  # compare with 0
-        get_gpr(second_argument, a)
-        cmp(a, 0)
-    with group.new():  # push to stack
-        get_gpr(second_argument, a)
+    with group.new(name="compare with 0"):
+        get_gpr(first_argument, a)
+        flags.compare(a, 0)
+    with group.new(name="push to stack"):
+        get_gpr(first_argument, a)
         memory.push(a)
-    with group.new():  # pop from stack
+    with group.new(name="pop from stack"):
         memory.pop(a)
-        set_gpr(second_argument, a)
-    with group.new():  # RESERVED
-        command("say ILLEGAL CALL OF RESERVED INSTRUCTION")
-    with group.new():  # RESERVED
-        command("say ILLEGAL CALL OF RESERVED INSTRUCTION")
-    with group.new():  # RESERVED
-        command("say ILLEGAL CALL OF RESERVED INSTRUCTION")
-    with group.new():  # RESERVED
-        command("say ILLEGAL CALL OF RESERVED INSTRUCTION")
-    with group.new():  # RESERVED
-        command("say ILLEGAL CALL OF RESERVED INSTRUCTION")
+        set_gpr(first_argument, a)
+    with group.new(name="reserved"):
+        command(Say("ILLEGAL CALL OF RESERVED INSTRUCTION"))
+    with group.new(name="reserved"):
+        command(Say("ILLEGAL CALL OF RESERVED INSTRUCTION"))
+    with group.new(name="reserved"):
+        command(Say("ILLEGAL CALL OF RESERVED INSTRUCTION"))
+    with group.new(name="return"):
+        # shares its eight words with reserved instructions that take no operands
+        with run_if(OPCODE == 0o1760):
+            memory.ret()
+        with run_else():
+            command(Say("ILLEGAL CALL OF RESERVED INSTRUCTION"))
+    with group.new(name="reserved"):
+        command(Say("ILLEGAL CALL OF RESERVED INSTRUCTION"))
+
+    if settings().specialise:
+        specialised_instructions(group)
 
     return group
+
+
+def specialised_instructions(group: ChainGroup) -> None:
+    """
+    adds a handler to the arithmetic group for every word of the specialised instructions, at `SPECIALISED_OP_BASE`
+    :param group: the arithmetic group, with all of its other handlers
+    """
+    base = SPECIALISED_OP_BASE.z - ARITHMETIC_GROUP_POS.z
+    if len(group.chain_contexts) != base:
+        raise ValueError(f"the arithmetic group has {len(group.chain_contexts)} chains, but specialised handlers start "
+                         f"after {base}")
+    for instruction in SPECIALISED_INSTRUCTIONS:
+        operation = SPECIALISED_OPERATIONS[instruction.name]
+        for dst_id, dst in enumerate(GP_REGISTERS):
+            for src_id, src in enumerate(GP_REGISTERS):
+                word = instruction.encode([dst_id, src_id])
+                if word != len(group.chain_contexts) - base:
+                    raise ValueError(f"{instruction.name} {GP_NAMES[dst_id]} {GP_NAMES[src_id]} is out of order")
+                with group.new(name=f"{instruction.name} {GP_NAMES[dst_id]} {GP_NAMES[src_id]}"):
+                    operation(dst, src)
+
+
+def specialised_footprint(group: ChainGroup) -> str:
+    """
+    describes the space the specialised handlers take up
+    :param group: the arithmetic group, lowered
+    :return: the description
+    """
+    chains = group.chain_contexts[SPECIALISED_OP_BASE.z - ARITHMETIC_GROUP_POS.z:]
+    blocks = sum(len(chain.contents) for chain in chains)
+    longest = max(len(chain.contents) for chain in group.chain_contexts)
+    return (f"specialised handlers: {len(chains)} chains of {blocks} command blocks, "
+            f"making the arithmetic group {len(group.chain_contexts)} chains by {longest} blocks")
@@ -7,18 +7,18 @@ from computer.computer.registers import OPCODE
 
 
 def card_instructions() -> ChainGroup:
-    group = ChainGroup(only_chain=True)
+    group = ChainGroup(name="card", only_chain=True)
 
-    with group.new():  # dispatch
+    with group.new(name="dispatch"):
         card_pos_x = Variable("card_pos_x", CARD_GROUP_POS.x)
         card_pos_y = Variable("card_pos_y", CARD_GROUP_POS.y)
         card_pos_z = Variable("card_pos_z", CARD_GROUP_POS.z)
 
         card_pos_z.set(OPCODE)
-        card_pos_z.bitslice(6, 4)
+        card_pos_z.bitslice(6, 4, inplace=True)
         card_pos_z += 1
 
         const_pos = VectorVariable("const_pos", card_pos_x, card_pos_y, card_pos_z)
-        execute_arbitrary_code(const_pos, 16)
+        execute_arbitrary_code(const_pos, group)
 
     return group
@@ -1,12 +1,12 @@
-from computer.codegen.chain_context import command
-from computer.codegen.command import Command
+from computer.codegen import datapack
+from computer.codegen.chain_context import command, ChainContext, ChainGroup
+from computer.codegen.command import Command, Clone, Fill, Deferred
 from computer.codegen.coordinates import Coordinates, RelativeCoordinates, CURRENT
 from computer.codegen.entity import Entity
 from computer.codegen.execute import Execute
+from computer.codegen.session import settings
 from computer.codegen.vector_variable import VectorVariable
-from computer.computer.layout import TEMP_BUF_BASE
-
-
+from computer.computer.layout import TEMP_BUF_BASE, TEMP_BUF_SIZE
 
 # the entity used by clones
 CLONER = Entity("minecraft:armor_stand")
@@ -43,18 +43,74 @@ def smart_clone(
     (
         Execute()
         .at_entity(CLONER)
-        .run(Command(f"clone {CURRENT} {CURRENT + size} {buf}"))
+        .run(Clone(CURRENT, CURRENT + size, buf))
     )
     # copy from buffer to destination
     CLONER.set_pos(dst)
     (
         Execute()
         .at_entity(CLONER)
-        .run(Command(f"clone {buf} {buf + size} {CURRENT} {mode}"))
+        .run(Clone(buf, buf + size, CURRENT, mode))
     )
 
 
-def execute_arbitrary_code(src: VectorVariable, length: int) -> None:
+class ArbitraryCode(Deferred):
+    """
+    runs one of a set of chains.
+    with command blocks, the chain is cloned into padding sized to the longest of them once they are lowered,
+    and in a datapack, its function is found with a switch.
+    """
+    __slots__ = "src", "targets"
+
+    def __init__(self, src: VectorVariable, targets: ChainGroup | list[ChainContext]):
+        super().__init__()
+        self.src = src
+        self.targets = targets
+
+    def expand(self, ctx: ChainContext) -> None:
+        if isinstance(self.targets, ChainGroup):
+            targets = [target for target in self.targets.chain_contexts if target is not ctx]
+        else:
+            targets = self.targets
+        if not targets:
+            # there is nothing to run
+            return
+        if settings().datapack:
+            self.call(ctx, targets)
+            return
+        for target in targets:
+            target.lower()
+        longest = max(targets, key=lambda target: len(target.contents))
+        if len(longest.contents) > TEMP_BUF_SIZE.x:
+            raise ValueError(
+                f"chain {longest.name} is {len(longest.contents)} commands long, "
+                f"which does not fit in the clone buffer of {TEMP_BUF_SIZE.x}"
+            )
+        clone_and_run(self.src, len(longest.contents))
+
+    def call(self, ctx: ChainContext, targets: list[ChainContext]) -> None:
+        """
+        runs the target at the position with a switch over the coordinate that the targets are placed along
+        """
+        for target in targets:
+            if target.pos is None:
+                raise ValueError(f"chain {target.name} has not been placed")
+        if len(targets) == 1:
+            command(datapack.call(targets[0]))
+            return
+        axes = [axis for axis in "xyz" if len({getattr(target.pos, axis) for target in targets}) > 1]
+        if len(axes) != 1:
+            raise ValueError(f"the chains run by {ctx.name} are not placed along a single axis")
+        axis = axes[0]
+        datapack.switch(
+            getattr(self.src, axis).score,
+            [(getattr(target.pos, axis), datapack.call(target)) for target in targets],
+            ctx.name,
+            self.origin,
+        )
+
+
+def clone_and_run(src: VectorVariable, length: int) -> None:
     """
     runs a command block chain of length `length` in the current tick
     :param src: the position of the chain to run
@@ -68,5 +124,23 @@ def execute_arbitrary_code(src: VectorVariable, length: int) -> None:
         mode="masked"
     )
     for i in range(length):
-        command("")
-    command(f"fill ~-1 ~ ~ ~-{length} ~ ~ minecraft:chain_command_block[facing=east]")
+        command(Command(""))
+    # the padding is emptied for the next chain, which may be shorter.
+    # filling a block with the block state it already has leaves its command as it is, so it is removed first
+    command(Fill("~-1 ~ ~", f"~-{length} ~ ~", "minecraft:air"))
+    command(Fill("~-2 ~ ~", f"~-{length + 1} ~ ~", "minecraft:chain_command_block[facing=east]{auto:1b}"))
+
+
+def execute_arbitrary_code(src: VectorVariable, length: int | ChainGroup | list[ChainContext]) -> None:
+    """
+    runs a command block chain in the current tick.
+    the chain is cloned into empty command blocks in the current chain, so there must be enough of them to fit it.
+    :param src: the position of the chain to run
+    :param length: the length of the chain to run,
+    or the chains it may be, as a list or a group of chains other than the current one.
+    the length is then that of the longest of them, which is found when the current chain is written out.
+    """
+    if isinstance(length, int):
+        clone_and_run(src, length)
+    else:
+        command(ArbitraryCode(src, length))
@@ -1,4 +1,5 @@
 from computer.codegen.chain_context import ChainGroup, command
+from computer.codegen.command import Say
 from computer.codegen.variable import Variable
 from computer.codegen.vector_variable import VectorVariable
 from computer.computer import registers
@@ -13,9 +14,9 @@ def constant_instructions() -> ChainGroup:
     :return:
     """
     # group for constant instructions
-    group = ChainGroup(only_chain=True)
+    group = ChainGroup(name="const", only_chain=True)
 
-    with group.new():  # dispatch
+    with group.new(name="dispatch"):
         const_pos_x = Variable("const_pos_x", CONST_GROUP_POS.x)
         const_pos_y = Variable("const_pos_y", CONST_GROUP_POS.y)
         const_pos_z = Variable("const_pos_z", CONST_GROUP_POS.z)
@@ -25,19 +26,19 @@ def constant_instructions() -> ChainGroup:
         const_pos_z += 1
 
         const_pos = VectorVariable("const_pos", const_pos_x, const_pos_y, const_pos_z)
-        execute_arbitrary_code(const_pos, 16)
-    with group.new():  # const
+        execute_arbitrary_code(const_pos, group)
+    with group.new(name="const"):
         imm = registers.OPCODE.bitslice(0, 8)
         registers.CONSTANT_REGISTER.set(imm)
-    with group.new():  # sconst
+    with group.new(name="sconst"):
         imm = registers.OPCODE.bitslice(0, 8)
         imm.sign_extend(8)
         registers.CONSTANT_REGISTER.set(imm)
-    with group.new():  # econst
+    with group.new(name="econst"):
         imm = registers.OPCODE.bitslice(0, 8)
         registers.CONSTANT_REGISTER *= 256
         registers.CONSTANT_REGISTER += imm
-    with group.new():  # RESERVED
-        command("say ILLEGAL USAGE OF RESERVED COMMAND")
+    with group.new(name="reserved"):
+        command(Say("ILLEGAL USAGE OF RESERVED COMMAND"))
 
     return group
@@ -0,0 +1,102 @@
+"""
+the comparison flags, which `cmp` sets and conditional jumps test.
+
+normally, a compare sets all six flags. with lazy flags, it only records its operands,
+and each conditional jump compares them itself, with the conditions of a single `execute`.
+the flags are then never set, and a jump before the first compare is not taken, as it would not be with all flags 0.
+"""
+
+from dataclasses import dataclass
+
+from computer.codegen.execute import Execute, Run, run_if, run_else
+from computer.codegen.session import settings, state
+from computer.codegen.variable import Variable, VariableComparison
+from computer.computer.registers import LF, LE, EQ, GE, GT, NE
+
+# the relation between the operands that each flag is set for, by the name of the flag, besides `NE`
+RELATIONS = {
+    LF.name: "<",
+    LE.name: "<=",
+    EQ.name: "=",
+    GE.name: ">=",
+    GT.name: ">",
+}
+
+
+@dataclass
+class LazyFlags:
+    """
+    the variables that lazy flags are kept in
+    """
+    # the operands of the last compare
+    left: Variable
+    right: Variable
+    # whether there has been a compare
+    compared: Variable
+
+
+def lazy_flags() -> LazyFlags:
+    """
+    finds the lazy flags of the current build session, making them if it has none yet
+    :return: the lazy flags
+    """
+    return state("lazy_flags", lambda: LazyFlags(Variable("cmp_left"), Variable("cmp_right"), Variable("cmp_done")))
+
+
+def initialize_flags() -> None:
+    """
+    creates the variables that lazy flags are kept in
+    """
+    lazy_flags()
+
+
+def compare(dst: Variable, src: Variable | int) -> None:
+    """
+    compares two values, for the flags
+    :param dst: the left operand
+    :param src: the right operand
+    """
+    if settings().lazy_flags:
+        lazy = lazy_flags()
+        lazy.left.set(dst)
+        lazy.right.set(src)
+        lazy.compared.set(1)
+        return
+
+    with run_if(dst < src):
+        LF.set(1)
+    with run_else():
+        LF.set(0)
+    with run_if(dst <= src):
+        LE.set(1)
+    with run_else():
+        LE.set(0)
+    with run_if(dst == src):
+        EQ.set(1)
+        NE.set(0)
+    with run_else():
+        EQ.set(0)
+        NE.set(1)
+    with run_if(dst >= src):
+        GE.set(1)
+    with run_else():
+        GE.set(0)
+    with run_if(dst > src):
+        GT.set(1)
+    with run_else():
+        GT.set(0)
+
+
+def run_if_set(flag: Variable) -> Run:
+    """
+    returns a `Run` instance that executes commands it captures if a flag is set
+    :param flag: the flag
+    :return: a `Run` instance
+    """
+    if not settings().lazy_flags:
+        return run_if(flag > 0)
+    lazy = lazy_flags()
+    execute = Execute().if_condition(lazy.compared == 1)
+    if flag is NE:
+        return execute.unless_condition(VariableComparison(lazy.left, "=", lazy.right)).run()
+    return execute.if_condition(VariableComparison(lazy.left, RELATIONS[flag.name], lazy.right)).run()
@@ -1,76 +1,452 @@
 #!/bin/python3.12
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import repeat
+from typing import Callable, Optional
 
-from computer.codegen.chain_context import ChainGroup, INIT_CONTEXT
-from computer.codegen.execute import run_if
-from computer.codegen.output import assemble_schematic
+from computer.codegen import datapack, cache
+from computer.codegen.chain_context import ChainGroup, ChainContext, init_context, section, capture, command
+from computer.codegen.block import Block
+from computer.codegen.command import Command, Fold, ScoreSet
+from computer.codegen.coordinates import Coordinates
+from computer.codegen.execute import Execute, run_if
+from computer.codegen.optimize import constant_value
+from computer.codegen.output import assemble_schematic, BlockBuffer
+from computer.codegen.session import BuildSession, Settings, current, settings
+from computer.codegen.variable import Variable
 from computer.codegen.vector_variable import VectorVariable
-from computer.computer import registers
+from computer.computer import registers, icache, memory, stack, flags, arithmetic
 from computer.computer.arithmetic import arithmetic_instructions
 from computer.computer.card import card_instructions
 from computer.computer.jump import jump_instructions
 from computer.computer.clone import initialize_cloning, execute_arbitrary_code
 from computer.computer.constant import constant_instructions
 from computer.computer.layout import MAIN_GROUP_POS, CONST_GROUP_POS, ARITHMETIC_GROUP_POS, REGISTER_BANK_POS, \
-    JUMP_GROUP_POS, CARD_GROUP_POS
+    JUMP_GROUP_POS, CARD_GROUP_POS, SPAWN_CHUNKS_END
 from computer.computer.memory import initialize_memory, memory_load
 from computer.computer.registers import OPCODE
 
+logger = logging.getLogger(__name__)
+
+# the groups besides the main group, by name, with the functions that build them and their positions,
+# in the order they are written out
+GROUPS: dict[str, tuple[Callable[[], ChainGroup], Coordinates]] = {
+    "const": (constant_instructions, CONST_GROUP_POS),
+    "arithmetic": (arithmetic_instructions, ARITHMETIC_GROUP_POS),
+    "jump": (jump_instructions, JUMP_GROUP_POS),
+    "card": (card_instructions, CARD_GROUP_POS),
+    "registers": (registers.register_group, REGISTER_BANK_POS),
+}
+# the groups whose first chain dispatches instructions, which the primary chain runs
+INSTRUCTION_GROUPS = ["const", "arithmetic", "jump", "card"]
+
+
 
 def initialize_computer():
     initialize_memory()
     initialize_cloning()
+    if settings().registers == "bank" and not settings().datapack:
+        registers.initialize_registers()
+    if settings().icache:
+        icache.initialize_icache()
+    if settings().stack_cache:
+        stack.initialize_stack_cache()
+    if settings().lazy_flags:
+        flags.initialize_flags()
 
 
-def primary_chain():
+def primary_chain(dispatchers: list[ChainContext] | int, running: Variable = None):
+    """
+    fetches the next instruction and runs it
+    :param dispatchers: the chains that dispatch each group of instructions, which the primary chain runs,
+    or the length of the longest of them once lowered
+    :param running: a variable to clear if the instruction halts, by jumping to itself
+    """
     from computer.computer.registers import INSTRUCTION_POINTER
 
-    memory_load(INSTRUCTION_POINTER, OPCODE)
-    INSTRUCTION_POINTER += 1
+    if running is not None:
+        address = INSTRUCTION_POINTER.clone("step_address")
 
-    high_bits = OPCODE.bitslice(10, 2, True)
-    position = VectorVariable("position")
+    with section("fetch"):
+        if settings().icache:
+            icache.fetch(INSTRUCTION_POINTER, OPCODE)
+        else:
+            memory_load(INSTRUCTION_POINTER, OPCODE)
+        INSTRUCTION_POINTER += 1
 
-    with run_if(high_bits == 0):  # arithmetic
-        position.set(ARITHMETIC_GROUP_POS)
-    with run_if(high_bits == 1):  # jump
-        position.set(JUMP_GROUP_POS)
-    with run_if(high_bits == 2):  # const
-        position.set(CONST_GROUP_POS)
-    with run_if(high_bits == 3):  # card
-        position.set(CARD_GROUP_POS)
+    with section("dispatch"):
+        high_bits = OPCODE.bitslice(10, 2, True)
+        position = VectorVariable("position")
 
-    execute_arbitrary_code(position, 100)
+        with run_if(high_bits == 0):  # arithmetic
+            position.set(ARITHMETIC_GROUP_POS)
+        with run_if(high_bits == 1):  # jump
+            position.set(JUMP_GROUP_POS)
+        with run_if(high_bits == 2):  # const
+            position.set(CONST_GROUP_POS)
+        with run_if(high_bits == 3):  # card
+            position.set(CARD_GROUP_POS)
 
+        execute_arbitrary_code(position, dispatchers)
 
-def computer(file):
-    main_group = ChainGroup()
+    if running is not None:
+        (INSTRUCTION_POINTER == address).if_true(capture()(running.set(0)))
 
-    main_group.add(INIT_CONTEXT)
 
-    with INIT_CONTEXT:
-        initialize_computer()
+def step_cost(step: ChainContext) -> int:
+    """
+    estimates the most commands that running one instruction takes, from the static lengths of the chains it runs.
+    with command blocks, the chain already has room for the longest chain it clones in, so this is its length.
+    :param step: a chain context that runs one instruction
+    :return: the number of commands
+    """
+    step.lower()
+    if settings().datapack:
+        return datapack.worst_case(step)
+    return len(step.contents)
+
+
+def halt_gate(running: Variable) -> None:
+    """
+    stops the chain once the computer halts, by marking the command block after as having already run this tick,
+    which the game does not run again
+    :param running: the variable that is cleared when the computer halts
+    """
+    Execute().if_condition(running == 0) \
+        .store_result(Block("~1 ~ ~"), "LastExecution", "long") \
+        .run(Command("time query gametime"))
 
-    primary_context = main_group.new()
+
+def multi_step_chain(primary_context: ChainContext, dispatchers: list[ChainContext] | int) -> int:
+    """
+    fills the primary chain with the `steps` setting of instructions, or as many as fit in its `tick_budget` at worst.
+    in a datapack, each instruction is a call to a function that runs one, which stops being called once the computer
+    halts. with command blocks, each instruction is a row of its own, folded south within the spawn chunks,
+    and the chain stops at the end of the row of one that halts.
+    :param primary_context: the primary chain
+    :param dispatchers: the chains that dispatch each group of instructions, or the length of the longest of them
+    :return: the number of instructions run per tick
+    :raises ValueError: if the instructions do not fit in the spawn chunks
+    """
+    with init_context():
+        running = Variable("running")
+
+    if settings().datapack:
+        step = datapack.function("main/primary/step")
+        with step:
+            primary_chain(dispatchers, running)
+        steps = settings().steps or max(1, settings().tick_budget // (step_cost(step) + 1))
+        with primary_context:
+            running.set(1)
+            for _ in range(steps):
+                (running == 1).if_true(datapack.call(step))
+        return steps
+
+    probe = ChainContext(name="primary")
+    with probe:
+        primary_chain(dispatchers, running)
+        halt_gate(running)
+    row_length = step_cost(probe)
+    # each row but the last turns back to the next along the row after it, through blocks with no command
+    rows = (SPAWN_CHUNKS_END.z - primary_context.pos.z) // 2 + 1
+    steps = settings().steps or max(1, min(rows, settings().tick_budget // (2 * row_length + 2)))
+    if steps > rows:
+        raise ValueError(
+            f"{steps} instructions per tick take {steps} rows of the primary chain, "
+            f"but only {rows} fit in the spawn chunks"
+        )
+    if steps > 1 and primary_context.pos.x + row_length > SPAWN_CHUNKS_END.x:
+        raise ValueError(
+            f"an instruction takes a row of {row_length} command blocks, "
+            f"which does not fit in the spawn chunks with the turn at its end"
+        )
     with primary_context:
-        primary_chain()
+        running.set(1)
+        for index in range(steps):
+            if index:
+                command(Fold())
+            primary_chain(dispatchers, running)
+            if index < steps - 1:
+                halt_gate(running)
+    return steps
+
+
+def fill_primary_chain(primary_context: ChainContext, dispatchers: list[ChainContext] | int) -> None:
+    """
+    generates the primary chain, which runs the `steps` setting of instructions
+    :param primary_context: the primary chain
+    :param dispatchers: the chains that dispatch each group of instructions, or the length of the longest of them
+    """
+    if settings().steps == 1:
+        with primary_context:
+            primary_chain(dispatchers)
+    else:
+        logger.info("running %d instructions per tick", multi_step_chain(primary_context, dispatchers))
+
+
+def group_names() -> list[str]:
+    """
+    :return: the names of the groups to build besides the main group, in the order they are written out
+    """
+    # the register bank is only ever cloned from, which a datapack and fanned out register accesses do not do
+    if settings().datapack or settings().registers != "bank":
+        return INSTRUCTION_GROUPS
+    return INSTRUCTION_GROUPS + ["registers"]
+
+
+def build_computer() -> list[tuple[ChainGroup, Coordinates]]:
+    """
+    generates the chains of the computer and lowers them, ready to be written out
+    :return: the groups, with their positions. the main group comes first, with the init chain and the primary chain
+    """
+    main_group = ChainGroup(name="main")
+
+    init = init_context()
+    main_group.add(init)
+
+    with init:
+        initialize_computer()
+
+    groups = [(main_group, MAIN_GROUP_POS)]
+    for name in group_names():
+        builder, pos = GROUPS[name]
+        groups.append((builder(), pos))
+
+    primary_context = main_group.new(name="primary")
+
+    for group, pos in groups:
+        group.place(pos)
+
+    # the dispatch chain comes first in each group
+    dispatchers = [group.chain_contexts[0] for group, _ in groups[1:len(INSTRUCTION_GROUPS) + 1]]
+    fill_primary_chain(primary_context, dispatchers)
+
+    # every chain is lowered before the init chain, which lowering may add constants to
+    for group, _ in groups:
+        for chain_context in group.chain_contexts:
+            if chain_context is not init:
+                chain_context.lower()
+    init.lower()
+
+    if settings().specialise:
+        logger.info(arithmetic.specialised_footprint(groups[2][0]))
 
-    main_group.write_out(file, MAIN_GROUP_POS)
+    return groups
 
-    const_instruction_group = constant_instructions()
-    const_instruction_group.write_out(file, CONST_GROUP_POS)
 
-    arithmetic_instruction_group = arithmetic_instructions()
-    arithmetic_instruction_group.write_out(file, ARITHMETIC_GROUP_POS)
+@dataclass
+class GroupBuild:
+    """
+    a group built in a build session of its own, to be merged into the computer
+    """
 
-    jump_instruction_group = jump_instructions()
-    jump_instruction_group.write_out(file, JUMP_GROUP_POS)
+    # the name of the group
+    name: str
+    # the blocks of the group
+    blocks: BlockBuffer
+    # the length of the first chain of the group, once lowered
+    first_length: int
+    # the commands that the group added to the init chain, besides those setting constants
+    init: list[Command]
+    # the constants that the group uses
+    constants: list[int]
+    # a report on the group, to log once it is built
+    report: Optional[str] = None
 
-    card_instruction_group = card_instructions()
-    card_instruction_group.write_out(file, CARD_GROUP_POS)
 
-    register_group = registers.register_group()
-    register_group.write_out(file, REGISTER_BANK_POS)
+def build_group(name: str, options: Settings) -> GroupBuild:
+    """
+    builds a group in a build session of its own, which may be in another process.
+    the session is initialized as the computer is, so that it shares the variables made then,
+    but the variables the group makes are namespaced by its name.
+    :param name: the name of the group
+    :param options: the settings to build it with
+    :return: the group, lowered and written out
+    """
+    builder, pos = GROUPS[name]
+
+    with BuildSession(settings=options) as session:
+        init = init_context()
+        with init:
+            initialize_computer()
+        start = len(init.contents)
+
+        session.namespace = name + "."
+        group = builder()
+        group.place(pos)
+        group.lower()
+        blocks = BlockBuffer()
+        cache.write_group(blocks, group, pos)
+
+        report = None
+        if name == "arithmetic" and settings().specialise:
+            report = arithmetic.specialised_footprint(group)
+
+        # constants are set by the init chain of the computer, which only sets each once
+        return GroupBuild(
+            name,
+            blocks,
+            len(group.chain_contexts[0].contents),
+            [
+                cmd for cmd in init.contents[start:]
+                if not (isinstance(cmd, ScoreSet) and constant_value(cmd.target) is not None)
+            ],
+            sorted(session.registered_constants),
+            report,
+        )
+
+
+def build_computer_in_parallel(jobs: int) -> tuple[ChainGroup, list[GroupBuild]]:
+    """
+    generates the computer with each group built in a process pool, and merges them in a fixed order
+    :param jobs: the number of processes
+    :return: the main group, lowered, and the other groups, in the order they are written out
+    """
+    with ProcessPoolExecutor(jobs) as pool:
+        builds = list(pool.map(build_group, group_names(), repeat(settings())))
+
+    main_group = ChainGroup(name="main")
+
+    init = init_context()
+    main_group.add(init)
+
+    with init:
+        initialize_computer()
+        for build in builds:
+            for cmd in build.init:
+                command(cmd)
+            for value in build.constants:
+                Variable.constant(value)
+
+    primary_context = main_group.new(name="primary")
+    main_group.place(MAIN_GROUP_POS)
+
+    fill_primary_chain(primary_context, max(build.first_length for build in builds[:len(INSTRUCTION_GROUPS)]))
+
+    primary_context.lower()
+    init.lower()
+
+    for build in builds:
+        if build.report is not None:
+            logger.info(build.report)
+
+    return main_group, builds
+
+
+def computer(file) -> list[tuple[ChainGroup, Coordinates]]:
+    """
+    generates the computer
+    :param file: the file to write schematic assembly to, or the buffer to add the blocks to
+    :return: the groups written, with their positions.
+    if the groups were built in other processes, only the main group is returned
+    """
+    if settings().jobs:
+        main_group, builds = build_computer_in_parallel(settings().jobs)
+        cache.write_group(file, main_group, MAIN_GROUP_POS)
+        for build in builds:
+            build.blocks.write_to(file)
+        return [(main_group, MAIN_GROUP_POS)]
+    groups = build_computer()
+    for group, pos in groups:
+        cache.write_group(file, group, pos)
+    return groups
+
+
+def computer_datapack(directory: str = "generated/datapack") -> list[tuple[ChainGroup, Coordinates]]:
+    """
+    generates the computer as a datapack, which runs the init chain when loaded and the primary chain every tick
+    :param directory: the directory to write the datapack to
+    :return: the groups written, with their positions
+    """
+    groups = build_computer()
+    init, primary = groups[0][0].chain_contexts
+    datapack.write_datapack(
+        directory,
+        [group for group, _ in groups],
+        load=[init],
+        tick=[primary],
+        description="the computer",
+    )
+    return groups
 
 
 def generate_computer():
     assemble_schematic(computer, "computer")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="generate the computer")
+    parser.add_argument("--blk", nargs="?", const="text", choices=["text", "binary"],
+                        help="also write the blocks of the computer to generated/computer.blk as schematic assembly, "
+                             "for debugging, or with binary, to generated/computer.blkb in binary form")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="write every group and assemble the schematic, instead of reusing what is unchanged")
+    parser.add_argument("--profile", action="store_true",
+                        help="instead of assembling a schematic, report the commands each instruction costs")
+    parser.add_argument("--no-optimize", action="store_true", help="write chains without the peephole optimizer")
+    parser.add_argument("--target", choices=["schematic", "datapack"], default="schematic",
+                        help="generate command blocks for a schematic, or functions for a datapack")
+    parser.add_argument("--icache", type=int, default=0, metavar="LINES",
+                        help="cache this many recently fetched instruction words on the scoreboard")
+    parser.add_argument("--stack-cache", type=int, default=0, metavar="SLOTS",
+                        help="keep this many words at the top of the stack on the scoreboard")
+    parser.add_argument("--registers", choices=["bank", "fan-out"], default="bank",
+                        help="access registers through the register bank, or by testing the register id in line")
+    parser.add_argument("--specialise", action="store_true",
+                        help="generate a handler for every register pair of the r32, r32 instructions, trading space for speed")
+    parser.add_argument("--steps", type=int, default=1, metavar="K",
+                        help="run K instructions per tick, or with 0, as many as fit in the budget")
+    parser.add_argument("--tick-budget", type=int, default=Settings.tick_budget, metavar="COMMANDS",
+                        help="the most commands to run in a tick, when choosing the number of instructions per tick")
+    parser.add_argument("--jobs", type=int, default=0, metavar="N",
+                        help="build the groups of the computer in N processes, each with variables of its own")
+    parser.add_argument("--materialize-conditions", action="store_true",
+                        help="evaluate a condition that more than one command depends on once, into a score")
+    parser.add_argument("--lazy-flags", action="store_true",
+                        help="have cmp record its operands, and conditional jumps compare them, instead of setting flags")
+    parser.add_argument("--memory", choices=["barrel", "scoreboard"], default="barrel",
+                        help="keep memory in barrels, or on the scoreboard, which needs a datapack")
+    parser.add_argument("--memory-size", type=int, default=256, metavar="WORDS",
+                        help="the number of words of scoreboard memory")
+    parser.add_argument("--packed-memory", action="store_true",
+                        help="store each word of barrel memory as a single int, instead of in the counts of two items")
+    parser.add_argument("--memory-report", action="store_true",
+                        help="instead of generating the computer, report the commands each memory backend runs per access")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    options = Settings(
+        optimize=not args.no_optimize,
+        cache=not args.no_cache,
+        blk=args.blk,
+        datapack=args.target == "datapack",
+        icache=args.icache,
+        stack_cache=args.stack_cache,
+        lazy_flags=args.lazy_flags,
+        materialize_conditions=args.materialize_conditions,
+        registers=args.registers,
+        specialise=args.specialise,
+        memory=args.memory,
+        memory_size=args.memory_size,
+        packed_memory=args.packed_memory,
+        steps=args.steps,
+        tick_budget=args.tick_budget,
+        jobs=args.jobs,
+    )
+    if options.jobs and options.datapack:
+        parser.error("--jobs needs --target schematic")
+    if options.memory == "scoreboard" and not options.datapack:
+        parser.error("scoreboard memory needs --target datapack")
+    current().settings = options
+
+    if args.memory_report:
+        memory.memory_report()
+    elif args.profile:
+        from computer.computer.profile import profile_computer
+        profile_computer()
+    elif options.datapack:
+        computer_datapack()
+    else:
+        generate_computer()
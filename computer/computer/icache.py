@@ -0,0 +1,104 @@
+"""
+a direct-mapped cache of instruction words, kept on the scoreboard.
+
+each line holds the address of the word it caches, as its tag, and the word.
+an address can only be cached in one line, so an instruction is fetched by checking every tag against its address,
+with a single command per line, and is only loaded from memory on a miss.
+stores to memory invalidate any line holding the address stored to, so self-modifying code still works.
+"""
+
+from dataclasses import dataclass
+
+from computer.codegen import datapack
+from computer.codegen.chain_context import section, capture
+from computer.codegen.execute import Execute, run_if
+from computer.codegen.session import settings, state
+from computer.codegen.variable import Variable
+from computer.computer.memory import memory_load
+
+# the tag of a line that holds nothing, which no address matches
+INVALID = -1
+
+
+@dataclass
+class InstructionCache:
+    """
+    the variables of the cache
+    """
+    # the tag and word of each line
+    lines: list[tuple[Variable, Variable]]
+    # whether the last fetch hit
+    hit: Variable
+
+
+def instruction_cache() -> InstructionCache:
+    """
+    finds the cache of the current build session, making it as its settings choose if it has none yet
+    :return: the cache
+    """
+    def make() -> InstructionCache:
+        lines = [(Variable(f"icache_tag{i}", INVALID), Variable(f"icache_word{i}")) for i in range(settings().icache)]
+        return InstructionCache(lines, Variable("icache_hit"))
+    return state("icache", make)
+
+
+def initialize_icache() -> None:
+    """
+    creates the lines of the cache, all invalid
+    """
+    instruction_cache()
+
+
+def fill(address: Variable, dest: Variable) -> None:
+    """
+    loads a word from memory and puts it in its line of the cache
+    :param address: the address of the word
+    :param dest: the variable to load the word into
+    """
+    memory_load(address, dest)
+    line = address % settings().icache
+    for i, (tag, word) in enumerate(instruction_cache().lines):
+        with run_if(line == i):
+            tag.set(address)
+            word.set(dest)
+
+
+def fetch(address: Variable, dest: Variable) -> None:
+    """
+    loads a word through the cache.
+    in a datapack, a miss calls a function, so a hit skips the memory load entirely.
+    :param address: the address of the word
+    :param dest: the variable to load the word into
+    """
+    cache = instruction_cache()
+    cache.hit.set(0)
+    for tag, word in cache.lines:
+        (
+            Execute()
+            .if_condition(tag == address)
+            .store_success(cache.hit)
+            .run(capture()(dest.set(word))[0])
+        )
+
+    if settings().datapack:
+        # the functions that fill a line on a miss, made once in a build session for every fetch into the same variable
+        functions = state("icache_functions", dict)
+        key = address.name, dest.name
+        if key not in functions:
+            functions[key] = datapack.function("main/primary/icache miss")
+            with functions[key], section("fetch"):
+                fill(address, dest)
+        (cache.hit == 0).if_true(datapack.call(functions[key]))
+    else:
+        with run_if(cache.hit == 0):
+            fill(address, dest)
+
+
+def invalidate(address: Variable) -> None:
+    """
+    invalidates the line of the cache holding an address, if there is one
+    :param address: the address stored to
+    """
+    for tag, _ in instruction_cache().lines:
+        with run_if(tag == address):
+            tag.set(INVALID)
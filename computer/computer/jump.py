@@ -2,7 +2,7 @@ from computer.codegen.chain_context import ChainGroup
 from computer.codegen.execute import run_if
 from computer.codegen.variable import IntRange, Variable
 from computer.codegen.vector_variable import VectorVariable
-from computer.computer import memory
+from computer.computer import memory, flags
 from computer.computer.clone import execute_arbitrary_code
 from computer.computer.layout import JUMP_GROUP_POS
 from computer.computer.registers import OPCODE, INSTRUCTION_POINTER, CONSTANT_REGISTER, LF, LE, EQ, GE, GT, NE
@@ -10,9 +10,9 @@ from computer.computer.logging import log
 
 
 def jump_instructions() -> ChainGroup:
-    group = ChainGroup(only_chain=True)
+    group = ChainGroup(name="jump", only_chain=True)
 
-    with group.new():  # dispatch
+    with group.new(name="dispatch"):
         log("dispatching jump")
         address = Variable("address")
         x_coord = Variable("jump_position_x", JUMP_GROUP_POS.x)
@@ -29,9 +29,9 @@ def jump_instructions() -> ChainGroup:
             address.set(INSTRUCTION_POINTER)
             address += offset
             z_coord.set(OPCODE)
-            z_coord.bitslice(7, 3)
+            z_coord.bitslice(7, 3, inplace=True)
             z_coord += 1
-        with run_if(OPCODE > 0o3777):
+        with run_if(OPCODE >= 0o3600):
             log("running absolute jump")
             # absolute jump
             high = Variable("high_part")
@@ -41,34 +41,33 @@ def jump_instructions() -> ChainGroup:
             address.set(high)
             address += CONSTANT_REGISTER
             z_coord.set(OPCODE)
-            z_coord.bitslice(4, 3)
+            z_coord.bitslice(4, 3, inplace=True)
             z_coord += 1
 
         position = VectorVariable("target", x_coord, y_coord, z_coord)
-        execute_arbitrary_code(position, 16)
+        execute_arbitrary_code(position, group)
 
-    with group.new():  # jump if less than
-        with run_if(LF > 0):
+    with group.new(name="jump if less than"):
+        with flags.run_if_set(LF):
             INSTRUCTION_POINTER.set(address)
-    with group.new():  # jump if less than or equal
-        with run_if(LE > 0):
+    with group.new(name="jump if less than or equal"):
+        with flags.run_if_set(LE):
             INSTRUCTION_POINTER.set(address)
-    with group.new():  # jump if equal
-        with run_if(EQ > 0):
+    with group.new(name="jump if equal"):
+        with flags.run_if_set(EQ):
             INSTRUCTION_POINTER.set(address)
-    with group.new():  # jump if greater than or equal
-        with run_if(GE > 0):
+    with group.new(name="jump if greater than or equal"):
+        with flags.run_if_set(GE):
             INSTRUCTION_POINTER.set(address)
-    with group.new():  # jump if greater than
-        with run_if(GT > 0):
+    with group.new(name="jump if greater than"):
+        with flags.run_if_set(GT):
             INSTRUCTION_POINTER.set(address)
-    with group.new():  # jump if not equal
-        with run_if(NE > 0):
+    with group.new(name="jump if not equal"):
+        with flags.run_if_set(NE):
             INSTRUCTION_POINTER.set(address)
-    with group.new():  # jump
-        INSTRUCTION_POINTER.set(address)
-    with group.new():  # call
-        memory.push(INSTRUCTION_POINTER)
+    with group.new(name="jump"):
         INSTRUCTION_POINTER.set(address)
+    with group.new(name="call"):
+        memory.call(address)
 
     return group
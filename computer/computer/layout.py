@@ -11,11 +11,17 @@ REGISTER_BANK_POS = Coordinates(0, 6, 0)
 
 # positions for specific subsections of the arithmetic group
 BINARY_OP_BASE = ARITHMETIC_GROUP_POS + Coordinates(0, 0, 1)
-UNARY_OP_BASE = ARITHMETIC_GROUP_POS + Coordinates(0, 0, 13)
+UNARY_OP_BASE = ARITHMETIC_GROUP_POS + Coordinates(0, 0, 15)
+# the handlers specialised to the registers of each r32, r32 instruction word, after the rest of the arithmetic group
+SPECIALISED_OP_BASE = ARITHMETIC_GROUP_POS + Coordinates(0, 0, 31)
+
+# the far corner of the spawn chunks, which stay loaded, with the world spawn at the origin.
+# the primary chain is folded into rows going south, which must end before it
+SPAWN_CHUNKS_END = Coordinates(159, 0, 159)
 
 # the temporary buffer used by clones
 TEMP_BUF_BASE = Coordinates(0, -32, 0)
-TEMP_BUF_SIZE = Coordinates(64, 64, 64)
+TEMP_BUF_SIZE = Coordinates(128, 64, 64)
 TEMP_BUF_END = TEMP_BUF_BASE + TEMP_BUF_SIZE
 
 # the location of the barrel cube
@@ -23,6 +29,9 @@ MEM_BASE = Coordinates(0, 128, 0)
 MEM_SIZE = Coordinates(16, 16, 16)
 MEM_END = MEM_BASE + MEM_SIZE - Coordinates(1, 1, 1)
 
+# the objective of the scoreboard memory
+MEM_OBJECTIVE = "mem"
+
 SCREEN_BASE = Coordinates(-32, 0, -32)
 SCREEN_SIZE = Coordinates(160, 0, 10)
 SCREEN_END = SCREEN_BASE + SCREEN_SIZE
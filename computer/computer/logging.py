@@ -1,5 +1,6 @@
 from computer.codegen.chain_context import command
+from computer.codegen.command import Say
 
 
 def log(s: str):
-    command("say LOG: " + s)
\ No newline at end of file
+    command(Say("LOG: " + s))
\ No newline at end of file
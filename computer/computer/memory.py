@@ -1,33 +1,230 @@
-from computer.codegen import coordinates
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import Callable
+
+from computer.codegen import coordinates, datapack
 from computer.codegen.block import Block
-from computer.codegen.chain_context import command
-from computer.codegen.command import Command
+from computer.codegen.chain_context import ChainContext, command, capture
+from computer.codegen.command import Command, DataGet, DataTarget, Fill, Score, ScoreOperation, ScoreSet
 from computer.codegen.entity import Entity
 from computer.codegen.execute import Execute
+from computer.codegen.session import settings, state
 from computer.codegen.variable import Variable
 from computer.codegen.vector_variable import VectorVariable
-from computer.computer.layout import MEM_END, MEM_BASE
+from computer.computer.layout import MEM_END, MEM_BASE, MEM_OBJECTIVE
 
 
 MEMORY_GETTER = Entity("minecraft:armor_stand")
 
-
-high_half: Variable
-low_half: Variable
+# the path of a packed word within a barrel
+PACKED_WORD = "Items[0].tag.w"
+
+
+class MemoryBackend(ABC):
+    """
+    a way of storing the words of memory
+    """
+
+    @abstractmethod
+    def initialize(self) -> None:
+        """
+        generates the commands that set up the memory, with every word zero
+        """
+
+    @abstractmethod
+    def load(self, index: Variable, dest: Variable) -> None:
+        """
+        generates the commands that load a word
+        :param index: the address of the word
+        :param dest: the variable to load into
+        """
+
+    @abstractmethod
+    def store(self, index: Variable, src: Variable) -> None:
+        """
+        generates the commands that store a word
+        :param index: the address of the word
+        :param src: the variable to store
+        """
+
+    def function_cost(self) -> int:
+        """
+        :return: the number of commands run per access by functions that the generated commands call
+        """
+        return 0
+
+
+class BarrelMemory(MemoryBackend):
+    """
+    memory kept in a cube of barrels at `MEM_BASE`, one word per barrel, accessed by moving an entity to the barrel
+    """
+
+    def __init__(self, packed: bool = False):
+        """
+        :param packed: whether each word is packed into a single int in the tag of the barrel's first item,
+        instead of being split into the counts of two items
+        """
+        self.packed = packed
+
+    def initialize(self) -> None:
+        command(Fill(MEM_BASE, MEM_END, "air"))
+        if self.packed:
+            items = '{Slot:0b,id:"minecraft:stone",Count:1b,tag:{w:0}}'
+        else:
+            items = '{Slot:0b,id:"minecraft:stone",Count:1b},{Slot:1b,id:"minecraft:stone",Count:1b}'
+        command(Fill(MEM_BASE, MEM_END, 'minecraft:barrel{Items:[' + items + ']}'))
+        MEMORY_GETTER.create()
+        self.high_half = Variable("high_half", 0)
+        self.low_half = Variable("low_half", 0)
+
+    def load(self, index: Variable, dest: Variable) -> None:
+        if self.packed:
+            move_getter_to_index(index)
+            (
+                Execute()
+                .at_entity(MEMORY_GETTER)
+                .store_result(dest)
+                .run(DataGet(DataTarget("block", "~ ~ ~"), PACKED_WORD))
+            )
+            return
+
+        memory_load_high_half = Variable("high_half")
+
+        move_getter_to_index(index)
+
+        (
+            Execute()
+            .at_entity(MEMORY_GETTER)
+            .store_result(memory_load_high_half)
+            .run(DataGet(DataTarget("block", "~ ~ ~"), "Items[0].Count"))
+        )
+
+        (
+            Execute()
+            .at_entity(MEMORY_GETTER)
+            .store_result(dest)
+            .run(DataGet(DataTarget("block", "~ ~ ~"), "Items[1].Count"))
+        )
+
+        dest -= 1
+        memory_load_high_half -= 1
+        memory_load_high_half *= 64
+        dest += memory_load_high_half
+
+    def store(self, index: Variable, src: Variable) -> None:
+        move_getter_to_index(index)
+
+        barrel = Block(coordinates.CURRENT)
+
+        if self.packed:
+            (
+                Execute()
+                .at_entity(MEMORY_GETTER)
+                .store_result(barrel, PACKED_WORD, "int")
+                .run(src.get())
+            )
+            return
+
+        high_half = self.high_half
+        low_half = self.low_half
+        high_half.set(src)
+        high_half /= 64
+        high_half += 1
+        low_half.set(src)
+        low_half %= 64
+        low_half += 1
+
+        (
+            Execute()
+            .at_entity(MEMORY_GETTER)
+            .store_result(barrel.slot(0))
+            .run(high_half.get())
+        )
+
+        (
+            Execute()
+            .at_entity(MEMORY_GETTER)
+            .store_result(barrel.slot(1))
+            .run(low_half.get())
+        )
+
+
+class ScoreboardMemory(MemoryBackend):
+    """
+    memory kept on the `MEM_OBJECTIVE` scoreboard objective, one fake player per word, named after its address.
+    addresses wrap around at the size of the memory, so the stack is at its top.
+    a word is accessed by a function that finds it with a binary search over its address,
+    so this backend only works in a datapack.
+    """
+
+    def __init__(self, size: int = 256):
+        """
+        :param size: the number of words
+        """
+        self.size = size
+
+    def word(self, address: int) -> Score:
+        return Score(str(address), MEM_OBJECTIVE)
+
+    def initialize(self) -> None:
+        command(Command(f"scoreboard objectives add {MEM_OBJECTIVE} dummy"))
+        for address in range(self.size):
+            command(ScoreSet(self.word(address), 0))
+        # the address and word of the access being made, which are passed to and from the functions that make it
+        self.address = Variable("mem_address")
+        self.data = Variable("mem_data")
+
+    def access_function(self, name: str, access: Callable[[Score], Command]) -> ChainContext:
+        """
+        finds the function that accesses the word at `self.address`, making it if the current build session has none
+        :param name: the name of the function
+        :param access: a function giving the command that accesses a word, given its score
+        :return: the chain context of the function
+        """
+        if not settings().datapack:
+            raise ValueError("scoreboard memory is only supported in a datapack")
+        # the functions of each backend, by backend and name
+        functions = state("memory_functions", dict)
+        if (self, name) not in functions:
+            function = datapack.function(name)
+            with function:
+                datapack.switch(self.address.score, [(i, access(self.word(i))) for i in range(self.size)], name)
+            functions[self, name] = function
+        return functions[self, name]
+
+    def load(self, index: Variable, dest: Variable) -> None:
+        function = self.access_function("memory/load", lambda word: ScoreOperation(self.data.score, "=", word))
+        self.address.set(index)
+        self.address %= self.size
+        command(datapack.call(function))
+        dest.set(self.data)
+
+    def store(self, index: Variable, src: Variable) -> None:
+        function = self.access_function("memory/store", lambda word: ScoreOperation(word, "=", self.data.score))
+        self.address.set(index)
+        self.address %= self.size
+        self.data.set(src)
+        command(datapack.call(function))
+
+    def function_cost(self) -> int:
+        return datapack.switch_cost(self.size)
+
+
+def memory_backend() -> MemoryBackend:
+    """
+    finds the memory of the computer, making it as the settings of the current build session choose if it has none yet
+    :return: the memory backend
+    """
+    def make() -> MemoryBackend:
+        if settings().memory == "scoreboard":
+            return ScoreboardMemory(settings().memory_size)
+        return BarrelMemory(packed=settings().packed_memory)
+    return state("memory_backend", make)
 
 
 def initialize_memory():
-    command(f"fill {MEM_BASE} {MEM_END} air")
-    command(
-        f"fill {MEM_BASE} {MEM_END} minecraft:barrel"
-        '{Items:['
-        '{Slot:0b,id:"minecraft:stone",Count:1b},'
-        '{Slot:1b,id:"minecraft:stone",Count:1b}'
-        ']}')
-    MEMORY_GETTER.create()
-    global high_half, low_half
-    high_half = Variable("high_half", 0)
-    low_half = Variable("low_half", 0)
+    memory_backend().initialize()
 
 
 def reset_memory():
@@ -50,73 +247,84 @@ def move_getter_to_index(index: Variable):
 
 
 def memory_load(index: Variable, dest: Variable):
-    memory_load_high_half = Variable("high_half")
-
-    move_getter_to_index(index)
-
-    (
-        Execute()
-        .at_entity(MEMORY_GETTER)
-        .store_result(memory_load_high_half)
-        .run(Command("data get block ~ ~ ~ Items[0].Count"))
-    )
-
-    (
-        Execute()
-        .at_entity(MEMORY_GETTER)
-        .store_result(dest)
-        .run(Command("data get block ~ ~ ~ Items[1].Count"))
-    )
-
-    dest -= 1
-    memory_load_high_half -= 1
-    memory_load_high_half *= 64
-    dest += memory_load_high_half
+    memory_backend().load(index, dest)
 
 
 def memory_store(index: Variable, src: Variable):
-    global high_half, low_half
-    move_getter_to_index(index)
-
-    barrel = Block(coordinates.CURRENT)
-
-    high_half.set(src)
-    high_half /= 64
-    high_half += 1
-    low_half.set(src)
-    low_half %= 64
-    low_half += 1
-
-    (
-        Execute()
-        .at_entity(MEMORY_GETTER)
-        .store_result(barrel.slot(0))
-        .run(high_half.get())
-    )
-
-    (
-        Execute()
-        .at_entity(MEMORY_GETTER)
-        .store_result(barrel.slot(1))
-        .run(low_half.get())
-    )
+    from computer.computer import icache
+
+    if settings().icache:
+        icache.invalidate(index)
+    memory_backend().store(index, src)
+
+
+def access_costs(backend: MemoryBackend) -> tuple[int, int]:
+    """
+    counts the commands run by a load and by a store with a memory backend, once they are optimized.
+    the commands are generated for variables of their own, in chains that are thrown away.
+    :param backend: the backend, which is initialized
+    :return: the commands run by a load and by a store
+    """
+    with ChainContext(name="memory report"):
+        backend.initialize()
+        index = Variable("cost_index")
+        value = Variable("cost_value")
+    costs = []
+    for access in backend.load, backend.store:
+        ctx = ChainContext(name="memory report")
+        with ctx:
+            access(index, value)
+        ctx.lower()
+        costs.append(sum(1 for cmd in ctx.contents if cmd.command) + backend.function_cost())
+    return costs[0], costs[1]
+
+
+def memory_report(sizes: tuple[int, ...] = (256, 1024)) -> None:
+    """
+    prints the commands run per load and store by each memory backend.
+    the scoreboard backend is measured as in a datapack, which it needs.
+    :param sizes: the sizes of scoreboard memory to measure
+    """
+    backends = [("barrel", BarrelMemory()), ("packed barrel", BarrelMemory(packed=True))]
+    backends += [(f"scoreboard {size}", ScoreboardMemory(size)) for size in sizes]
+    options = settings()
+    enabled = options.datapack
+    print(f"{'backend':<16}{'load':>6}{'store':>7}")
+    for name, backend in backends:
+        options.datapack = enabled or isinstance(backend, ScoreboardMemory)
+        try:
+            load, store = access_costs(backend)
+        finally:
+            options.datapack = enabled
+        print(f"{name:<16}{load:>6}{store:>7}")
 
 
 def push(src: Variable):
+    from computer.computer import stack
     from computer.computer.registers import STACK_POINTER
+
+    if settings().stack_cache:
+        stack.push(src)
+        return
     memory_store(STACK_POINTER, src)
     STACK_POINTER -= 1
 
 
 def pop(dst: Variable):
+    from computer.computer import stack
     from computer.computer.registers import STACK_POINTER
+
+    if settings().stack_cache:
+        stack.pop(dst)
+        return
     STACK_POINTER += 1
     memory_load(STACK_POINTER, dst)
 
 
 def call(ptr: Variable):
     from computer.computer.registers import INSTRUCTION_POINTER
-    push(INSTRUCTION_POINTER + 1)
+    # the instruction pointer was moved past the call when it was fetched, so it is already the return address
+    push(INSTRUCTION_POINTER)
     INSTRUCTION_POINTER.set(ptr)
 
 
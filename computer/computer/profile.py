@@ -0,0 +1,263 @@
+"""
+profiling of the generated computer.
+
+every command is attributed to the chain context, and section of it, that generated it.
+the computer is then run in the interpreter, one instruction per tick, to count the commands each instruction costs.
+clones of a command block keep its origin, so code run through `execute_arbitrary_code` and `register_op`
+is attributed to the chain it was copied from.
+when generating a datapack, the functions are run instead, and the commands of switches are attributed to their caller.
+"""
+
+import copy
+import io
+import json
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+
+from computer.assembler.listings import instructions
+from computer.assembler.instruction import Instruction
+from computer.codegen import datapack
+from computer.codegen.chain_context import ChainGroup
+from computer.codegen.coordinates import Coordinates
+from computer.codegen.output import chain_positions
+from computer.codegen.session import settings
+from computer.computer.generate_computer import computer, computer_datapack
+from computer.interpreter.harness import load_computer, load_computer_datapack, write_word, PRIMARY_POS, \
+    PRIMARY_FUNCTION
+from computer.interpreter.interpreter import Interpreter
+from computer.interpreter.world import World
+
+# the phases of running an instruction, in the order they happen
+PHASES = ["fetch", "dispatch", "handler", "registers"]
+
+
+@dataclass
+class ChainProfile:
+    """
+    the static size of a chain
+    """
+    name: str
+    position: tuple[int, int, int]
+    # command blocks in the chain, including empty padding
+    length: int
+    # command blocks with a command
+    commands: int
+
+
+@dataclass
+class InstructionProfile:
+    """
+    the commands run by a single instruction
+    """
+    instruction: str
+    word: int
+    # commands run
+    commands: int
+    # chain steps taken, including empty and inactive command blocks
+    blocks: int
+    # the length of the chains the commands were run from
+    static: int
+    # commands run, by phase
+    phases: dict[str, int]
+    # commands run, by chain and section
+    origins: dict[str, int]
+    # failed commands, by error message
+    failures: dict[str, int] = field(default_factory=dict)
+
+
+def phase(origin: str) -> str:
+    """
+    classifies the origin of a command into a phase of running an instruction
+    :param origin: the chain context and section, e.g. `main/primary:fetch`
+    :return: the phase
+    """
+    name, _, section = origin.partition(":")
+    if name == "main/primary" or name.startswith("main/primary/"):
+        return section
+    if name.startswith("registers/"):
+        return "registers"
+    if name.endswith("/dispatch") or "/dispatch/" in name:
+        return "dispatch"
+    return "handler"
+
+
+def source_map(groups: list[tuple[ChainGroup, Coordinates]]) -> dict[tuple[int, int, int], str]:
+    """
+    finds the origin of each command block, as laid out by `ChainGroup.write_out`
+    :param groups: the groups written, with their positions
+    :return: the origin of each command block with a command
+    """
+    origins = {}
+    for group, pos in groups:
+        for index, chain_context in enumerate(group.chain_contexts):
+            positions = chain_positions(pos + Coordinates(0, 0, index), chain_context.contents)
+            for block_pos, cmd in zip(positions, chain_context.contents):
+                origin = cmd.origin or chain_context.name
+                if cmd.command and origin is not None:
+                    origins[block_pos.x, block_pos.y, block_pos.z] = origin
+    return origins
+
+
+def function_sources(groups: list[tuple[ChainGroup, Coordinates]]) -> dict[str, list[str]]:
+    """
+    finds the origin of each command of the functions of a datapack, as written by `write_datapack`
+    :param groups: the groups written
+    :return: the origins of the commands of each function, by function name
+    """
+    contexts = [chain_context for group, _ in groups for chain_context in group.chain_contexts]
+    return {
+        datapack.function_name(chain_context): [
+            cmd.origin or chain_context.name for cmd in chain_context.contents if cmd.command
+        ]
+        for chain_context in contexts + datapack.functions()
+    }
+
+
+def chain_profiles(groups: list[tuple[ChainGroup, Coordinates]]) -> list[ChainProfile]:
+    """
+    measures the static size of each chain
+    :param groups: the groups written, with their positions
+    :return: the size of each chain
+    """
+    return [
+        ChainProfile(
+            chain_context.name or "",
+            (pos.x, pos.y, pos.z + index),
+            len(chain_context.contents),
+            sum(1 for cmd in chain_context.contents if cmd.command),
+        )
+        for group, pos in groups
+        for index, chain_context in enumerate(group.chain_contexts)
+    ]
+
+
+def sample_word(inst: Instruction) -> int:
+    """
+    :return: the encoding of an instruction with all of its operands zero
+    """
+    return inst.opcode << (12 - inst.opcode_width)
+
+
+def describe(inst: Instruction) -> str:
+    return " ".join([inst.name, *inst.field_types])
+
+
+def profile_instruction(
+        initialized: World,
+        inst: Instruction,
+        chains: dict[str, int],
+        **schedule,
+) -> InstructionProfile:
+    """
+    runs a single instruction on a copy of an initialized computer
+    :param initialized: the world holding the computer, before any ticks have been run
+    :param inst: the instruction to run
+    :param chains: the length of each chain, by name
+    :param schedule: the command blocks and functions to run in the tick, as passed to `Interpreter`
+    :return: the commands run by the instruction
+    """
+    world = copy.deepcopy(initialized)
+    word = sample_word(inst)
+    write_word(world, 0, word)
+    stats = Interpreter(world, **schedule).tick()
+
+    phases = dict.fromkeys(PHASES, 0)
+    for origin, count in stats.origins.items():
+        phases[phase(origin)] = phases.get(phase(origin), 0) + count
+    names = {origin.partition(":")[0] for origin in stats.origins}
+    return InstructionProfile(
+        describe(inst),
+        word,
+        stats.commands,
+        stats.blocks,
+        sum(chains.get(name, 0) for name in names),
+        phases,
+        dict(sorted(stats.origins.items())),
+        stats.failures,
+    )
+
+
+def format_table(profiles: list[InstructionProfile]) -> str:
+    """
+    formats instruction profiles as a text table
+    :param profiles: the profiles to format
+    :return: the table
+    """
+    header = ["instruction", "word", *PHASES, "commands", "blocks", "static", "failures"]
+    rows = [
+        [p.instruction, f"{p.word:04o}", *(str(p.phases[name]) for name in PHASES),
+         str(p.commands), str(p.blocks), str(p.static), str(sum(p.failures.values()))]
+        for p in profiles
+    ]
+    widths = [max(len(row[i]) for row in [header, *rows]) for i in range(len(header))]
+    lines = []
+    for row in [header, *rows]:
+        cells = [cell.ljust(width) if i == 0 else cell.rjust(width) for i, (cell, width) in enumerate(zip(row, widths))]
+        lines.append("  ".join(cells))
+    return "\n".join(lines)
+
+
+def profile_warnings(profiles: list[InstructionProfile]) -> list[str]:
+    """
+    finds what the profiles of instructions suggest did not run as it should: instructions whose handler ran no
+    commands, and entities that were missing, such as an entity used to access registers that was never summoned.
+    their figures leave out the commands that did not run
+    :param profiles: the profiles to check
+    :return: a warning for each problem found
+    """
+    warnings = []
+    for p in profiles:
+        if p.phases["handler"] == 0:
+            warnings.append(f"{p.instruction}: its handler ran no commands")
+        for message, count in p.failures.items():
+            if message == "no entity was found":
+                warnings.append(f"{p.instruction}: {count} commands found no entity")
+    return warnings
+
+
+def profile_computer(
+        output: str = "generated/profile.json",
+        datapack_directory: str = "generated/datapack",
+) -> list[InstructionProfile]:
+    """
+    generates the computer and profiles every instruction, writing the results as json and printing a table.
+    the computer is generated as a datapack if the current build session is set to, and as command blocks otherwise.
+    :param output: the file to write the json to
+    :param datapack_directory: the directory to write the datapack to
+    :return: the profile of each instruction
+    """
+    if settings().datapack:
+        groups = computer_datapack(datapack_directory)
+        initialized = load_computer_datapack(datapack_directory).world
+        for name, origins in function_sources(groups).items():
+            initialized.functions[name].origins = origins
+        schedule = {"tick_functions": [PRIMARY_FUNCTION]}
+    else:
+        blk = io.StringIO()
+        groups = computer(blk)
+        initialized = load_computer(blk.getvalue().splitlines()).world
+        for pos, origin in source_map(groups).items():
+            block = initialized.blocks.get(pos)
+            if block is not None:
+                block.origin = origin
+        schedule = {"clock": [PRIMARY_POS]}
+
+    chains = chain_profiles(groups)
+    lengths = {}
+    for chain in chains:
+        lengths[chain.name] = max(lengths.get(chain.name, 0), chain.length)
+
+    profiles = [profile_instruction(initialized, inst, lengths, **schedule) for inst in instructions]
+    warnings = profile_warnings(profiles)
+
+    Path(output).parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "chains": [asdict(chain) for chain in chains],
+            "instructions": [asdict(profile) for profile in profiles],
+            "warnings": warnings,
+        }, f, indent=2)
+    print(format_table(profiles))
+    for warning in warnings:
+        print("warning:", warning)
+    return profiles
@@ -1,56 +1,87 @@
-from computer.codegen.chain_context import INIT_CONTEXT, ChainGroup, command
-from computer.codegen.command import Command
+from typing import Callable
+
+from computer.codegen import datapack
+from computer.codegen.chain_context import init_context, ChainGroup, ChainContext, command, capture
+from computer.codegen.command import Command, Clone, Score
 from computer.codegen.coordinates import Coordinates
 from computer.codegen.entity import Entity
 from computer.codegen.execute import Execute
+from computer.codegen.session import current, initializer, settings, state
 from computer.codegen.variable import Variable
 from computer.computer.layout import TEMP_BUF_BASE, REGISTER_BANK_POS
 
-with INIT_CONTEXT:
+# the variables declared when the module is loaded, with their initial values
+DECLARED: list[tuple[Variable, int]] = []
+
+
+def declare(name: str, value: int = 0) -> Variable:
+    """
+    declares a variable that every build session has
+    :param name: the name of the variable, which must not be taken
+    :param value: the initial value of the variable
+    :return: the variable
+    """
+    variable = Variable(name, value)
+    DECLARED.append((variable, value))
+    return variable
+
+
+with init_context():
     # register used for building constants
-    CONSTANT_REGISTER = Variable("cr")
+    CONSTANT_REGISTER = declare("cr")
     # register that points to the next instruction to execute
-    INSTRUCTION_POINTER = Variable("ip")
+    INSTRUCTION_POINTER = declare("ip")
     # register that points to the top of the stack
-    STACK_POINTER = Variable("sp", 4095)
+    STACK_POINTER = declare("sp", 4095)
     # register that points to the bottom of the current stack frame
-    BASE_POINTER = Variable("bp", 4095)
+    BASE_POINTER = declare("bp", 4095)
     # variable that contains the current opcode
-    OPCODE = Variable("opcode")
+    OPCODE = declare("opcode")
     # variable that contains the immediate operand for expansion card instructions
-    CARD_IMMEDIATE = Variable("card_immediate")
+    CARD_IMMEDIATE = declare("card_immediate")
 
     # source and destination for micro-ops
-    SRC = Variable("src")
-    DST = Variable("dst")
+    SRC = declare("src")
+    DST = declare("dst")
 
     # general-purpose registers
-    A0 = Variable("a0")
-    A1 = Variable("a1")
-    A2 = Variable("a2")
-    T0 = Variable("t0")
-    T1 = Variable("t1")
-    S0 = Variable("s0")
-    S1 = Variable("s1")
-    S2 = Variable("s2")
+    A0 = declare("a0")
+    A1 = declare("a1")
+    A2 = declare("a2")
+    T0 = declare("t0")
+    T1 = declare("t1")
+    S0 = declare("s0")
+    S1 = declare("s1")
+    S2 = declare("s2")
 
     # scratch registers
-    X0 = Variable("x0")
-    X1 = Variable("x1")
-    X2 = Variable("x2")
-    X3 = Variable("x3")
-    Y0 = Variable("y0")
-    Y1 = Variable("y1")
-    Y2 = Variable("y2")
-    Y3 = Variable("y3")
+    X0 = declare("x0")
+    X1 = declare("x1")
+    X2 = declare("x2")
+    X3 = declare("x3")
+    Y0 = declare("y0")
+    Y1 = declare("y1")
+    Y2 = declare("y2")
+    Y3 = declare("y3")
 
     # comparison flags
-    LF = Variable("LF")
-    LE = Variable("LE")
-    EQ = Variable("EQ")
-    GE = Variable("GE")
-    GT = Variable("GT")
-    NE = Variable("NE")
+    LF = declare("LF")
+    LE = declare("LE")
+    EQ = declare("EQ")
+    GE = declare("GE")
+    GT = declare("GT")
+    NE = declare("NE")
+
+
+@initializer
+def declare_registers() -> None:
+    """
+    declares the variables of this module in a new build session, under the same names
+    """
+    with init_context():
+        for variable, value in DECLARED:
+            current().registered_names.add(variable.name)
+            variable.set(value)
 
 
 GP_REGISTERS = [A0, A1, A2, T0, T1, S0, S1, S2]
@@ -93,6 +124,23 @@ def reset_registers() -> None:
 # entity that performs register loads and stores
 REGISTER_FETCHER = Entity("minecraft:armor_stand")
 
+# the chains of the register bank, by kind of register operation, with the registers they access
+REGISTER_BANK: list[tuple[str, list[Variable]]] = [
+    ("load gp", GP_REGISTERS),
+    ("store gp", GP_REGISTERS),
+    ("load scratch", SCRATCH_REGISTERS),
+    ("store scratch", SCRATCH_REGISTERS),
+]
+
+
+
+def register_functions() -> dict[tuple[int, Score], ChainContext]:
+    """
+    :return: the functions that perform register operations in a datapack, by kind and register id,
+    in the current build session
+    """
+    return state("register_functions", dict)
+
 
 def register_op(kind: int, reg_id: Variable) -> None:
     """
@@ -103,6 +151,9 @@ def register_op(kind: int, reg_id: Variable) -> None:
     """
     if not 0 <= kind < 8:
         raise ValueError
+    if settings().datapack:
+        register_function_op(kind, reg_id)
+        return
     # x: reg
     # y: constant
     # z: kind
@@ -111,10 +162,43 @@ def register_op(kind: int, reg_id: Variable) -> None:
     (
         Execute()
         .at_entity(REGISTER_FETCHER)
-        .run(Command(f"clone ~ ~ ~ ~ ~ ~ {TEMP_BUF_BASE}"))
+        .run(Clone("~ ~ ~", "~ ~ ~", TEMP_BUF_BASE))
     )
-    command(f"clone {TEMP_BUF_BASE} {TEMP_BUF_BASE} ~1 ~ ~")
-    command("")
+    command(Clone(TEMP_BUF_BASE, TEMP_BUF_BASE, "~1 ~ ~"))
+    command(Command(""))
+
+
+def register_function_op(kind: int, reg_id: Variable) -> None:
+    """
+    generates an operation to load or store a register in a datapack, by calling a function that switches on the register
+    :param kind: the kind of operation to perform
+    :param reg_id: the index of the register to load from or store into
+    """
+    functions = register_functions()
+    key = kind, reg_id.score
+    if key not in functions:
+        name, registers = REGISTER_BANK[kind]
+        function = datapack.function(f"registers/{name}/{reg_id.name}")
+        with function:
+            datapack.switch(
+                reg_id.score,
+                [(i, capture()(register_access(kind, register))[0]) for i, register in enumerate(registers)],
+                function.name,
+            )
+        functions[key] = function
+    command(datapack.call(functions[key]))
+
+
+def register_fan_out(registers: list[Variable], reg_id: Variable, access: Callable[[Variable], None]) -> None:
+    """
+    generates an access to a register by testing the register id against every register,
+    which accesses the register directly, without going through `SRC` or `DST`
+    :param registers: the registers, by id
+    :param reg_id: the register id to use
+    :param access: generates a single command that accesses a register
+    """
+    for i, register in enumerate(registers):
+        (reg_id == i).if_true(capture()(access(register)))
 
 
 def set_gpr(reg_id: Variable, src: Variable) -> None:
@@ -123,6 +207,9 @@ def set_gpr(reg_id: Variable, src: Variable) -> None:
     :param reg_id: the register id to use
     :param src: the variable to load from
     """
+    if settings().registers == "fan-out":
+        register_fan_out(GP_REGISTERS, reg_id, lambda register: register.set(src))
+        return
     SRC.set(src)
     register_op(0, reg_id)
 
@@ -133,6 +220,9 @@ def get_gpr(reg_id: Variable, dst: Variable) -> None:
     :param reg_id: the register id to use
     :param dst: the variable to store to
     """
+    if settings().registers == "fan-out":
+        register_fan_out(GP_REGISTERS, reg_id, lambda register: dst.set(register))
+        return
     register_op(1, reg_id)
     dst.set(DST)
 
@@ -143,6 +233,9 @@ def set_scratch(reg_id: Variable, src: Variable):
     :param reg_id: the register id to use
     :param src: the variable to load from
     """
+    if settings().registers == "fan-out":
+        register_fan_out(SCRATCH_REGISTERS, reg_id, lambda register: register.set(src))
+        return
     SRC.set(src)
     register_op(2, reg_id)
 
@@ -153,28 +246,24 @@ def get_scratch(reg_id: Variable, dst: Variable):
     :param reg_id: the register id to use
     :param dst: the variable to store to
     """
+    if settings().registers == "fan-out":
+        register_fan_out(SCRATCH_REGISTERS, reg_id, lambda register: dst.set(register))
+        return
     register_op(3, reg_id)
     dst.set(DST)
 
 
-def generate_register_loads(var: Variable, registers: list[Variable]) -> None:
-    """
-    generates a command block to load from each of the registers provided
-    :param var: the variable to store into
-    :param registers: the list of registers to generate loads for
-    """
-    for r in registers:
-        var.set(r)
-
-
-def generate_register_stores(var: Variable, registers: list[Variable]) -> None:
+def register_access(kind: int, register: Variable) -> None:
     """
-    generates a command block to store into each of the registers provided
-    :param var: the variable to load from
-    :param registers: the list of registers to generate stores for
+    generates the command of the register bank that performs a kind of operation on a register:
+    loading `SRC` into it, or storing it into `DST`
+    :param kind: the kind of operation, an index into `REGISTER_BANK`
+    :param register: the register
     """
-    for r in registers:
-        r.set(var)
+    if kind % 2 == 0:
+        register.set(SRC)
+    else:
+        DST.set(register)
 
 
 def register_group() -> ChainGroup:
@@ -182,14 +271,11 @@ def register_group() -> ChainGroup:
     creates the group that contains commands to load and store each register
     :return: the group
     """
-    group = ChainGroup()
-    with group.new(only_chain=True):
-        generate_register_loads(SRC, GP_REGISTERS)
-    with group.new(only_chain=True):
-        generate_register_stores(DST, GP_REGISTERS)
-    with group.new(only_chain=True):
-        generate_register_loads(SRC, SCRATCH_REGISTERS)
-    with group.new(only_chain=True):
-        generate_register_stores(DST, SCRATCH_REGISTERS)
+    # each register is accessed by cloning a single command block, so the chains are never run in order
+    group = ChainGroup(name="registers", optimize=False)
+    for kind, (name, registers) in enumerate(REGISTER_BANK):
+        with group.new(only_chain=True, name=name):
+            for register in registers:
+                register_access(kind, register)
 
     return group
@@ -0,0 +1,159 @@
+"""
+a cache of the top of the stack, kept on the scoreboard.
+
+the words just above the stack pointer are held in a ring of slots, the word at each address in the slot numbered by the
+address modulo the number of slots,
+and its depth counts how many of them are held. a push only stores to memory when the ring is full,
+spilling the deepest word to make room, and a pop only loads from memory when the ring is empty.
+the stack pointer always points where it would without the cache.
+memory instructions check the ring, so they see the words of the stack wherever they are.
+"""
+
+from dataclasses import dataclass
+from typing import Callable
+
+from computer.codegen import datapack
+from computer.codegen.chain_context import capture
+from computer.codegen.execute import Condition, Execute, run_if
+from computer.codegen.session import settings, state
+from computer.codegen.variable import Variable
+from computer.computer.memory import memory_load, memory_store
+from computer.computer.registers import STACK_POINTER
+
+
+@dataclass
+class StackCache:
+    """
+    the variables of the cache
+    """
+    # the slots of the ring
+    slots: list[Variable]
+    # the number of words held in the ring
+    depth: Variable
+    # the word being pushed to or popped from memory
+    word: Variable
+
+
+def stack_cache() -> StackCache:
+    """
+    finds the cache of the current build session, making it as its settings choose if it has none yet
+    :return: the cache
+    """
+    def make() -> StackCache:
+        slots = [Variable(f"stack_slot{i}") for i in range(settings().stack_cache)]
+        return StackCache(slots, Variable("stack_depth"), Variable("stack_word"))
+    return state("stack_cache", make)
+
+
+def initialize_stack_cache() -> None:
+    """
+    creates the slots of the cache, holding nothing
+    """
+    stack_cache()
+
+
+def run_rarely(condition: Condition, name: str, body: Callable[[], None]) -> None:
+    """
+    runs code that is only needed when the ring overflows or underflows.
+    in a datapack, it is put in a function, so that it costs a single command otherwise.
+    :param condition: when to run the code, which the code must not change
+    :param name: the name of the function for the code
+    :param body: generates the code
+    """
+    if not settings().datapack:
+        with run_if(condition):
+            body()
+        return
+    # the functions that spill and fill in a datapack, by name
+    functions = state("stack_functions", dict)
+    if name not in functions:
+        functions[name] = datapack.function(f"stack/{name}")
+        with functions[name]:
+            body()
+    condition.if_true(datapack.call(functions[name]))
+
+
+def spill() -> None:
+    """
+    stores the deepest word held, which is in the slot the next push goes into, to memory
+    """
+    cache = stack_cache()
+    size = settings().stack_cache
+    slot = STACK_POINTER % size
+    for i, word in enumerate(cache.slots):
+        (slot == i).if_true(capture()(cache.word.set(word)))
+    memory_store(STACK_POINTER + size, cache.word)
+
+
+def push(src: Variable) -> None:
+    """
+    pushes a word onto the stack
+    :param src: the word
+    """
+    cache = stack_cache()
+    size = settings().stack_cache
+    run_rarely(cache.depth >= size, "spill", spill)
+    slot = STACK_POINTER % size
+    for i, word in enumerate(cache.slots):
+        (slot == i).if_true(capture()(word.set(src)))
+    (cache.depth < size).if_true(capture()(cache.depth.__iadd__(1)))
+    STACK_POINTER.__isub__(1)
+
+
+def pop(dst: Variable) -> None:
+    """
+    pops a word off the stack
+    :param dst: the variable to pop into
+    """
+    cache = stack_cache()
+    STACK_POINTER.__iadd__(1)
+    slot = STACK_POINTER % settings().stack_cache
+    for i, word in enumerate(cache.slots):
+        Execute().if_condition(cache.depth > 0).if_condition(slot == i).run(capture()(cache.word.set(word))[0])
+    run_rarely(cache.depth <= 0, "fill", lambda: memory_load(STACK_POINTER, cache.word))
+    (cache.depth > 0).if_true(capture()(cache.depth.__isub__(1)))
+    dst.set(cache.word)
+
+
+def held(address: Variable) -> list[Execute]:
+    """
+    finds the slot that would hold an address
+    :param address: the address
+    :return: for each slot, an `Execute` that only runs if it holds the address
+    """
+    size = settings().stack_cache
+    offset = address - STACK_POINTER
+    slot = address % size
+    return [
+        Execute().if_condition(offset > 0).if_condition(offset <= stack_cache().depth).if_condition(slot == i)
+        for i in range(size)
+    ]
+
+
+def load(address: Variable, dest: Variable) -> None:
+    """
+    loads a word of memory, including the words of the stack that are only held in the cache
+    :param address: the address of the word
+    :param dest: the variable to load into
+    """
+    if not settings().stack_cache:
+        memory_load(address, dest)
+        return
+    slots = held(address)
+    memory_load(address, dest)
+    for execute, word in zip(slots, stack_cache().slots):
+        execute.run(capture()(dest.set(word))[0])
+
+
+def store(address: Variable, src: Variable) -> None:
+    """
+    stores a word to memory, and to the slot of the cache holding it, if there is one
+    :param address: the address of the word
+    :param src: the variable to store
+    """
+    if not settings().stack_cache:
+        memory_store(address, src)
+        return
+    memory_store(address, src)
+    for execute, word in zip(held(address), stack_cache().slots):
+        execute.run(capture()(word.set(src))[0])
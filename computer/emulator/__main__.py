@@ -0,0 +1,3 @@
+from computer.emulator.main import main
+
+main()
@@ -0,0 +1,441 @@
+from __future__ import annotations
+
+from typing import Callable, Iterable, Optional
+
+from computer.assembler.decode import DECODE_TABLE, sign_extend
+from computer.assembler.instruction import Instruction
+from computer.emulator.scoreboard import wrap, div, mod
+
+MEMORY_SIZE = 4096
+ADDRESS_MASK = MEMORY_SIZE - 1
+WORD_MASK = 0o7777
+
+# flag ids, as in the readme
+LT, LE, EQ, GE, GT, NE = range(6)
+
+# a step takes the address of the next instruction and returns the address to continue from
+Step = Callable[[int], int]
+
+
+class IllegalInstruction(Exception):
+    """
+    raised by a strict machine when it executes a reserved instruction
+    """
+
+
+class Machine:
+    """
+    an instruction-level emulator for the computer.
+
+    state is modelled on the scoreboard variables used by the generated computer: memory holds 12-bit words,
+    registers hold signed 32 bit integers and arithmetic follows the scoreboard's rules.
+    every word of the opcode space is decoded once into a step function with its operands already extracted,
+    so that running an instruction is a single table lookup and call.
+    """
+
+    memory: list[int]
+    gp: list[int]
+    scratch: list[int]
+    flags: list[int]
+
+    def __init__(self, program: Iterable[int] = (), strict: bool = False):
+        """
+        :param program: machine code to load at address 0
+        :param strict: whether to raise `IllegalInstruction` on reserved instructions instead of logging them
+        """
+        self.memory = [0] * MEMORY_SIZE
+        self.gp = [0] * 8
+        self.scratch = [0] * 8
+        self.flags = [0] * 6
+        self.cr = 0
+        self.ip = 0
+        self.sp = 4095
+        self.bp = 4095
+        self.strict = strict
+        self.halted = False
+        self.steps = 0
+        # expansion cards, called with the machine and the card's 6-bit immediate
+        self.cards: dict[int, Callable[[Machine, int], None]] = {}
+        self.load(program)
+        self._steps = [self._decode(word) for word in range(MEMORY_SIZE)]
+
+    def load(self, program: Iterable[int], address: int = 0) -> None:
+        """
+        copies machine code into memory
+        :param program: the words to copy
+        :param address: the address to copy them to
+        """
+        for offset, word in enumerate(program):
+            self.memory[(address + offset) & ADDRESS_MASK] = word & WORD_MASK
+
+    def push(self, value: int) -> None:
+        """
+        pushes a value to the stack, as `memory.push` does
+        :param value: the value to push
+        """
+        self.memory[self.sp & ADDRESS_MASK] = value & WORD_MASK
+        self.sp = (self.sp - 1) & ADDRESS_MASK
+
+    def pop(self) -> int:
+        """
+        pops a value from the stack, as `memory.pop` does
+        :return: the popped value
+        """
+        self.sp = (self.sp + 1) & ADDRESS_MASK
+        return self.memory[self.sp]
+
+    def illegal(self, inst: Instruction, address: int) -> None:
+        """
+        handles a reserved instruction, which the generated computer logs and skips
+        :param inst: the reserved instruction
+        :param address: the address it was run from
+        """
+        if self.strict:
+            raise IllegalInstruction(f"reserved instruction {inst.name} at {address:04o}")
+        print("ILLEGAL CALL OF RESERVED INSTRUCTION")
+
+    def step(self) -> None:
+        """
+        runs a single instruction
+        """
+        self.run(1)
+
+    def run(self, limit: int = -1) -> int:
+        """
+        runs instructions until the machine halts or the limit is reached.
+        the machine halts when an instruction jumps to itself.
+        :param limit: the maximum number of instructions to run, or -1 for no limit
+        :return: the number of instructions run
+        """
+        steps = self._steps
+        memory = self.memory
+        ip = self.ip
+        n = 0
+        try:
+            while n != limit:
+                pc = ip
+                ip = steps[memory[pc]]((pc + 1) & ADDRESS_MASK)
+                n += 1
+                if ip == pc:
+                    self.halted = True
+                    break
+        finally:
+            self.ip = ip
+            self.steps += n
+        return n
+
+    def _decode(self, word: int) -> Step:
+        """
+        creates the step function for a word
+        :param word: the word to decode
+        :return: the step function
+        """
+        inst, operands = DECODE_TABLE[word]
+        return SEMANTICS.get((inst.name, *inst.field_types), _reserved)(self, inst, *operands)
+
+
+def _reserved(m: Machine, inst: Instruction, *_) -> Step:
+    def step(ip):
+        m.illegal(inst, (ip - 1) & ADDRESS_MASK)
+        return ip
+    return step
+
+
+def _binary(f: Callable[[int, int], int]):
+    def factory(m: Machine, _, a: int, b: int) -> Step:
+        gp = m.gp
+
+        def step(ip):
+            gp[a] = f(gp[a], gp[b])
+            return ip
+        return step
+    return factory
+
+
+def _unary(f: Callable[[int], int]):
+    def factory(m: Machine, _, a: int) -> Step:
+        gp = m.gp
+
+        def step(ip):
+            gp[a] = f(gp[a])
+            return ip
+        return step
+    return factory
+
+
+def _mov(m: Machine, _, a: int, b: int) -> Step:
+    gp = m.gp
+
+    def step(ip):
+        gp[a] = gp[b]
+        return ip
+    return step
+
+
+def _add(m: Machine, _, a: int, b: int) -> Step:
+    gp = m.gp
+
+    def step(ip):
+        v = gp[a] + gp[b]
+        gp[a] = v if -0x80000000 <= v <= 0x7fffffff else wrap(v)
+        return ip
+    return step
+
+
+def _sub(m: Machine, _, a: int, b: int) -> Step:
+    gp = m.gp
+
+    def step(ip):
+        v = gp[a] - gp[b]
+        gp[a] = v if -0x80000000 <= v <= 0x7fffffff else wrap(v)
+        return ip
+    return step
+
+
+def _split(m: Machine, _, a: int, b: int) -> Step:
+    gp = m.gp
+
+    def step(ip):
+        v = gp[b]
+        gp[a] = v % 0o1000
+        gp[b] = v // 0o1000
+        return ip
+    return step
+
+
+def _cmp(m: Machine, _, a: int, b: int) -> Step:
+    gp = m.gp
+    flags = m.flags
+
+    def step(ip):
+        x = gp[a]
+        y = gp[b]
+        flags[:] = (x < y, x <= y, x == y, x >= y, x > y, x != y)
+        return ip
+    return step
+
+
+def _cmp_zero(m: Machine, _, a: int) -> Step:
+    gp = m.gp
+    flags = m.flags
+
+    def step(ip):
+        x = gp[a]
+        flags[:] = (x < 0, x <= 0, x == 0, x >= 0, x > 0, x != 0)
+        return ip
+    return step
+
+
+def _load_scratch(m: Machine, _, a: int, b: int) -> Step:
+    gp = m.gp
+    scratch = m.scratch
+
+    def step(ip):
+        gp[a] = scratch[b]
+        return ip
+    return step
+
+
+def _store_scratch(m: Machine, _, a: int, b: int) -> Step:
+    gp = m.gp
+    scratch = m.scratch
+
+    def step(ip):
+        scratch[a] = gp[b]
+        return ip
+    return step
+
+
+def _load(m: Machine, _, a: int, b: int) -> Step:
+    gp = m.gp
+    memory = m.memory
+
+    def step(ip):
+        gp[a] = memory[gp[b] & ADDRESS_MASK]
+        return ip
+    return step
+
+
+def _store(m: Machine, _, a: int, b: int) -> Step:
+    gp = m.gp
+    memory = m.memory
+
+    def step(ip):
+        memory[gp[a] & ADDRESS_MASK] = gp[b] & WORD_MASK
+        return ip
+    return step
+
+
+def _ldc(m: Machine, _, a: int) -> Step:
+    gp = m.gp
+
+    def step(ip):
+        gp[a] = m.cr
+        return ip
+    return step
+
+
+def _inc(m: Machine, _, a: int) -> Step:
+    gp = m.gp
+
+    def step(ip):
+        v = gp[a] + 1
+        gp[a] = v if v <= 0x7fffffff else wrap(v)
+        return ip
+    return step
+
+
+def _dec(m: Machine, _, a: int) -> Step:
+    gp = m.gp
+
+    def step(ip):
+        v = gp[a] - 1
+        gp[a] = v if v >= -0x80000000 else wrap(v)
+        return ip
+    return step
+
+
+def _push(m: Machine, _, a: int) -> Step:
+    def step(ip):
+        m.push(m.gp[a])
+        return ip
+    return step
+
+
+def _pop(m: Machine, _, a: int) -> Step:
+    def step(ip):
+        m.gp[a] = m.pop()
+        return ip
+    return step
+
+
+def _ret(m: Machine, _) -> Step:
+    return lambda ip: m.pop()
+
+
+def _jump(flag: Optional[int]):
+    def factory(m: Machine, _, imm: int) -> Step:
+        offset = sign_extend(imm, 7)
+        flags = m.flags
+        if flag is None:
+            return lambda ip: (ip + offset) & ADDRESS_MASK
+
+        def step(ip):
+            if flags[flag]:
+                return (ip + offset) & ADDRESS_MASK
+            return ip
+        return step
+    return factory
+
+
+def _jump_absolute(flag: Optional[int]):
+    def factory(m: Machine, _, imm: int) -> Step:
+        high = imm * 256
+        flags = m.flags
+        if flag is None:
+            return lambda ip: (high + m.cr) & ADDRESS_MASK
+
+        def step(ip):
+            if flags[flag]:
+                return (high + m.cr) & ADDRESS_MASK
+            return ip
+        return step
+    return factory
+
+
+def _call(m: Machine, _, imm: int) -> Step:
+    high = imm * 256
+
+    def step(ip):
+        m.push(ip)
+        return (high + m.cr) & ADDRESS_MASK
+    return step
+
+
+def _const(m: Machine, _, imm: int) -> Step:
+    def step(ip):
+        m.cr = imm
+        return ip
+    return step
+
+
+def _sconst(m: Machine, _, imm: int) -> Step:
+    value = sign_extend(imm, 8)
+
+    def step(ip):
+        m.cr = value
+        return ip
+    return step
+
+
+def _econst(m: Machine, _, imm: int) -> Step:
+    def step(ip):
+        m.cr = wrap(m.cr * 256 + imm)
+        return ip
+    return step
+
+
+def _card(m: Machine, _, card: int, imm: int) -> Step:
+    def step(ip):
+        handler = m.cards.get(card)
+        if handler is not None:
+            handler(m, imm)
+        return ip
+    return step
+
+
+# step function factories, keyed on mnemonic and operand types
+SEMANTICS: dict[tuple[str, ...], Callable[..., Step]] = {
+    ("mov", "r32", "r32"): _mov,
+    ("add", "r32", "r32"): _add,
+    ("sub", "r32", "r32"): _sub,
+    ("mul", "r32", "r32"): _binary(lambda a, b: wrap(a * b)),
+    ("div", "r32", "r32"): _binary(div),
+    ("mod", "r32", "r32"): _binary(mod),
+    ("min", "r32", "r32"): _binary(min),
+    ("max", "r32", "r32"): _binary(max),
+
+    ("split", "r32", "r32"): _split,
+    ("cmp", "r32", "r32"): _cmp,
+    ("mov", "r32", "s32"): _load_scratch,
+    ("mov", "s32", "r32"): _store_scratch,
+    ("mov", "r32", "p32"): _load,
+    ("mov", "p32", "r32"): _store,
+
+    ("ldc", "r32"): _ldc,
+    ("inc", "r32"): _inc,
+    ("dec", "r32"): _dec,
+    ("neg", "r32"): _unary(lambda a: wrap(-a)),
+    ("clr", "r32"): _unary(lambda a: 0),
+    ("asr12", "r32"): _unary(lambda a: a // 4096),
+    ("asl12", "r32"): _unary(lambda a: wrap(a * 4096)),
+
+    ("cmp", "r32"): _cmp_zero,
+    ("push", "r32"): _push,
+    ("pop", "r32"): _pop,
+
+    ("ret",): _ret,
+
+    ("jlt", "imm"): _jump(LT),
+    ("jle", "imm"): _jump(LE),
+    ("jeq", "imm"): _jump(EQ),
+    ("jge", "imm"): _jump(GE),
+    ("jgt", "imm"): _jump(GT),
+    ("jne", "imm"): _jump(NE),
+    ("jmp", "imm"): _jump(None),
+
+    ("jlta", "imm"): _jump_absolute(LT),
+    ("jlea", "imm"): _jump_absolute(LE),
+    ("jeqa", "imm"): _jump_absolute(EQ),
+    ("jgea", "imm"): _jump_absolute(GE),
+    ("jgta", "imm"): _jump_absolute(GT),
+    ("jnea", "imm"): _jump_absolute(NE),
+    ("jmpa", "imm"): _jump_absolute(None),
+    ("call", "imm"): _call,
+
+    ("const", "imm"): _const,
+    ("sconst", "imm"): _sconst,
+    ("econst", "imm"): _econst,
+
+    ("card", "imm", "imm"): _card,
+}
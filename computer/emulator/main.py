@@ -0,0 +1,59 @@
+from argparse import ArgumentParser
+from time import perf_counter
+
+from computer.assembler import listings
+from computer.emulator.machine import Machine
+
+# the number of instructions run unless told otherwise, so that a program that never halts still stops
+DEFAULT_STEPS = 1_000_000
+
+
+def read_program(path: str, octal: bool = False) -> list[int]:
+    """
+    reads a program from a file of assembly, or of octal machine code as printed by the assembler
+    :param path: the file to read
+    :param octal: whether the file holds machine code rather than assembly
+    :return: the machine code
+    """
+    program = []
+    with open(path) as f:
+        for line in f:
+            line = line.split("#")[0].strip()
+            if not line:
+                continue
+            if octal:
+                program.append(int(line.split()[0], 8))
+            else:
+                program.append(listings.encode(line))
+    return program
+
+
+def main():
+    parser = ArgumentParser(prog="emulator", description="run machine code on an instruction-level emulator")
+    parser.add_argument("file", help="the program to run")
+    parser.add_argument("--octal", action="store_true", help="read octal machine code instead of assembly")
+    parser.add_argument("--steps", type=int, default=DEFAULT_STEPS,
+                        help=f"the maximum number of instructions to run, {DEFAULT_STEPS} by default, "
+                             f"or -1 for no limit")
+    parser.add_argument("--strict", action="store_true", help="stop on reserved instructions")
+    args = parser.parse_args()
+
+    machine = Machine(read_program(args.file, args.octal), strict=args.strict)
+
+    start = perf_counter()
+    steps = machine.run(args.steps)
+    elapsed = perf_counter() - start
+
+    print("halted" if machine.halted else "stopped", f"after {steps} instructions", end="")
+    if elapsed > 0:
+        print(f" ({steps / elapsed:,.0f} instructions/s)")
+    else:
+        print()
+    print(f"ip={machine.ip:04o} sp={machine.sp:04o} bp={machine.bp:04o} cr={machine.cr}")
+    for name, value in zip(("a0", "a1", "a2", "t0", "t1", "s0", "s1", "s2"), machine.gp):
+        print(f"{name}={value}", end=" ")
+    print()
+    for name, value in zip(("x0", "x1", "x2", "x3", "y0", "y1", "y2", "y3"), machine.scratch):
+        print(f"{name}={value}", end=" ")
+    print()
+    print(" ".join(f"{name}={int(value)}" for name, value in zip(("LT", "LE", "EQ", "GE", "GT", "NE"), machine.flags)))
@@ -0,0 +1,66 @@
+"""
+integer semantics of the minecraft scoreboard.
+
+scores are signed 32 bit integers. arithmetic wraps around on overflow, division rounds towards negative infinity
+and modulo takes the sign of the divisor, as with java's `Math.floorDiv` and `Math.floorMod`.
+dividing by zero makes the command fail, leaving the score unchanged.
+"""
+
+INT_MIN = -(1 << 31)
+INT_MAX = (1 << 31) - 1
+
+
+def wrap(n: int) -> int:
+    """
+    wraps an integer around to the signed 32 bit range
+    :param n: the integer to wrap
+    :return: the wrapped integer
+    """
+    if INT_MIN <= n <= INT_MAX:
+        return n
+    return ((n + (1 << 31)) & 0xffffffff) - (1 << 31)
+
+
+def add(a: int, b: int) -> int:
+    return wrap(a + b)
+
+
+def sub(a: int, b: int) -> int:
+    return wrap(a - b)
+
+
+def mul(a: int, b: int) -> int:
+    return wrap(a * b)
+
+
+def div(a: int, b: int) -> int:
+    """
+    scoreboard division, `/=`
+    :return: `a` divided by `b`, rounded down, or `a` if `b` is zero
+    """
+    if b == 0:
+        return a
+    return wrap(a // b)
+
+
+def mod(a: int, b: int) -> int:
+    """
+    scoreboard modulo, `%=`
+    :return: `a` modulo `b`, with the sign of `b`, or `a` if `b` is zero
+    """
+    if b == 0:
+        return a
+    return a % b
+
+
+# scoreboard operators, as used by `scoreboard players operation`
+OPERATIONS = {
+    "=": lambda a, b: b,
+    "+=": add,
+    "-=": sub,
+    "*=": mul,
+    "/=": div,
+    "%=": mod,
+    "<": min,
+    ">": max,
+}
@@ -0,0 +1,3 @@
+from computer.interpreter.main import main
+
+main()
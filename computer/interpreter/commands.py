@@ -0,0 +1,712 @@
+"""
+compilation of command strings into python closures.
+
+only the subset of commands emitted by `computer.codegen` is supported.
+commands are compiled once and cached, so a command block that runs every tick is only parsed once.
+"""
+
+from __future__ import annotations
+
+import copy
+import math
+import re
+from functools import lru_cache
+from typing import Callable, Optional
+
+from computer.codegen import snbt
+from computer.emulator.scoreboard import OPERATIONS, wrap
+from computer.interpreter.world import World, Entity, CommandError, TestFailed, VOLUME_LIMIT, parse_path, get_path, set_path, \
+    nbt_to_int, cast
+
+
+class CommandSyntaxError(ValueError):
+    """
+    raised when a command can not be parsed
+    """
+
+
+class Context:
+    """
+    the source of a command: where it runs, and which entity runs it
+    """
+    __slots__ = "world", "pos", "executor", "stats"
+
+    def __init__(
+            self,
+            world: World,
+            pos: tuple[float, float, float],
+            executor: Optional[Entity] = None,
+            stats: Optional["TickStats"] = None,
+    ):
+        """
+        :param world: the world the command runs in
+        :param pos: the position the command runs at
+        :param executor: the entity running the command
+        :param stats: statistics that the commands of functions run by the command are counted in
+        """
+        self.world = world
+        self.pos = pos
+        self.executor = executor
+        self.stats = stats
+
+    def at(self, pos: tuple[float, float, float]) -> Context:
+        return Context(self.world, pos, self.executor, self.stats)
+
+    def as_entity(self, entity: Entity) -> Context:
+        return Context(self.world, self.pos, entity, self.stats)
+
+
+# a compiled command, returning its result or raising `CommandError` if it fails
+Compiled = Callable[[Context], int]
+# a compiled position argument
+Position = Callable[[Context], tuple[float, float, float]]
+# a compiled block position argument
+BlockPosition = Callable[[Context], tuple[int, int, int]]
+
+
+class Reader:
+    """
+    reads the arguments of a command one at a time
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+
+    def skip_spaces(self) -> None:
+        while self.pos < len(self.text) and self.text[self.pos] == " ":
+            self.pos += 1
+
+    def at_end(self) -> bool:
+        self.skip_spaces()
+        return self.pos >= len(self.text)
+
+    def word(self) -> str:
+        self.skip_spaces()
+        end = self.text.find(" ", self.pos)
+        if end == -1:
+            end = len(self.text)
+        if end == self.pos:
+            raise CommandSyntaxError(f"expected an argument at position {self.pos} in {self.text!r}")
+        word = self.text[self.pos:end]
+        self.pos = end
+        return word
+
+    def rest(self) -> str:
+        self.skip_spaces()
+        rest = self.text[self.pos:]
+        self.pos = len(self.text)
+        return rest
+
+    def snbt(self):
+        self.skip_spaces()
+        try:
+            value, self.pos = snbt.parse_prefix(self.text, self.pos)
+        except snbt.SnbtError as e:
+            raise CommandSyntaxError(str(e)) from None
+        return value
+
+    def block(self) -> tuple[str, Optional[dict]]:
+        """
+        reads a block argument, e.g. `minecraft:barrel[facing=up]{Items:[]}`
+        :return: the block state and its block entity data
+        """
+        self.skip_spaces()
+        m = re.compile(r"[a-z0-9_:.\-]+(\[[^]]*])?").match(self.text, self.pos)
+        if m is None:
+            raise CommandSyntaxError(f"expected a block in {self.text!r}")
+        self.pos = m.end()
+        state = m[0] if ":" in m[0] else "minecraft:" + m[0]
+        nbt = None
+        if self.pos < len(self.text) and self.text[self.pos] == "{":
+            nbt = self.snbt()
+        return state, nbt
+
+    def end(self) -> None:
+        if not self.at_end():
+            raise CommandSyntaxError(f"trailing data {self.text[self.pos:]!r} in {self.text!r}")
+
+
+def coordinate(token: str, centre: bool) -> Callable[[float], float]:
+    """
+    compiles a single coordinate
+    :param token: the coordinate, e.g. `~`, `~-2` or `12.0`
+    :param centre: whether whole absolute coordinates refer to the centre of the block
+    :return: a function of the current coordinate
+    """
+    try:
+        if token.startswith("~"):
+            offset = float(token[1:]) if len(token) > 1 else 0.0
+            return lambda current: current + offset
+        value = float(token)
+    except ValueError:
+        raise CommandSyntaxError(f"invalid coordinate {token!r}") from None
+    if centre and "." not in token:
+        value += 0.5
+    return lambda _: value
+
+
+def position(reader: Reader, centre: bool = False) -> Position:
+    fx, fy, fz = (coordinate(reader.word(), centre and axis != 1) for axis in range(3))
+
+    def resolve(ctx: Context):
+        x, y, z = ctx.pos
+        return fx(x), fy(y), fz(z)
+    return resolve
+
+
+def block_position(reader: Reader) -> BlockPosition:
+    resolve = position(reader)
+
+    def resolve_block(ctx: Context):
+        x, y, z = resolve(ctx)
+        return math.floor(x), math.floor(y), math.floor(z)
+    return resolve_block
+
+
+def selector(reader: Reader) -> Callable[[Context], list[Entity]]:
+    text = reader.word()
+    return lambda ctx: ctx.world.selector(text, ctx.executor)
+
+
+def compile_scoreboard(reader: Reader) -> Compiled:
+    match reader.word():
+        case "objectives":
+            match reader.word():
+                case "add":
+                    name = reader.word()
+                    reader.rest()
+
+                    def add_objective(ctx: Context):
+                        if name in ctx.world.scores:
+                            raise CommandError(f"an objective already exists by the name '{name}'")
+                        ctx.world.scores[name] = {}
+                        return 1
+                    return add_objective
+                case "setdisplay" | "modify":
+                    reader.rest()
+                    return lambda ctx: 1
+                case sub:
+                    raise CommandSyntaxError(f"unsupported command scoreboard objectives {sub}")
+        case "players":
+            return compile_players(reader)
+        case sub:
+            raise CommandSyntaxError(f"unsupported command scoreboard {sub}")
+
+
+def compile_players(reader: Reader) -> Compiled:
+    action = reader.word()
+    player = reader.word()
+    objective = reader.word()
+    match action:
+        case "set" | "add" | "remove":
+            amount = int(reader.word())
+            reader.end()
+
+            def modify(ctx: Context):
+                scores = ctx.world.objective(objective)
+                if action == "set":
+                    value = amount
+                else:
+                    value = wrap(scores.get(player, 0) + (amount if action == "add" else -amount))
+                scores[player] = value
+                return value
+            return modify
+        case "get":
+            reader.end()
+
+            def get(ctx: Context):
+                value = ctx.world.score(player, objective)
+                if value is None:
+                    raise CommandError(f"can't get value of {objective} for {player}; none is set")
+                return value
+            return get
+        case "reset":
+            reader.end()
+
+            def reset(ctx: Context):
+                ctx.world.objective(objective).pop(player, None)
+                return 1
+            return reset
+        case "operation":
+            op = reader.word()
+            source = reader.word()
+            source_objective = reader.word()
+            reader.end()
+            if op == "><":
+                def swap(ctx: Context):
+                    a = ctx.world.objective(objective)
+                    b = ctx.world.objective(source_objective)
+                    a[player], b[source] = b.get(source, 0), a.get(player, 0)
+                    return a[player]
+                return swap
+            try:
+                f = OPERATIONS[op]
+            except KeyError:
+                raise CommandSyntaxError(f"invalid scoreboard operation {op}") from None
+
+            def operation(ctx: Context):
+                a = ctx.world.objective(objective)
+                b = ctx.world.objective(source_objective)
+                value = b.setdefault(source, 0)
+                if op in ("/=", "%=") and value == 0:
+                    raise CommandError("can't divide by zero")
+                result = f(a.get(player, 0), value)
+                a[player] = result
+                return result
+            return operation
+        case _:
+            raise CommandSyntaxError(f"unsupported command scoreboard players {action}")
+
+
+COMPARISONS = {
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    "=": lambda a, b: a == b,
+    ">=": lambda a, b: a >= b,
+    ">": lambda a, b: a > b,
+}
+
+
+def int_range(text: str) -> Callable[[int], bool]:
+    """
+    compiles an integer range, e.g. `3`, `..-1` or `4..7`
+    """
+    try:
+        if ".." not in text:
+            n = int(text)
+            return lambda v: v == n
+        low, high = text.split("..")
+        low = int(low) if low else None
+        high = int(high) if high else None
+    except ValueError:
+        raise CommandSyntaxError(f"invalid integer range {text!r}") from None
+    return lambda v: (low is None or v >= low) and (high is None or v <= high)
+
+
+def compile_condition(reader: Reader) -> Callable[[Context], bool]:
+    match reader.word():
+        case "score":
+            player = reader.word()
+            objective = reader.word()
+            op = reader.word()
+            if op == "matches":
+                test = int_range(reader.word())
+
+                def matches(ctx: Context):
+                    value = ctx.world.score(player, objective)
+                    return value is not None and test(value)
+                return matches
+            compare = COMPARISONS.get(op)
+            if compare is None:
+                raise CommandSyntaxError(f"invalid comparison {op}")
+            source = reader.word()
+            source_objective = reader.word()
+
+            def comparison(ctx: Context):
+                a = ctx.world.score(player, objective)
+                b = ctx.world.score(source, source_objective)
+                return a is not None and b is not None and compare(a, b)
+            return comparison
+        case "entity":
+            entities = selector(reader)
+            return lambda ctx: len(entities(ctx)) > 0
+        case "block":
+            pos = block_position(reader)
+            state, _ = reader.block()
+
+            def block(ctx: Context):
+                found = ctx.world.blocks.get(pos(ctx))
+                found = "minecraft:air" if found is None else found.state
+                return found == state or (found.split("[")[0] == state and "[" not in state)
+            return block
+        case kind:
+            raise CommandSyntaxError(f"unsupported condition {kind}")
+
+
+def compile_store(reader: Reader) -> Callable[[Context], Callable[[int], None]]:
+    """
+    compiles the target of an `execute store` subcommand
+    :return: a function taking the context at the store and returning a function that stores a value
+    """
+    match reader.word():
+        case "score":
+            player = reader.word()
+            objective = reader.word()
+
+            def score(ctx: Context):
+                def store(value: int):
+                    ctx.world.objective(objective)[player] = wrap(value)
+                return store
+            return score
+        case "block" | "entity" as kind:
+            target = block_position(reader) if kind == "block" else selector(reader)
+            path = parse_path(reader.word())
+            mc_type = reader.word()
+            scale = float(reader.word())
+
+            def nbt(ctx: Context):
+                if kind == "block":
+                    block = ctx.world.blocks.get(target(ctx))
+                    targets = [] if block is None or block.nbt is None else [block.nbt]
+                else:
+                    targets = [e.nbt for e in target(ctx)]
+
+                def store(value: int):
+                    for t in targets:
+                        set_path(t, path, cast(mc_type, value * scale))
+                return store
+            return nbt
+        case kind:
+            raise CommandSyntaxError(f"unsupported store target {kind}")
+
+
+def compile_execute(reader: Reader) -> Compiled:
+    # each stage maps a list of (context, stores) forks to a new list of forks
+    stages = []
+    command = None
+    while command is None:
+        subcommand = reader.word()
+        match subcommand:
+            case "if" | "unless":
+                test = compile_condition(reader)
+                expected = subcommand == "if"
+                if reader.at_end():
+                    # a trailing condition acts as the command being run
+                    def condition(ctx: Context, test=test, expected=expected):
+                        if test(ctx) != expected:
+                            raise TestFailed("test failed")
+                        return 1
+                    command = condition
+                else:
+                    stages.append(lambda forks, test=test, expected=expected: [
+                        (ctx, stores) for ctx, stores in forks if test(ctx) == expected
+                    ])
+            case "at":
+                entities = selector(reader)
+                stages.append(lambda forks, entities=entities: [
+                    (ctx.at(e.pos), stores) for ctx, stores in forks for e in entities(ctx)
+                ])
+            case "as":
+                entities = selector(reader)
+                stages.append(lambda forks, entities=entities: [
+                    (ctx.as_entity(e), stores) for ctx, stores in forks for e in entities(ctx)
+                ])
+            case "positioned":
+                pos = position(reader)
+                stages.append(lambda forks, pos=pos: [(ctx.at(pos(ctx)), stores) for ctx, stores in forks])
+            case "store":
+                kind = reader.word()
+                if kind not in ("result", "success"):
+                    raise CommandSyntaxError(f"invalid store kind {kind}")
+                target = compile_store(reader)
+                stages.append(lambda forks, target=target, success=kind == "success": [
+                    (ctx, stores + [(success, target(ctx))]) for ctx, stores in forks
+                ])
+            case "run":
+                command = compile_reader(reader)
+            case _:
+                raise CommandSyntaxError(f"unsupported execute subcommand {subcommand}")
+
+    def execute(ctx: Context):
+        forks = [(ctx, [])]
+        for stage in stages:
+            forks = stage(forks)
+        if not forks:
+            raise TestFailed("no forks remaining")
+        total = 0
+        succeeded = 0
+        error = TestFailed("execute failed")
+        for fork_ctx, stores in forks:
+            try:
+                result = command(fork_ctx)
+                success = 1
+            except CommandError as e:
+                result = success = 0
+                error = e
+            for store_success, store in stores:
+                store(success if store_success else result)
+            total += result
+            succeeded += success
+        if not succeeded:
+            raise error
+        return total
+    return execute
+
+
+def compile_clone(reader: Reader) -> Compiled:
+    begin = block_position(reader)
+    end = block_position(reader)
+    destination = block_position(reader)
+    mode = "replace"
+    if not reader.at_end():
+        mode = reader.word()
+        if mode not in ("replace", "masked"):
+            raise CommandSyntaxError(f"unsupported clone mode {mode}")
+        if not reader.at_end() and reader.word() != "normal":
+            raise CommandSyntaxError("only normal clones are supported")
+    reader.end()
+
+    def clone(ctx: Context):
+        world = ctx.world
+        (x0, y0, z0), (x1, y1, z1) = begin(ctx), end(ctx)
+        lx, ly, lz = min(x0, x1), min(y0, y1), min(z0, z1)
+        hx, hy, hz = max(x0, x1), max(y0, y1), max(z0, z1)
+        if (hx - lx + 1) * (hy - ly + 1) * (hz - lz + 1) > VOLUME_LIMIT:
+            raise CommandError("too many blocks in the specified area")
+        dx, dy, dz = destination(ctx)
+        copied = []
+        for x in range(lx, hx + 1):
+            for y in range(ly, hy + 1):
+                for z in range(lz, hz + 1):
+                    block = world.blocks.get((x, y, z))
+                    if block is None and mode == "masked":
+                        continue
+                    copied.append(((x - lx + dx, y - ly + dy, z - lz + dz), block))
+        for pos, block in copied:
+            if block is None:
+                world.blocks.pop(pos, None)
+            else:
+                world.blocks[pos] = block.copy()
+        if not copied:
+            raise CommandError("no blocks were cloned")
+        return len(copied)
+    return clone
+
+
+def compile_fill(reader: Reader) -> Compiled:
+    begin = block_position(reader)
+    end = block_position(reader)
+    state, nbt = reader.block()
+    if not reader.at_end() and reader.word() != "replace":
+        raise CommandSyntaxError("only replacing fills are supported")
+    reader.end()
+
+    def fill(ctx: Context):
+        (x0, y0, z0), (x1, y1, z1) = begin(ctx), end(ctx)
+        xs = range(min(x0, x1), max(x0, x1) + 1)
+        ys = range(min(y0, y1), max(y0, y1) + 1)
+        zs = range(min(z0, z1), max(z0, z1) + 1)
+        if len(xs) * len(ys) * len(zs) > VOLUME_LIMIT:
+            raise CommandError("too many blocks in the specified area")
+        filled = sum(ctx.world.set_block((x, y, z), state, nbt) for x in xs for y in ys for z in zs)
+        if filled == 0:
+            raise CommandError("no blocks were filled")
+        return filled
+    return fill
+
+
+def compile_setblock(reader: Reader) -> Compiled:
+    pos = block_position(reader)
+    state, nbt = reader.block()
+    reader.end()
+
+    def setblock(ctx: Context):
+        if not ctx.world.set_block(pos(ctx), state, nbt):
+            raise CommandError("could not set the block")
+        return 1
+    return setblock
+
+
+def compile_tp(reader: Reader) -> Compiled:
+    targets = selector(reader)
+    destination = position(reader, centre=True)
+    reader.end()
+
+    def tp(ctx: Context):
+        entities = targets(ctx)
+        if not entities:
+            raise CommandError("no entity was found")
+        x, y, z = destination(ctx)
+        for e in entities:
+            e.nbt["Pos"] = [x, y, z]
+        return len(entities)
+    return tp
+
+
+def compile_data_target(reader: Reader) -> Callable[[Context], list[dict]]:
+    match reader.word():
+        case "block":
+            pos = block_position(reader)
+
+            def block(ctx: Context):
+                found = ctx.world.blocks.get(pos(ctx))
+                if found is None or found.nbt is None:
+                    raise CommandError("the target block is not a block entity")
+                return [found.nbt]
+            return block
+        case "entity":
+            entities = selector(reader)
+
+            def entity(ctx: Context):
+                found = entities(ctx)
+                if not found:
+                    raise CommandError("no entity was found")
+                return [e.nbt for e in found[:1]]
+            return entity
+        case kind:
+            raise CommandSyntaxError(f"unsupported data target {kind}")
+
+
+def compile_data(reader: Reader) -> Compiled:
+    action = reader.word()
+    target = compile_data_target(reader)
+    match action:
+        case "get":
+            path = None if reader.at_end() else parse_path(reader.word())
+            scale = 1.0 if reader.at_end() else float(reader.word())
+            reader.end()
+
+            def get(ctx: Context):
+                (nbt,) = target(ctx)
+                return nbt_to_int(nbt if path is None else get_path(nbt, path), scale)
+            return get
+        case "modify":
+            path = parse_path(reader.word())
+            if reader.word() != "set" or reader.word() != "value":
+                raise CommandSyntaxError("only `data modify ... set value` is supported")
+            value = reader.snbt()
+            reader.end()
+
+            def modify(ctx: Context):
+                for nbt in target(ctx):
+                    set_path(nbt, path, copy.deepcopy(value))
+                return 1
+            return modify
+        case "merge":
+            value = reader.snbt()
+            reader.end()
+
+            def merge(ctx: Context):
+                for nbt in target(ctx):
+                    nbt.update(copy.deepcopy(value))
+                return 1
+            return merge
+        case _:
+            raise CommandSyntaxError(f"unsupported command data {action}")
+
+
+def compile_summon(reader: Reader) -> Compiled:
+    entity_id = reader.word()
+    pos = (lambda ctx: ctx.pos) if reader.at_end() else position(reader, centre=True)
+    nbt = {} if reader.at_end() else reader.snbt()
+    reader.end()
+
+    def summon(ctx: Context):
+        ctx.world.entities.append(Entity(entity_id, pos(ctx), copy.deepcopy(nbt)))
+        return 1
+    return summon
+
+
+def compile_kill(reader: Reader) -> Compiled:
+    targets = selector(reader)
+    reader.end()
+
+    def kill(ctx: Context):
+        entities = targets(ctx)
+        if not entities:
+            raise CommandError("no entity was found")
+        for e in entities:
+            ctx.world.entities.remove(e)
+        return len(entities)
+    return kill
+
+
+def compile_say(reader: Reader) -> Compiled:
+    message = reader.rest()
+
+    def say(ctx: Context):
+        ctx.world.messages.append(message)
+        return 1
+    return say
+
+
+def compile_time(reader: Reader) -> Compiled:
+    if reader.word() != "query" or reader.word() != "gametime":
+        raise CommandSyntaxError("only time query gametime is supported")
+    reader.end()
+
+    def time(ctx: Context):
+        return ctx.world.time % 0x7fffffff
+    return time
+
+
+def run_function(ctx: Context, name: str) -> int:
+    """
+    runs the commands of a function in order, from the source of the command that runs it.
+    as in game, a command failing does not stop the rest of the function.
+    :param ctx: the source of the function
+    :param name: the name of the function, e.g. `computer:main/primary`
+    :return: the number of commands run
+    """
+    try:
+        function = ctx.world.functions[name]
+    except KeyError:
+        raise CommandError(f"unknown function {name}") from None
+    stats = ctx.stats
+    for text, origin in zip(function.commands, function.origins):
+        if stats is not None:
+            stats.commands += 1
+            origin = origin or name
+            stats.origins[origin] = stats.origins.get(origin, 0) + 1
+        try:
+            compile_command(text)(ctx)
+        except TestFailed:
+            pass
+        except (CommandError, CommandSyntaxError) as e:
+            if stats is not None:
+                stats.fail(str(e))
+    return len(function.commands)
+
+
+def compile_function(reader: Reader) -> Compiled:
+    name = reader.word()
+    if ":" not in name:
+        name = "minecraft:" + name
+    reader.end()
+
+    def function(ctx: Context):
+        return run_function(ctx, name)
+    return function
+
+
+COMMANDS: dict[str, Callable[[Reader], Compiled]] = {
+    "scoreboard": compile_scoreboard,
+    "execute": compile_execute,
+    "clone": compile_clone,
+    "fill": compile_fill,
+    "setblock": compile_setblock,
+    "tp": compile_tp,
+    "teleport": compile_tp,
+    "data": compile_data,
+    "summon": compile_summon,
+    "kill": compile_kill,
+    "say": compile_say,
+    "time": compile_time,
+    "function": compile_function,
+}
+
+
+def compile_reader(reader: Reader) -> Compiled:
+    name = reader.word()
+    try:
+        compiler = COMMANDS[name]
+    except KeyError:
+        raise CommandSyntaxError(f"unknown command {name}") from None
+    return compiler(reader)
+
+
+@lru_cache(maxsize=None)
+def compile_command(text: str) -> Compiled:
+    """
+    compiles a command
+    :param text: the command, without a leading slash
+    :return: the compiled command
+    :raises CommandSyntaxError: if the command is not supported or is malformed
+    """
+    try:
+        return compile_reader(Reader(text.removeprefix("/")))
+    except CommandSyntaxError:
+        raise
+    except ValueError as e:
+        raise CommandSyntaxError(f"{e} in {text!r}") from None
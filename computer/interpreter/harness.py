@@ -0,0 +1,103 @@
+"""
+helpers for running the generated computer in the interpreter
+"""
+
+from typing import Iterable
+
+from computer.codegen.output import BlockBuffer, BlockFile
+from computer.codegen.snbt import Byte
+from computer.computer.layout import MAIN_GROUP_POS, MEM_BASE, MEM_OBJECTIVE
+from computer.interpreter.interpreter import Interpreter
+from computer.interpreter.world import World
+
+# the chains of the main group, as laid out by `generate_computer.computer`
+INIT_POS = MAIN_GROUP_POS.x, MAIN_GROUP_POS.y, MAIN_GROUP_POS.z
+PRIMARY_POS = MAIN_GROUP_POS.x, MAIN_GROUP_POS.y, MAIN_GROUP_POS.z + 1
+# the functions of the main group, as written by `generate_computer.computer_datapack`
+INIT_FUNCTION = "computer:init"
+PRIMARY_FUNCTION = "computer:main/primary"
+
+REGISTER_NAMES = ["cr", "ip", "sp", "bp", "a0", "a1", "a2", "t0", "t1", "s0", "s1", "s2",
+                  "x0", "x1", "x2", "x3", "y0", "y1", "y2", "y3", "LF", "LE", "EQ", "GE", "GT", "NE"]
+
+
+def barrel_position(address: int) -> tuple[int, int, int]:
+    """
+    finds the barrel holding a word of memory, as `memory.move_getter_to_index` does
+    :param address: the address of the word
+    :return: the position of the barrel
+    """
+    return MEM_BASE.x + address % 16, MEM_BASE.y + address // 256, MEM_BASE.z + address // 16 % 16
+
+
+def write_word(world: World, address: int, word: int) -> None:
+    """
+    writes a word to memory, as `memory.memory_store` does, in whichever format the memory was initialized with
+    """
+    if MEM_OBJECTIVE in world.scores:
+        words = world.scores[MEM_OBJECTIVE]
+        words[str(address % len(words))] = word
+        return
+    items = world.blocks[barrel_position(address)].nbt["Items"]
+    if "tag" in items[0]:
+        items[0]["tag"]["w"] = word
+        return
+    items[0]["Count"] = Byte(word // 64 + 1)
+    items[1]["Count"] = Byte(word % 64 + 1)
+
+
+def read_word(world: World, address: int) -> int:
+    """
+    reads a word from memory, as `memory.memory_load` does
+    """
+    if MEM_OBJECTIVE in world.scores:
+        words = world.scores[MEM_OBJECTIVE]
+        return words[str(address % len(words))]
+    items = world.blocks[barrel_position(address)].nbt["Items"]
+    if "tag" in items[0]:
+        return items[0]["tag"]["w"]
+    return (items[0]["Count"] - 1) * 64 + items[1]["Count"] - 1
+
+
+def load_computer(blk: Iterable[str] | BlockBuffer | BlockFile, program: Iterable[int] = ()) -> Interpreter:
+    """
+    places the generated computer into a new world, initializes it and loads a program into memory
+    :param blk: the schematic assembly for the computer, or its blocks
+    :param program: machine code to load at address 0
+    :return: an interpreter that runs the primary chain every tick
+    """
+    # the computer expects its objective to have been created by hand
+    world = World(objectives=["vars"])
+    if isinstance(blk, (BlockBuffer, BlockFile)):
+        world.load_blocks(blk)
+    else:
+        world.load_blk(blk)
+    interpreter = Interpreter(world, clock=[PRIMARY_POS])
+    interpreter.trigger(INIT_POS)
+    for address, word in enumerate(program):
+        write_word(world, address, word)
+    return interpreter
+
+
+def load_computer_datapack(directory: str, program: Iterable[int] = ()) -> Interpreter:
+    """
+    loads the generated datapack into a new world, initializes it and loads a program into memory
+    :param directory: the directory of the datapack
+    :param program: machine code to load at address 0
+    :return: an interpreter that runs the primary function every tick
+    """
+    world = World(objectives=["vars"])
+    world.load_datapack(directory)
+    interpreter = Interpreter(world, tick_functions=[PRIMARY_FUNCTION])
+    interpreter.call(INIT_FUNCTION)
+    for address, word in enumerate(program):
+        write_word(world, address, word)
+    return interpreter
+
+
+def registers(world: World) -> dict[str, int]:
+    """
+    reads the registers of the computer from the scoreboard
+    """
+    scores = world.scores["vars"]
+    return {name: scores.get(name, 0) for name in REGISTER_NAMES}
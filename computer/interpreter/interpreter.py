@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from computer.interpreter.commands import compile_command, Context, CommandSyntaxError, run_function
+from computer.interpreter.world import World, Block, CommandError, TestFailed, block_property
+
+# the default value of the maxCommandChainLength game rule
+MAX_COMMAND_CHAIN_LENGTH = 65536
+
+# where functions run by function tags are run from
+WORLD_SPAWN = (0.0, 0.0, 0.0)
+
+DIRECTIONS = {
+    "east": (1, 0, 0),
+    "west": (-1, 0, 0),
+    "up": (0, 1, 0),
+    "down": (0, -1, 0),
+    "south": (0, 0, 1),
+    "north": (0, 0, -1),
+}
+
+
+@dataclass
+class TickStats:
+    """
+    what happened while running command blocks
+    """
+
+    # command blocks that ran a command
+    commands: int = 0
+    # chain steps taken, including empty and inactive command blocks
+    blocks: int = 0
+    # commands that failed with an error, by error message
+    failures: dict[str, int] = field(default_factory=dict)
+    # commands run by command blocks with a known origin, by origin
+    origins: dict[str, int] = field(default_factory=dict)
+
+    def fail(self, message: str) -> None:
+        self.failures[message] = self.failures.get(message, 0) + 1
+
+
+class Interpreter:
+    """
+    a headless stand-in for the game, running command block chains laid out by `ChainGroup.write_out`.
+
+    each tick, the impulse command blocks at the clock positions are triggered in order, as if by a redstone clock,
+    and the chains of command blocks in front of them run in the same way as in game:
+    chain command blocks only run if they are set to "Always Active",
+    each command block runs at most once per tick,
+    and blocks placed by earlier commands in a chain are picked up by the rest of the chain.
+    """
+
+    def __init__(
+            self,
+            world: World,
+            clock: Iterable[tuple[int, int, int]] = (),
+            max_chain_length=MAX_COMMAND_CHAIN_LENGTH,
+            tick_functions: Iterable[str] = (),
+    ):
+        """
+        :param world: the world to run in
+        :param clock: the positions of the command blocks to trigger each tick
+        :param max_chain_length: the maximum number of chain command blocks run per trigger
+        :param tick_functions: the functions to run each tick, after the command blocks, as the `minecraft:tick` tag does
+        """
+        self.world = world
+        self.clock = list(clock)
+        self.tick_functions = list(tick_functions)
+        self.max_chain_length = max_chain_length
+        self.history: list[TickStats] = []
+
+    def tick(self) -> TickStats:
+        """
+        runs a game tick
+        :return: statistics for the tick
+        """
+        self.world.time += 1
+        stats = TickStats()
+        for pos in self.clock:
+            self.trigger(pos, stats)
+        for name in self.tick_functions:
+            self.call(name, stats)
+        self.history.append(stats)
+        return stats
+
+    def run(self, ticks: int) -> list[TickStats]:
+        """
+        runs several game ticks
+        :param ticks: the number of ticks to run
+        :return: statistics for each tick
+        """
+        return [self.tick() for _ in range(ticks)]
+
+    def trigger(self, pos: tuple[int, int, int], stats: TickStats = None) -> TickStats:
+        """
+        powers the command block at a position, running it and the chain after it
+        :param pos: the position of the command block
+        :param stats: statistics to add to
+        :return: the statistics
+        """
+        if stats is None:
+            stats = TickStats()
+        blocks = self.world.blocks
+        block = blocks.get(pos)
+        if block is None or block.nbt is None or "command_block" not in block.id:
+            return stats
+        self.perform(pos, block, stats)
+        direction = DIRECTIONS[block_property(block.state, "facing") or "north"]
+
+        for _ in range(self.max_chain_length):
+            pos = pos[0] + direction[0], pos[1] + direction[1], pos[2] + direction[2]
+            block = blocks.get(pos)
+            if block is None or block.id != "minecraft:chain_command_block":
+                break
+            stats.blocks += 1
+            # as in the game, the chain stops at a command block that already ran this tick
+            if block.nbt.get("auto") and not self.perform(pos, block, stats):
+                break
+            direction = DIRECTIONS[block_property(block.state, "facing") or "north"]
+        return stats
+
+    def call(self, name: str, stats: TickStats = None) -> TickStats:
+        """
+        runs a function from the world spawn, as function tags do
+        :param name: the name of the function
+        :param stats: statistics to add to
+        :return: the statistics
+        """
+        if stats is None:
+            stats = TickStats()
+        try:
+            run_function(Context(self.world, WORLD_SPAWN, stats=stats), name)
+        except CommandError as e:
+            stats.fail(str(e))
+        return stats
+
+    def perform(self, pos: tuple[int, int, int], block: Block, stats: TickStats) -> bool:
+        """
+        runs the command in a command block
+        :param pos: the position of the command block
+        :param block: the command block
+        :param stats: statistics to add to
+        :return: False if the command block already ran this tick
+        """
+        world = self.world
+        nbt = block.nbt
+        if nbt.get("LastExecution") == world.time:
+            return False
+        text = nbt.get("Command", "")
+        success = 0
+        if text:
+            stats.commands += 1
+            if block.origin is not None:
+                stats.origins[block.origin] = stats.origins.get(block.origin, 0) + 1
+            try:
+                compile_command(text)(Context(world, (pos[0] + 0.5, pos[1] + 0.5, pos[2] + 0.5), stats=stats))
+                success = 1
+            except TestFailed:
+                pass
+            except (CommandError, CommandSyntaxError) as e:
+                stats.fail(str(e))
+        nbt["SuccessCount"] = success
+        nbt["LastExecution"] = world.time
+        return True
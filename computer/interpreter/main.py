@@ -0,0 +1,61 @@
+from argparse import ArgumentParser
+from pathlib import Path
+from time import perf_counter
+
+from computer.codegen.output import read_blocks
+from computer.emulator.main import read_program
+from computer.interpreter.harness import load_computer, load_computer_datapack, registers
+from computer.interpreter.interpreter import Interpreter
+from computer.interpreter.world import World
+
+
+def main():
+    parser = ArgumentParser(prog="interpreter", description="run generated command block chains without a server")
+    parser.add_argument("file", help="schematic assembly, e.g. generated/computer.blk from generate_computer --blk, "
+                                     "blocks in binary form from --blk binary, or a datapack directory")
+    parser.add_argument("--ticks", type=int, default=20, help="the number of ticks to run")
+    parser.add_argument("--program", help="a program to load into the computer's memory")
+    parser.add_argument("--octal", action="store_true", help="read the program as octal machine code")
+    parser.add_argument("--init", type=int, nargs=3, action="append", metavar=("X", "Y", "Z"),
+                        help="a command block to trigger once before running")
+    parser.add_argument("--clock", type=int, nargs=3, action="append", metavar=("X", "Y", "Z"),
+                        help="a command block to trigger every tick")
+    parser.add_argument("--objective", action="append", default=["vars"], help="a scoreboard objective to create")
+    parser.add_argument("--verbose", action="store_true", help="print messages and failures for every tick")
+    args = parser.parse_args()
+
+    if Path(args.file).is_dir():
+        program = [] if args.program is None else read_program(args.program, args.octal)
+        interpreter = load_computer_datapack(args.file, program)
+        computer = True
+    elif args.init is None and args.clock is None:
+        blk = read_blocks(args.file)
+        program = [] if args.program is None else read_program(args.program, args.octal)
+        interpreter = load_computer(blk, program)
+        computer = True
+    else:
+        world = World(objectives=args.objective)
+        world.load_blocks(read_blocks(args.file))
+        interpreter = Interpreter(world, clock=map(tuple, args.clock or []))
+        for pos in args.init or []:
+            interpreter.trigger(tuple(pos))
+        computer = False
+
+    start = perf_counter()
+    for tick in range(args.ticks):
+        stats = interpreter.tick()
+        print(f"tick {tick}: {stats.commands} commands, {stats.blocks} chain blocks, "
+              f"{sum(stats.failures.values())} failed")
+        if args.verbose:
+            for message in interpreter.world.messages:
+                print("    say", message)
+            for message, count in stats.failures.items():
+                print(f"    {count}x {message}")
+        interpreter.world.messages.clear()
+    elapsed = perf_counter() - start
+
+    total = sum(s.commands for s in interpreter.history)
+    print(f"{total} commands in {args.ticks} ticks, {total / max(args.ticks, 1):.1f} per tick "
+          f"({total / elapsed:,.0f} commands/s)" if elapsed > 0 else "")
+    if computer:
+        print(" ".join(f"{name}={value}" for name, value in registers(interpreter.world).items()))
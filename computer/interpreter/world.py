@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import copy
+import math
+import re
+from pathlib import Path
+from typing import Iterable, Optional
+
+from computer.codegen import snbt
+from computer.codegen.output import BlockBuffer, BlockFile
+from computer.codegen.snbt import Byte, Short, Long, Float
+
+# the number of blocks a single fill or clone command may touch
+VOLUME_LIMIT = 32768
+
+COMMAND_BLOCKS = {"minecraft:command_block", "minecraft:chain_command_block", "minecraft:repeating_command_block"}
+CONTAINERS = {"minecraft:barrel", "minecraft:chest", "minecraft:dispenser", "minecraft:dropper", "minecraft:hopper"}
+
+
+class CommandError(Exception):
+    """
+    raised when a command fails at runtime, as the game does with a red error message
+    """
+
+
+class TestFailed(CommandError):
+    """
+    raised when an `execute if` or `execute unless` test fails, which makes the command fail silently
+    """
+
+
+def block_id(state: str) -> str:
+    """
+    strips the block state properties from a block
+    :param state: the block, e.g. `minecraft:chain_command_block[facing=east]`
+    :return: the block id, e.g. `minecraft:chain_command_block`
+    """
+    bracket = state.find("[")
+    return state if bracket == -1 else state[:bracket]
+
+
+def block_property(state: str, name: str) -> Optional[str]:
+    """
+    gets a block state property
+    :param state: the block, e.g. `minecraft:chain_command_block[facing=east]`
+    :param name: the name of the property, e.g. `facing`
+    :return: the value of the property, or None if it is not set
+    """
+    m = re.search(r"[\[,]" + name + r"=([a-z0-9_]+)", state)
+    return m and m[1]
+
+
+class Block:
+    """
+    a block in the world, with its block entity data if it has any
+    """
+    __slots__ = "state", "id", "nbt", "origin"
+
+    def __init__(self, state: str, nbt: Optional[dict] = None, origin: Optional[str] = None):
+        self.state = state
+        self.id = block_id(state)
+        if nbt is None and (self.id in COMMAND_BLOCKS or self.id in CONTAINERS):
+            nbt = {}
+        self.nbt = nbt
+        # where the block was generated from, which is kept by clones so that commands can be attributed to it
+        self.origin = origin
+
+    def copy(self) -> Block:
+        """
+        copies the block as `clone` does
+        :return: the copy
+        """
+        return Block(self.state, copy.deepcopy(self.nbt), self.origin)
+
+
+class Function:
+    """
+    a function of a datapack
+    """
+    __slots__ = "commands", "origins"
+
+    def __init__(self, commands: list[str], origins: Optional[list[Optional[str]]] = None):
+        self.commands = commands
+        # where each command was generated from, as for command blocks
+        self.origins = origins if origins is not None else [None] * len(commands)
+
+
+class Entity:
+    """
+    an entity, identified by its nbt data
+    """
+    __slots__ = "id", "nbt"
+
+    def __init__(self, entity_id: str, pos: tuple[float, float, float], nbt: Optional[dict] = None):
+        self.id = entity_id
+        self.nbt = {"Pos": list(pos), "Tags": []} | (nbt or {})
+
+    @property
+    def pos(self) -> tuple[float, float, float]:
+        x, y, z = self.nbt["Pos"]
+        return float(x), float(y), float(z)
+
+    @property
+    def tags(self) -> list[str]:
+        return self.nbt.get("Tags", [])
+
+
+PATH_PART = re.compile(r"\.?(?:([A-Za-z_][A-Za-z0-9_]*)|\[(-?\d+)])")
+
+
+def parse_path(path: str) -> list[str | int]:
+    """
+    parses an nbt path made up of names and list indices, e.g. `Items[0].Count`
+    :param path: the path to parse
+    :return: the names and indices in the path
+    """
+    parts = []
+    pos = 0
+    while pos < len(path):
+        m = PATH_PART.match(path, pos)
+        if m is None:
+            raise ValueError(f"unsupported nbt path {path!r}")
+        parts.append(m[1] if m[1] is not None else int(m[2]))
+        pos = m.end()
+    return parts
+
+
+def get_path(nbt, path: list[str | int]):
+    """
+    gets the value at an nbt path
+    :param nbt: the nbt to look in
+    :param path: the parsed path
+    :return: the value
+    """
+    for part in path:
+        try:
+            nbt = nbt[part]
+        except (KeyError, IndexError, TypeError):
+            raise CommandError("found no elements matching the path") from None
+    return nbt
+
+
+def set_path(nbt, path: list[str | int], value) -> None:
+    """
+    sets the value at an nbt path, creating compounds along the way
+    :param nbt: the nbt to modify
+    :param path: the parsed path
+    :param value: the value to set
+    """
+    for part, following in zip(path, path[1:]):
+        if isinstance(part, str) and part not in nbt:
+            nbt[part] = [] if isinstance(following, int) else {}
+        nbt = get_path(nbt, [part])
+    try:
+        nbt[path[-1]] = value
+    except (IndexError, TypeError):
+        raise CommandError("found no elements matching the path") from None
+
+
+def nbt_to_int(value, scale: float = 1) -> int:
+    """
+    converts nbt to an integer as `data get` does
+    :param value: the nbt to convert
+    :param scale: the factor to scale numbers by
+    :return: the integer
+    """
+    if isinstance(value, (int, float)):
+        return int(math.floor(value * scale))
+    return len(value)
+
+
+def cast(kind: str, value: float):
+    """
+    converts a number to a typed nbt number, as `execute store` does
+    :param kind: the nbt type, e.g. `byte`
+    :param value: the value to convert
+    :return: the converted value
+    """
+    if kind in ("double", "float"):
+        return float(value) if kind == "double" else Float(value)
+    n = int(value)
+    match kind:
+        case "byte":
+            return Byte(((n + 0x80) & 0xff) - 0x80)
+        case "short":
+            return Short(((n + 0x8000) & 0xffff) - 0x8000)
+        case "long":
+            return Long(n)
+        case _:
+            return ((n + 0x80000000) & 0xffffffff) - 0x80000000
+
+
+class World:
+    """
+    the part of a minecraft world that the generated commands interact with
+    """
+
+    def __init__(self, objectives: Iterable[str] = ()):
+        self.blocks: dict[tuple[int, int, int], Block] = {}
+        self.entities: list[Entity] = []
+        self.scores: dict[str, dict[str, int]] = {name: {} for name in objectives}
+        self.messages: list[str] = []
+        self.time = 0
+        # the functions of loaded datapacks, by name, e.g. `computer:main/primary`
+        self.functions: dict[str, Function] = {}
+
+    def load_blk(self, lines: Iterable[str]) -> None:
+        """
+        places the blocks from schematic assembly into the world
+        :param lines: the lines of schematic assembly
+        """
+        for line in lines:
+            line = line.rstrip("\n")
+            if not line:
+                continue
+            x, y, z, state, *nbt = line.split(" ", 4)
+            self.blocks[int(x), int(y), int(z)] = Block(state, snbt.parse(nbt[0]) if nbt else None)
+
+    def load_blocks(self, blocks: BlockBuffer | BlockFile) -> None:
+        """
+        places blocks into the world, as they were generated or read from a file in binary form
+        :param blocks: the blocks
+        """
+        for x, y, z, state, nbt in zip(blocks.xs, blocks.ys, blocks.zs, blocks.states, blocks.nbts):
+            # each block entity gets nbt of its own, since commands change it
+            self.blocks[x, y, z] = Block(blocks.state_table[state], snbt.parse(blocks.nbt_table[nbt]) if nbt >= 0 else None)
+
+    def load_datapack(self, directory: str | Path) -> None:
+        """
+        loads the functions of a datapack
+        :param directory: the directory of the datapack, containing `pack.mcmeta`
+        """
+        for file in sorted(Path(directory).glob("data/*/functions/**/*.mcfunction")):
+            namespace = file.relative_to(directory).parts[1]
+            path = file.relative_to(Path(directory) / "data" / namespace / "functions").with_suffix("").as_posix()
+            commands = [line for line in file.read_text().splitlines() if line and not line.startswith("#")]
+            self.functions[f"{namespace}:{path}"] = Function(commands)
+
+    def set_block(self, pos: tuple[int, int, int], state: str, nbt: Optional[dict] = None) -> bool:
+        """
+        places a block as commands do, leaving the existing block entity alone if the block state is unchanged
+        :param pos: the position to place at
+        :param state: the block to place
+        :param nbt: the block entity data to give the block
+        :return: whether the block changed
+        """
+        old = self.blocks.get(pos)
+        if old is not None and old.state == state:
+            return False
+        if state in ("minecraft:air", "air"):
+            if old is None:
+                return False
+            del self.blocks[pos]
+        else:
+            self.blocks[pos] = Block(state, copy.deepcopy(nbt))
+        return True
+
+    def selector(self, text: str, executor: Optional[Entity]) -> list[Entity]:
+        """
+        finds the entities matching a target selector
+        :param text: the selector, e.g. `@e[tag=e0,limit=1]`
+        :param executor: the entity executing the command, for `@s`
+        :return: the matching entities
+        """
+        if text == "@s":
+            return [] if executor is None else [executor]
+        if not text.startswith("@e"):
+            return []
+        entities = self.entities
+        limit = None
+        if text.startswith("@e["):
+            for argument in text[3:-1].split(","):
+                key, value = argument.split("=", 1)
+                negated = value.startswith("!")
+                value = value.lstrip("!")
+                match key:
+                    case "tag":
+                        entities = [e for e in entities if (value in e.tags) != negated]
+                    case "type":
+                        entities = [e for e in entities if (block_id(e.id) == value) != negated]
+                    case "limit":
+                        limit = int(value)
+                    case _:
+                        raise ValueError(f"unsupported selector argument {key}")
+        return entities[:limit]
+
+    def score(self, player: str, objective: str) -> Optional[int]:
+        """
+        gets a score, or None if it is not set
+        """
+        return self.objective(objective).get(player)
+
+    def objective(self, name: str) -> dict[str, int]:
+        try:
+            return self.scores[name]
+        except KeyError:
+            raise CommandError(f"unknown scoreboard objective '{name}'") from None
@@ -0,0 +1,3 @@
+"""
+unit tests, run from the root of the repository with `python -m unittest`
+"""
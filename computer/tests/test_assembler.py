@@ -0,0 +1,42 @@
+import unittest
+
+from computer.assembler.decode import WORD_COUNT, decode, disassemble, sign_extend
+from computer.assembler.disassembler import target
+from computer.assembler.listings import encode
+
+
+class AssemblerTest(unittest.TestCase):
+    def test_encode(self):
+        self.assertEqual(encode("add t0 a1"), 0o0131)
+        self.assertEqual(encode("split a0 a1"), 0o1001)
+        self.assertEqual(encode("clr t0"), 0o1643)
+        self.assertEqual(encode("ret"), 0o1760)
+        self.assertEqual(encode("const 5"), 0o4005)
+
+    def test_encode_unknown_operands(self):
+        with self.assertRaises(ValueError):
+            encode("ret a0")
+
+    def test_decode(self):
+        inst, operands = decode(0o0131)
+        self.assertEqual(inst.name, "add")
+        self.assertEqual(list(operands), [3, 1])
+
+    def test_sign_extend(self):
+        self.assertEqual(sign_extend(0o77, 7), 0o77)
+        self.assertEqual(sign_extend(0o177, 7), -1)
+        self.assertEqual(sign_extend(0o100, 7), -64)
+        self.assertEqual(sign_extend(0o4377, 8), -1)
+
+
+class DisassemblerTest(unittest.TestCase):
+    def test_every_word_encodes_back(self):
+        for word in range(WORD_COUNT):
+            line = disassemble(word)
+            self.assertEqual(encode(line), word, f"{word:04o} disassembles to {line!r}")
+
+    def test_jump_targets(self):
+        self.assertEqual(target(0o10, encode("jmp 3")), "  # -> 0014")
+        self.assertEqual(target(0o10, encode("jmp 127")), "  # -> 0010")
+        self.assertEqual(target(0, encode("jmp 64")), "  # -> 7701")
+        self.assertEqual(target(0o10, encode("add t0 a1")), "")
@@ -0,0 +1,70 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from computer.codegen import cache
+from computer.codegen.chain_context import ChainGroup, command
+from computer.codegen.coordinates import Coordinates
+from computer.codegen.output import BlockBuffer
+from computer.codegen.session import BuildSession, Settings
+
+
+def group(*commands: str) -> ChainGroup:
+    result = ChainGroup(name="test")
+    with result.new():
+        for cmd in commands:
+            command(cmd)
+    return result
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(mock.patch.object(cache, "DIRECTORY", self.directory))
+        self.enterContext(BuildSession())
+
+    def write(self, chain_group: ChainGroup, pos=Coordinates(0, 0, 0)) -> tuple[bool, BlockBuffer]:
+        blocks = BlockBuffer()
+        reused = cache.write_group(blocks, chain_group, pos)
+        return reused, blocks
+
+    def test_reuses_blocks(self):
+        reused, blocks = self.write(group("say 1", "say 2"))
+        self.assertFalse(reused)
+        reused, cached = self.write(group("say 1", "say 2"))
+        self.assertTrue(reused)
+        self.assertEqual(cached.content_hash(), blocks.content_hash())
+
+    def test_writes_changed_groups(self):
+        self.write(group("say 1"))
+        self.assertFalse(self.write(group("say 2"))[0])
+        self.assertFalse(self.write(group("say 2"), Coordinates(0, 1, 0))[0])
+        # only the latest version of the group is kept
+        self.assertEqual(len(list(self.directory.glob("test.*.blocks"))), 1)
+
+    def test_rewrites_unreadable_entries(self):
+        self.write(group("say 1"))
+        (entry,) = self.directory.glob("test.*.blocks")
+        entry.write_bytes(b"old")
+        self.assertFalse(self.write(group("say 1"))[0])
+        self.assertTrue(self.write(group("say 1"))[0])
+
+    def test_disabled(self):
+        with BuildSession(settings=Settings(cache=False)):
+            self.assertFalse(self.write(group("say 1"))[0])
+            self.assertFalse(self.write(group("say 1"))[0])
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+    def test_up_to_date(self):
+        dst = self.directory / "out" / "computer.schematic"
+        self.assertFalse(cache.up_to_date(dst, "a"))
+        cache.record(dst, "a")
+        # the file itself must exist as well
+        self.assertFalse(cache.up_to_date(dst, "a"))
+        dst.parent.mkdir()
+        dst.write_bytes(b"")
+        self.assertTrue(cache.up_to_date(dst, "a"))
+        self.assertFalse(cache.up_to_date(dst, "b"))
+        with BuildSession(settings=Settings(cache=False)):
+            self.assertFalse(cache.up_to_date(dst, "a"))
@@ -0,0 +1,80 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from computer.codegen import nbt
+from computer.codegen.coordinates import Coordinates
+from computer.codegen.diff import AIR, FILL_LIMIT, block_map, changes, patch_commands, write_patch
+from computer.codegen.output import BlockBuffer
+
+STONE = ("minecraft:stone", None)
+GLASS = ("minecraft:glass", None)
+
+
+def buffer(blocks: dict[tuple[int, int, int], tuple[str, str | None]]) -> BlockBuffer:
+    result = BlockBuffer()
+    for pos, (block_id, snbt) in blocks.items():
+        result.add(Coordinates(*pos), block_id, snbt)
+    return result
+
+
+class DiffTest(unittest.TestCase):
+    def test_block_map_keeps_the_last_block(self):
+        blocks = BlockBuffer()
+        blocks.add(Coordinates(0, 0, 0), "minecraft:stone")
+        blocks.add(Coordinates(0, 0, 0), "minecraft:chest", "{}")
+        self.assertEqual(block_map(blocks), {(0, 0, 0): ("minecraft:chest", "{}")})
+
+    def test_changes(self):
+        old = {(0, 0, 0): STONE, (1, 0, 0): STONE, (0, 1, 0): STONE}
+        new = {(0, 0, 0): STONE, (1, 0, 0): GLASS, (0, 0, 1): GLASS}
+        self.assertEqual(list(changes(old, new).items()), [
+            ((1, 0, 0), GLASS),
+            ((0, 0, 1), GLASS),
+            ((0, 1, 0), (AIR, None)),
+        ])
+
+    def test_fills_runs(self):
+        changed = {(0, 0, 0): STONE, (1, 0, 0): STONE, (2, 0, 0): STONE, (3, 0, 0): GLASS, (5, 0, 0): GLASS}
+        self.assertEqual(patch_commands({}, changed), [
+            "fill 0 0 0 2 0 0 minecraft:stone",
+            "setblock 3 0 0 minecraft:glass",
+            "setblock 5 0 0 minecraft:glass",
+        ])
+
+    def test_fill_limit(self):
+        changed = {(x, 0, 0): STONE for x in range(FILL_LIMIT + 1)}
+        self.assertEqual(patch_commands({}, changed), [
+            f"fill 0 0 0 {FILL_LIMIT - 1} 0 0 minecraft:stone",
+            f"setblock {FILL_LIMIT} 0 0 minecraft:stone",
+        ])
+
+    def test_replaced_block_entities(self):
+        old = {(0, 0, 0): ("minecraft:command_block", "{Command:'say 1'}")}
+        changed = {
+            (0, 0, 0): ("minecraft:command_block", "{Command:'say 2'}"),
+            (1, 0, 0): ("minecraft:command_block", "{Command:'say 2'}"),
+        }
+        self.assertEqual(patch_commands(old, changed), [
+            f"setblock 0 0 0 {AIR}",
+            "setblock 0 0 0 minecraft:command_block{Command:'say 2'}",
+            "setblock 1 0 0 minecraft:command_block{Command:'say 2'}",
+        ])
+
+    def test_write_patch(self):
+        directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        schematic_path = directory / "schematics" / "patch.schematic"
+        commands_path = directory / "generated" / "patch.mcfunction"
+        old = buffer({(0, 0, 0): STONE, (4, 2, 4): STONE, (5, 2, 4): STONE})
+        new = buffer({(0, 0, 0): STONE, (4, 2, 4): GLASS, (5, 2, 4): STONE, (5, 3, 5): GLASS})
+
+        self.assertEqual(write_patch(old, old, schematic_path, commands_path), 0)
+        self.assertFalse(schematic_path.exists() or commands_path.exists())
+
+        self.assertEqual(write_patch(old, new, schematic_path, commands_path), 2)
+        self.assertEqual(commands_path.read_text(), "setblock 4 2 4 minecraft:glass\nsetblock 5 3 5 minecraft:glass\n")
+        result = nbt.read_gzip(schematic_path)[0]["Schematic"]
+        self.assertEqual(result["Offset"], [4, 2, 4])
+        self.assertEqual((result["Width"], result["Height"], result["Length"]), (2, 2, 2))
+        # the unchanged block of the new build in the box is kept
+        self.assertEqual(set(result["Blocks"]["Palette"]), {"minecraft:glass", "minecraft:stone", AIR})
@@ -0,0 +1,65 @@
+import contextlib
+import io
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from computer.assembler.listings import encode
+from computer.emulator.machine import Machine
+from computer.emulator.main import DEFAULT_STEPS, main, read_program
+from computer.emulator.scoreboard import div, mod, wrap
+
+PROGRAMS = Path(__file__).parent.parent / "assembler" / "tests"
+
+
+class MachineTest(unittest.TestCase):
+    def test_add(self):
+        machine = Machine(read_program(str(PROGRAMS / "add.asm")))
+        machine.gp[:4] = [1, 2, 3, 100]
+        self.assertEqual(machine.run(4), 4)
+        self.assertEqual(machine.gp[:4], [1, 2, 3, 6])
+        self.assertEqual(machine.ip, 4)
+
+    def test_halts_on_jump_to_itself(self):
+        machine = Machine([encode("jmp 127")])
+        self.assertEqual(machine.run(10), 1)
+        self.assertTrue(machine.halted)
+        self.assertEqual(machine.ip, 0)
+
+    def test_split(self):
+        machine = Machine([encode("split a0 a1")])
+        machine.gp[1] = 0o1234567
+        machine.run(1)
+        self.assertEqual(machine.gp[:2], [0o567, 0o1234])
+
+    def test_split_into_the_same_register(self):
+        machine = Machine([encode("split a1 a1")])
+        machine.gp[1] = 0o1234567
+        machine.run(1)
+        self.assertEqual(machine.gp[1], 0o1234)
+
+    def test_stack(self):
+        machine = Machine()
+        machine.push(0o7777 + 2)
+        machine.push(5)
+        self.assertEqual(machine.pop(), 5)
+        self.assertEqual(machine.pop(), 1)
+        self.assertEqual(machine.sp, 4095)
+
+
+class MainTest(unittest.TestCase):
+    def test_stops_a_program_that_never_halts(self):
+        output = io.StringIO()
+        with mock.patch("sys.argv", ["emulator", str(PROGRAMS / "loop.asm")]), contextlib.redirect_stdout(output):
+            main()
+        self.assertTrue(output.getvalue().startswith(f"stopped after {DEFAULT_STEPS} instructions"))
+
+
+class ScoreboardTest(unittest.TestCase):
+    def test_wrap(self):
+        self.assertEqual(wrap(1 << 31), -(1 << 31))
+        self.assertEqual(wrap(-(1 << 31) - 1), (1 << 31) - 1)
+
+    def test_division_rounds_down(self):
+        self.assertEqual(div(-7, 2), -4)
+        self.assertEqual(mod(-7, 2), 1)
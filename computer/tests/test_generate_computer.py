@@ -0,0 +1,152 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from computer.assembler.listings import encode
+from computer.codegen import nbt, schematic
+from computer.codegen.output import BlockBuffer
+from computer.codegen.session import BuildSession, Settings
+from computer.computer.generate_computer import computer, computer_datapack
+from computer.computer.layout import SPAWN_CHUNKS_END
+from computer.emulator.machine import Machine
+from computer.interpreter.harness import load_computer, load_computer_datapack, registers
+from computer.interpreter.interpreter import Interpreter
+
+# instructions of different groups, whose dispatchers are cloned over each other
+PROGRAM = [encode(line) for line in ["add t0 a0", "const 5", "add t0 a1", "const 6", "add t0 a2", "add a1 a1"]]
+# pushes past the end of a small stack cache, then calls a function that pops into registers and returns,
+# running 12 instructions before it halts
+STACK_PROGRAM = [encode(line) for line in [
+    "push a0", "push a1", "push a2", "const 8", "call 0", "pop t0", "pop t1", "jmp 127",
+    "push a0", "pop s1", "ldc s2", "ret",
+]]
+# takes and skips each kind of jump after compares, then counts a1 down to 0 in a loop,
+# running 19 instructions before it halts
+JUMP_PROGRAM = [encode(line) for line in [
+    "cmp a0 a1", "jgt 2", "jle 1", "inc t0", "cmp a2", "jlt 1", "jne 1", "inc t0", "cmp a1 a1", "jeq 1", "inc t0",
+    "const 14", "jgea 0", "inc t0", "const 0", "jnea 0", "dec a1", "cmp a1", "jgt 125", "jmp 127",
+]]
+# the minimum and maximum of registers each way round, running 6 instructions
+MIN_MAX_PROGRAM = [encode(line) for line in [
+    "mov t0 a0", "min t0 a1", "mov t1 a1", "max t1 a2", "min a2 a0", "max a0 a1",
+]]
+# every kind of instruction but the stack's: arithmetic, split, scratch and memory moves, unary operations,
+# and jumps, running 36 instructions before it halts
+BROAD_PROGRAM = [encode(line) for line in [
+    "const 100", "ldc t0", "econst 7", "ldc t1", "split s0 t1", "min t0 t1", "max s0 a2",
+    "sub t0 s0", "mul t0 a1", "div t0 a2", "mod t0 a2", "inc s1", "dec s2", "neg a2", "asl12 a0", "asr12 a0",
+    "mov x0 a1", "mov a1 x0", "mov *t1 a1", "mov s2 *t1", "sconst 255", "ldc s1",
+    "cmp a1 s0", "jge 1", "clr a1", "cmp a2", "jlt 1", "clr a2", "inc s1", "cmp s1", "jle 125",
+    "const 34", "jmpa 0", "clr t1", "jmp 127",
+]]
+# the options to build the computer with for the broad program, and the ticks it takes to halt with them
+CONFIGURATIONS = [
+    ({}, 36),
+    ({"specialise": True}, 36),
+    ({"registers": "fan-out"}, 36),
+    ({"stack_cache": 1, "lazy_flags": True, "icache": 2, "materialize_conditions": True}, 36),
+    ({"steps": 4}, 9),
+]
+GENERAL_PURPOSE = ["a0", "a1", "a2", "t0", "t1", "s0", "s1", "s2"]
+FLAGS = ["LF", "LE", "EQ", "GE", "GT", "NE"]
+
+
+def build(**options) -> BlockBuffer:
+    blocks = BlockBuffer()
+    with BuildSession(settings=Settings(cache=False, **options)):
+        computer(blocks)
+    return blocks
+
+
+class GenerateComputerTest(unittest.TestCase):
+    def run_program(
+            self, interpreter: Interpreter, ticks: int, instructions: int, program: list[int] = PROGRAM,
+    ) -> tuple[dict[str, int], Machine]:
+        """
+        runs a program on the computer, loaded into an interpreter, and on the emulator,
+        checking that they end up with the same registers
+        :return: the registers of the computer, and the emulator
+        """
+        interpreter.world.scores["vars"].update(a0=1, a1=2, a2=3)
+        interpreter.run(ticks)
+        machine = Machine(program)
+        machine.gp[:3] = [1, 2, 3]
+        self.assertEqual(machine.run(instructions), instructions)
+
+        result = registers(interpreter.world)
+        self.assertEqual([result[name] for name in GENERAL_PURPOSE], machine.gp)
+        self.assertEqual(result["ip"], machine.ip)
+        self.assertEqual(result["cr"], machine.cr)
+        self.assertEqual(result["sp"], machine.sp)
+        self.assertEqual([tick.failures for tick in interpreter.history], [{}] * ticks)
+        return result, machine
+
+    def test_one_step(self):
+        self.run_program(load_computer(build(), PROGRAM), 6, 6)
+
+    def test_stack(self):
+        for stack_cache in (0, 1, 2):
+            with self.subTest(stack_cache=stack_cache):
+                blocks = build(stack_cache=stack_cache)
+                _, machine = self.run_program(load_computer(blocks, STACK_PROGRAM), 12, 12, STACK_PROGRAM)
+                self.assertTrue(machine.halted)
+
+    def test_jumps(self):
+        result, machine = self.run_program(load_computer(build(), JUMP_PROGRAM), 19, 19, JUMP_PROGRAM)
+        self.assertTrue(machine.halted)
+        self.assertEqual([result[flag] for flag in FLAGS], [int(flag) for flag in machine.flags])
+
+    def test_jumps_with_lazy_flags(self):
+        result, machine = self.run_program(load_computer(build(lazy_flags=True), JUMP_PROGRAM), 19, 19, JUMP_PROGRAM)
+        self.assertTrue(machine.halted)
+        # the flags are never set, only the operands of the last compare kept
+        self.assertEqual([result[flag] for flag in FLAGS], [0] * len(FLAGS))
+
+    def test_min_max(self):
+        for specialise in (False, True):
+            with self.subTest(specialise=specialise):
+                blocks = build(specialise=specialise)
+                self.run_program(load_computer(blocks, MIN_MAX_PROGRAM), 6, 6, MIN_MAX_PROGRAM)
+
+    def test_broad_program(self):
+        for options, ticks in CONFIGURATIONS:
+            with self.subTest(**options):
+                _, machine = self.run_program(load_computer(build(**options), BROAD_PROGRAM), ticks, 36, BROAD_PROGRAM)
+                self.assertTrue(machine.halted)
+
+    def test_datapack(self):
+        directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        stale = directory / "data" / "computer" / "functions" / "stale.mcfunction"
+        stale.parent.mkdir(parents=True)
+        stale.write_text("say stale\n")
+        with BuildSession(settings=Settings(cache=False, datapack=True)):
+            computer_datapack(str(directory))
+        self.assertFalse(stale.exists())
+        self.run_program(load_computer_datapack(str(directory), BROAD_PROGRAM), 36, 36, BROAD_PROGRAM)
+
+    def test_icache_in_a_datapack(self):
+        directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        with BuildSession(settings=Settings(cache=False, datapack=True, icache=4, steps=3)):
+            computer_datapack(str(directory))
+        self.run_program(load_computer_datapack(str(directory), PROGRAM), 2, 6)
+
+    def test_steps_to_fill_the_spawn_chunks(self):
+        with self.assertLogs("computer.computer.generate_computer", "INFO") as logs:
+            blocks = build(steps=0)
+        # with `steps` 0, each tick runs an instruction for every row that fits in the spawn chunks
+        steps = (SPAWN_CHUNKS_END.z - 1) // 2 + 1
+        self.assertEqual(logs.records[0].getMessage(), f"running {steps} instructions per tick")
+        self.run_program(load_computer(blocks, PROGRAM), 3, 3 * steps)
+
+        directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        schematic.save(blocks, directory / "computer.schematic", "computer")
+        result = nbt.read_gzip(directory / "computer.schematic")[0]["Schematic"]
+        self.assertLessEqual(result["Width"], SPAWN_CHUNKS_END.x + 1)
+        self.assertLessEqual(result["Length"], SPAWN_CHUNKS_END.z + 1)
+        self.assertEqual(len(result["Blocks"]["BlockEntities"]), len({
+            (x, y, z) for x, y, z, entity in zip(blocks.xs, blocks.ys, blocks.zs, blocks.nbts) if entity >= 0
+        }))
+
+    def test_too_many_steps(self):
+        with self.assertRaises(ValueError):
+            build(steps=(SPAWN_CHUNKS_END.z - 1) // 2 + 2)
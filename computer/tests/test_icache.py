@@ -0,0 +1,43 @@
+import unittest
+
+from computer.codegen import datapack
+from computer.codegen.chain_context import ChainContext, init_context
+from computer.codegen.session import BuildSession, Settings
+from computer.codegen.variable import Variable
+from computer.computer import icache
+
+
+class FetchTest(unittest.TestCase):
+    def setUp(self):
+        self.enterContext(BuildSession(settings=Settings(datapack=True, icache=4)))
+        with init_context():
+            icache.initialize_icache()
+            self.address = Variable("address")
+            self.word = Variable("word")
+
+    def test_shares_the_miss_function(self):
+        with ChainContext():
+            icache.fetch(self.address, self.word)
+            icache.fetch(self.address, self.word)
+        self.assertEqual([ctx.name for ctx in datapack.functions()], ["main/primary/icache miss"])
+
+    def test_each_session_has_its_own_miss_function(self):
+        with ChainContext():
+            icache.fetch(self.address, self.word)
+        with BuildSession(settings=Settings(datapack=True, icache=4)):
+            with init_context():
+                icache.initialize_icache()
+                address, word = Variable("address"), Variable("word")
+            with ChainContext():
+                icache.fetch(address, word)
+            self.assertEqual(len(datapack.functions()), 1)
+        self.assertEqual(len(datapack.functions()), 1)
+
+    def test_each_session_has_its_own_lines(self):
+        lines = icache.instruction_cache().lines
+        with BuildSession(settings=Settings(icache=2)):
+            with init_context():
+                icache.initialize_icache()
+            self.assertEqual(len(icache.instruction_cache().lines), 2)
+        self.assertIs(icache.instruction_cache().lines, lines)
+        self.assertEqual(len(lines), 4)
@@ -0,0 +1,121 @@
+import unittest
+
+from computer.codegen.command import Command, DataModify, DataTarget, Fold
+from computer.codegen.coordinates import Coordinates
+from computer.codegen.output import BlockBuffer, chain
+from computer.interpreter.commands import CommandSyntaxError, Context, compile_command
+from computer.interpreter.interpreter import Interpreter
+from computer.interpreter.world import CommandError, Entity, TestFailed, World
+
+# stops the chain at the block after it once `running` is 0, as the gates between the steps of the primary chain do
+HALT_GATE = "execute if score running vars matches 0 run execute store result block ~1 ~ ~ LastExecution long 1 " \
+            "run time query gametime"
+
+
+class CommandsTest(unittest.TestCase):
+    def setUp(self):
+        self.world = World(objectives=["vars"])
+
+    def run_command(self, text: str) -> int:
+        return compile_command(text)(Context(self.world, (0.5, 0.5, 0.5)))
+
+    def score(self, player: str) -> int:
+        return self.world.score(player, "vars")
+
+    def test_scoreboard(self):
+        self.run_command("scoreboard players set x vars 7")
+        self.run_command("scoreboard players remove x vars 2")
+        self.run_command("scoreboard players set y vars -2")
+        self.run_command("scoreboard players operation x vars *= y vars")
+        self.assertEqual(self.score("x"), -10)
+        self.run_command("scoreboard players operation x vars >< y vars")
+        self.assertEqual((self.score("x"), self.score("y")), (-2, -10))
+        self.assertEqual(self.run_command("scoreboard players get y vars"), -10)
+        self.run_command("scoreboard players reset y vars")
+        with self.assertRaises(CommandError):
+            self.run_command("scoreboard players get y vars")
+
+    def test_wraps(self):
+        self.run_command("scoreboard players set x vars 2147483647")
+        self.run_command("scoreboard players add x vars 1")
+        self.assertEqual(self.score("x"), -2147483648)
+
+    def test_division_by_zero(self):
+        self.run_command("scoreboard players set x vars 1")
+        with self.assertRaises(CommandError):
+            self.run_command("scoreboard players operation x vars /= y vars")
+
+    def test_execute(self):
+        self.run_command("scoreboard players set x vars 3")
+        self.run_command("execute if score x vars matches 1..5 run scoreboard players set y vars 1")
+        with self.assertRaises(TestFailed):
+            self.run_command("execute unless score x vars matches 1..5 run scoreboard players set y vars 2")
+        self.assertEqual(self.score("y"), 1)
+        self.run_command("execute store result score z vars run scoreboard players get x vars")
+        self.run_command("execute store success score w vars if score x vars > y vars")
+        self.assertEqual((self.score("z"), self.score("w")), (3, 1))
+        with self.assertRaises(TestFailed):
+            self.run_command("execute if score x vars < y vars")
+
+    def test_blocks(self):
+        self.run_command("setblock 1 2 3 minecraft:stone")
+        self.run_command("execute if block 1 2 3 minecraft:stone run scoreboard players set x vars 1")
+        self.assertEqual(self.score("x"), 1)
+        self.run_command("fill 0 0 0 1 0 0 minecraft:glass")
+        self.assertEqual([self.world.blocks[x, 0, 0].state for x in range(2)], ["minecraft:glass"] * 2)
+
+    def test_data(self):
+        self.world.entities.append(Entity("minecraft:marker", (0.5, 0.5, 0.5), {"Tags": ["ptr"]}))
+        self.run_command(DataModify(DataTarget("entity", "@e[tag=ptr,limit=1]"), "data.x", 5).command)
+        self.assertEqual(self.world.entities[0].nbt["data"], {"x": 5})
+
+    def test_time(self):
+        self.world.time = 12
+        self.assertEqual(self.run_command("time query gametime"), 12)
+        with self.assertRaises(CommandSyntaxError):
+            compile_command("time set day")
+
+    def test_unknown_command(self):
+        with self.assertRaises(CommandSyntaxError):
+            compile_command("gamemode creative")
+
+
+class InterpreterTest(unittest.TestCase):
+    def load(self, commands: list[Command], objectives=("vars",)) -> Interpreter:
+        blocks = BlockBuffer()
+        chain(blocks, Coordinates(0, 0, 0), commands)
+        world = World(objectives=objectives)
+        world.load_blocks(blocks)
+        return Interpreter(world, clock=[(0, 0, 0)])
+
+    def test_runs_chain_every_tick(self):
+        interpreter = self.load([Command("scoreboard players add x vars 1"), Command("scoreboard players add x vars 2")])
+        stats = interpreter.run(2)
+        self.assertEqual(interpreter.world.score("x", "vars"), 6)
+        self.assertEqual([tick.commands for tick in stats], [2, 2])
+
+    def test_counts_failures(self):
+        interpreter = self.load([Command("scoreboard players set x vars 1")], objectives=())
+        self.assertEqual(interpreter.tick().failures, {"unknown scoreboard objective 'vars'": 1})
+
+    def test_stops_at_a_block_that_already_ran(self):
+        interpreter = self.load([
+            Command("scoreboard players add x vars 1"),
+            Command("scoreboard players add x vars 10"),
+            Command("scoreboard players add x vars 100"),
+        ])
+        interpreter.world.blocks[2, 0, 0].nbt["LastExecution"] = 1
+        interpreter.tick()
+        self.assertEqual(interpreter.world.score("x", "vars"), 11)
+        interpreter.tick()
+        self.assertEqual(interpreter.world.score("x", "vars"), 122)
+
+    def test_folded_chain(self):
+        commands = [Command("scoreboard players add x vars 1"), Command(HALT_GATE), Fold()]
+        commands += [Command("scoreboard players add x vars 1"), Command(HALT_GATE), Fold()]
+        commands += [Command("scoreboard players add x vars 1")]
+        for running, expected in (0, 1), (1, 3):
+            interpreter = self.load([Command(f"scoreboard players set running vars {running}")] + commands)
+            stats = interpreter.tick()
+            self.assertEqual(interpreter.world.score("x", "vars"), expected)
+            self.assertEqual(stats.failures, {})
@@ -0,0 +1,58 @@
+import unittest
+
+from computer.codegen import nbt
+from computer.codegen.snbt import Byte, ByteArray, Float, IntArray, Long, LongArray, Short, parse
+
+
+class NbtTest(unittest.TestCase):
+    def test_round_trip(self):
+        value = {
+            "byte": Byte(-3),
+            "short": Short(1000),
+            "int": 1 << 20,
+            "long": Long(-1 << 40),
+            "float": Float(0.5),
+            "double": 0.25,
+            "bytes": b"\x00\xff",
+            "string": "command",
+            "list": [{"a": 1}, {"b": 2}],
+            "empty": [],
+            "compound": {"nested": {}},
+            "ints": IntArray([1, -2, 3]),
+            "longs": LongArray([Long(1 << 33)]),
+        }
+        loaded, name = nbt.loads(nbt.dumps(value, "root"))
+        self.assertEqual(name, "root")
+        self.assertEqual(loaded, value)
+        self.assertEqual(
+            {key: type(item) for key, item in loaded.items()},
+            {key: type(item) for key, item in value.items()},
+        )
+
+    def test_byte_array_lists(self):
+        loaded, _ = nbt.loads(nbt.dumps({"bytes": ByteArray([1, -1])}))
+        self.assertEqual(loaded["bytes"], b"\x01\xff")
+
+    def test_snbt_values(self):
+        value = parse('{Command:"say hi",auto:1b,Pos:[I;1,2,3]}')
+        self.assertEqual(nbt.loads(nbt.dumps(value))[0], value)
+
+    def test_modified_utf8(self):
+        self.assertEqual(nbt.string("a\0b"), b"\x00\x04a\xc0\x80b")
+        # characters outside the basic multilingual plane are written as a surrogate pair, of three bytes each
+        self.assertEqual(len(nbt.string("\U0001f600")), 2 + 6)
+        for text in "a\0b", "\U0001f600", "é€":
+            self.assertEqual(nbt.read_string(nbt.string(text), 0), (text, len(nbt.string(text))))
+
+    def test_header(self):
+        self.assertEqual(nbt.dumps({}, "a"), b"\x0a\x00\x01a\x00")
+
+    def test_unwritable_values(self):
+        with self.assertRaises(ValueError):
+            nbt.dumps({"none": None})
+
+    def test_bad_root(self):
+        with self.assertRaises(ValueError):
+            nbt.loads(b"\x08\x00\x00\x00\x00")
+        with self.assertRaises(ValueError):
+            nbt.loads(nbt.dumps({}) + b"\x00")
@@ -0,0 +1,110 @@
+import unittest
+
+from computer.codegen.command import Command, Constant, Say, Score, ScoreAdd, ScoreGet, ScoreOperation, ScoreSet
+from computer.codegen.optimize import Chain, eliminate_dead_stores, merge_additions, optimize, propagate_constants, \
+    simplify
+from computer.codegen.session import BuildSession, Settings
+
+X = Score("x", "vars")
+Y = Score("y", "vars")
+
+
+def constant(value: int) -> Score:
+    return Constant(value, "vars")
+
+
+def run_pass(optimization_pass, commands: list[Command]) -> list[str]:
+    chain = Chain(commands)
+    optimization_pass(chain)
+    chain.compact()
+    return [cmd.command for cmd in chain.commands]
+
+
+class SimplifyTest(unittest.TestCase):
+    def test_removes_adding_zero(self):
+        self.assertEqual(run_pass(simplify, [ScoreAdd(X, 0), Say("hi")]), ["say hi"])
+
+    def test_removes_copy_to_itself(self):
+        self.assertEqual(run_pass(simplify, [ScoreOperation(X, "=", X)]), [])
+
+    def test_uses_literals_for_constants(self):
+        self.assertEqual(
+            run_pass(simplify, [ScoreOperation(X, "=", constant(5)), ScoreOperation(Y, "-=", constant(3))]),
+            ["scoreboard players set x vars 5", "scoreboard players remove y vars 3"],
+        )
+
+    def test_keeps_scores_named_like_numbers(self):
+        # a word of memory on the scoreboard is named after its address, not its value
+        word = Score("5", "mem")
+        self.assertEqual(
+            run_pass(simplify, [ScoreOperation(X, "=", word)]), ["scoreboard players operation x vars = 5 mem"]
+        )
+
+
+class PropagateConstantsTest(unittest.TestCase):
+    def test_folds_arithmetic(self):
+        self.assertEqual(
+            run_pass(propagate_constants, [ScoreSet(X, 6), ScoreOperation(X, "*=", constant(7)), ScoreGet(X)]),
+            ["scoreboard players set x vars 6", "scoreboard players set x vars 42", "scoreboard players get x vars"],
+        )
+
+    def test_removes_setting_the_same_value(self):
+        self.assertEqual(
+            run_pass(propagate_constants, [ScoreSet(X, 1), ScoreGet(X), ScoreSet(X, 1)]),
+            ["scoreboard players set x vars 1", "scoreboard players get x vars"],
+        )
+
+    def test_leaves_division_by_zero(self):
+        commands = [ScoreSet(X, 1), ScoreSet(Y, 0), ScoreOperation(X, "/=", Y)]
+        self.assertEqual(run_pass(propagate_constants, commands)[-1], "scoreboard players operation x vars /= y vars")
+
+    def test_forgets_values_at_a_barrier(self):
+        commands = [ScoreSet(X, 1), Command("function computer:other"), ScoreSet(X, 1)]
+        self.assertEqual(len(run_pass(propagate_constants, commands)), 3)
+
+
+class MergeAdditionsTest(unittest.TestCase):
+    def test_merges(self):
+        self.assertEqual(
+            run_pass(merge_additions, [ScoreAdd(X, 2), ScoreAdd(Y, 1), ScoreAdd(X, -5)]),
+            ["scoreboard players remove x vars 3", "scoreboard players add y vars 1"],
+        )
+
+    def test_keeps_additions_around_a_read(self):
+        commands = [ScoreAdd(X, 2), ScoreGet(X), ScoreAdd(X, 1)]
+        self.assertEqual(len(run_pass(merge_additions, commands)), 3)
+
+
+class EliminateDeadStoresTest(unittest.TestCase):
+    def test_removes_overwritten_stores(self):
+        self.assertEqual(
+            run_pass(eliminate_dead_stores, [ScoreSet(X, 1), ScoreAdd(X, 1), ScoreOperation(X, "=", Y)]),
+            ["scoreboard players operation x vars = y vars"],
+        )
+
+    def test_keeps_stores_that_are_read(self):
+        commands = [ScoreSet(X, 1), ScoreOperation(Y, "=", X), ScoreSet(X, 2)]
+        self.assertEqual(len(run_pass(eliminate_dead_stores, commands)), 3)
+
+    def test_keeps_stores_before_a_barrier(self):
+        commands = [ScoreSet(X, 1), Command("function computer:other"), ScoreSet(X, 2)]
+        self.assertEqual(len(run_pass(eliminate_dead_stores, commands)), 3)
+
+
+class OptimizeTest(unittest.TestCase):
+    def test_runs_passes_to_a_fixed_point(self):
+        commands = [ScoreSet(X, 1), ScoreAdd(X, 2), ScoreOperation(Y, "=", X), ScoreAdd(Y, 0)]
+        self.assertEqual(
+            [cmd.command for cmd in optimize(commands)],
+            ["scoreboard players set x vars 3", "scoreboard players set y vars 3"],
+        )
+
+    def test_keeps_origin(self):
+        cmd = ScoreOperation(X, "=", constant(5))
+        cmd.origin = "handler"
+        self.assertEqual(optimize([cmd])[0].origin, "handler")
+
+    def test_disabled(self):
+        commands = [ScoreSet(X, 1), ScoreSet(X, 1)]
+        with BuildSession(settings=Settings(optimize=False)):
+            self.assertEqual(optimize(commands), commands)
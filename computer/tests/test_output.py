@@ -0,0 +1,137 @@
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+from computer.codegen.command import Command, Fold
+from computer.codegen.coordinates import Coordinates
+from computer.codegen.output import BlockBuffer, BlockFile, chain, chain_positions, read_blocks
+
+
+def sample() -> BlockBuffer:
+    blocks = BlockBuffer()
+    blocks.add(Coordinates(0, 0, 0), "minecraft:stone")
+    blocks.add(Coordinates(1, 2, 3), "minecraft:command_block[facing=east]", '{Command:"say é",auto:1b}')
+    blocks.add(Coordinates(-1, 0, 5), "minecraft:stone")
+    blocks.add(Coordinates(4, 0, 0), "minecraft:chest", "{}")
+    return blocks
+
+
+def block_list(blocks) -> list:
+    nbt_table = [None] + list(blocks.nbt_table)
+    return [
+        (x, y, z, blocks.state_table[state], nbt_table[nbt + 1])
+        for x, y, z, state, nbt in zip(blocks.xs, blocks.ys, blocks.zs, blocks.states, blocks.nbts)
+    ]
+
+
+class BlockBufferTest(unittest.TestCase):
+    def test_tables_hold_each_entry_once(self):
+        blocks = sample()
+        self.assertEqual(blocks.state_table, [
+            "minecraft:stone", "minecraft:command_block[facing=east]", "minecraft:chest",
+        ])
+        self.assertEqual(list(blocks.nbts), [-1, 0, -1, 1])
+        self.assertEqual(blocks.nbt_value(0), {"Command": "say é", "auto": 1})
+
+    def test_write_blk(self):
+        out = io.StringIO()
+        sample().write_blk(out)
+        self.assertEqual(
+            out.getvalue().splitlines()[1], '1 2 3 minecraft:command_block[facing=east] {Command:"say é",auto:1b}',
+        )
+        blocks = BlockBuffer()
+        blocks.add_assembly(out.getvalue())
+        self.assertEqual(block_list(blocks), block_list(sample()))
+
+    def test_extend(self):
+        blocks = BlockBuffer()
+        blocks.add(Coordinates(9, 9, 9), "minecraft:chest", "{}")
+        blocks.extend(sample())
+        self.assertEqual(block_list(blocks)[1:], block_list(sample()))
+
+    def test_content_hash(self):
+        self.assertEqual(sample().content_hash(), sample().content_hash())
+        blocks = sample()
+        blocks.add(Coordinates(0, 0, 0), "minecraft:stone")
+        self.assertNotEqual(blocks.content_hash(), sample().content_hash())
+
+
+class BlockFileTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+
+    def test_round_trip(self):
+        blocks = BlockFile(sample().to_bytes())
+        self.assertEqual(len(blocks), 4)
+        self.assertEqual(block_list(blocks), block_list(sample()))
+        self.assertEqual(blocks.nbt_value(0), {"Command": "say é", "auto": 1})
+        self.assertEqual(block_list(BlockBuffer.from_bytes(sample().to_bytes())), block_list(sample()))
+
+    def test_read_blocks(self):
+        binary = self.directory / "blocks.bin"
+        binary.write_bytes(sample().to_bytes())
+        with read_blocks(binary) as blocks:
+            self.assertIsInstance(blocks, BlockFile)
+            self.assertEqual(block_list(blocks), block_list(sample()))
+
+        text = self.directory / "blocks.blk"
+        with open(text, "w") as file:
+            sample().write_blk(file)
+        self.assertEqual(block_list(read_blocks(text)), block_list(sample()))
+
+    def test_truncated(self):
+        data = sample().to_bytes()
+        for length in 3, 20, len(data) - 1:
+            with self.assertRaises(ValueError):
+                BlockFile(data[:length])
+
+    def test_other_version(self):
+        with self.assertRaises(ValueError):
+            BlockFile(b"BLK\x01" + sample().to_bytes()[4:])
+
+
+class ChainTest(unittest.TestCase):
+    def test_positions(self):
+        commands = [Command("say 1"), Command("say 2"), Fold(), Command("say 3")]
+        self.assertEqual(chain_positions(Coordinates(0, 1, 2), commands), [
+            Coordinates(0, 1, 2), Coordinates(1, 1, 2), None, Coordinates(0, 1, 4),
+        ])
+
+    def test_chain(self):
+        blocks = BlockBuffer()
+        chain(blocks, Coordinates(0, 0, 0), [Command("say 1"), Command("say 2")], "minecraft:repeating_command_block")
+        self.assertEqual(block_list(blocks), [
+            (0, 0, 0, "minecraft:repeating_command_block[facing=east]", "{Command:'say 1'}"),
+            (1, 0, 0, "minecraft:chain_command_block[facing=east]", "{Command:'say 2',auto:1b}"),
+        ])
+
+    def test_only_chain(self):
+        blocks = BlockBuffer()
+        chain(blocks, Coordinates(0, 0, 0), [Command("say 1")], only_chain=True)
+        self.assertEqual(block_list(blocks)[0][3], "minecraft:chain_command_block[facing=east]")
+        with self.assertRaises(ValueError):
+            chain(blocks, Coordinates(0, 0, 0), [])
+
+    def test_fold(self):
+        commands = [Command("say 1"), Command("say 2"), Fold(), Command("say 3")]
+        blocks = BlockBuffer()
+        chain(blocks, Coordinates(0, 0, 0), commands)
+        layout = {(x, z): (block_id, snbt) for x, _, z, block_id, snbt in block_list(blocks)}
+        turn = "{Command:'',auto:1b}"
+        self.assertEqual(layout, {
+            (0, 0): ("minecraft:command_block[facing=east]", "{Command:'say 1'}"),
+            (1, 0): ("minecraft:chain_command_block[facing=east]", "{Command:'say 2',auto:1b}"),
+            (2, 0): ("minecraft:chain_command_block[facing=south]", turn),
+            (2, 1): ("minecraft:chain_command_block[facing=west]", turn),
+            (1, 1): ("minecraft:chain_command_block[facing=west]", turn),
+            (0, 1): ("minecraft:chain_command_block[facing=south]", turn),
+            (0, 2): ("minecraft:chain_command_block[facing=east]", "{Command:'say 3',auto:1b}"),
+        })
+        # each position holds one block
+        self.assertEqual(len(blocks), len(layout))
+
+    def test_text(self):
+        out = io.StringIO()
+        chain(out, Coordinates(1, 2, 3), [Command("say 1")])
+        self.assertEqual(out.getvalue(), "1 2 3 minecraft:command_block[facing=east] {Command:'say 1'}\n")
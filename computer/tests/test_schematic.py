@@ -0,0 +1,92 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from computer.codegen import nbt, schematic
+from computer.codegen.coordinates import Coordinates
+from computer.codegen.output import BlockBuffer, command_block
+
+
+def read_varints(data: bytes) -> list[int]:
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            values.append(value)
+            value = shift = 0
+    return values
+
+
+def read_schematic(path: Path) -> tuple[dict, dict[tuple[int, int, int], str]]:
+    """
+    reads a schematic back, with its block at each position
+    """
+    root, _ = nbt.read_gzip(path)
+    result = root["Schematic"]
+    width, height, length = (result[key] & 0xffff for key in ("Width", "Height", "Length"))
+    states = {index: block_id for block_id, index in result["Blocks"]["Palette"].items()}
+    cells = read_varints(result["Blocks"]["Data"])
+    assert len(cells) == width * height * length
+    blocks = {
+        (x, y, z): states[cells[x + z * width + y * width * length]]
+        for x in range(width) for y in range(height) for z in range(length)
+    }
+    return result, blocks
+
+
+class SchematicTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+
+    def test_read_back(self):
+        blocks = BlockBuffer()
+        blocks.add(Coordinates(0, 0, 0), "minecraft:stone")
+        blocks.add(Coordinates(2, 1, 3), "minecraft:glass")
+        command_block(blocks, Coordinates(1, 0, 2), "say hi", auto=True)
+        blocks.add(Coordinates(0, 0, 0), "minecraft:dirt")
+        path = self.directory / "test.schematic"
+        schematic.save(blocks, path, "test", Coordinates(5, 6, 7))
+
+        result, cells = read_schematic(path)
+        self.assertEqual((result["Width"], result["Height"], result["Length"]), (3, 2, 4))
+        self.assertEqual((result["Version"], result["DataVersion"]), (schematic.VERSION, schematic.DATA_VERSION))
+        self.assertEqual(result["Metadata"]["Name"], "test")
+        self.assertEqual(result["Offset"], [5, 6, 7])
+        self.assertEqual(cells.pop((0, 0, 0)), "minecraft:dirt")
+        self.assertEqual(cells.pop((2, 1, 3)), "minecraft:glass")
+        self.assertEqual(cells.pop((1, 0, 2)), "minecraft:command_block")
+        self.assertEqual(set(cells.values()), {schematic.AIR})
+        self.assertEqual(result["Blocks"]["BlockEntities"], [
+            {"Pos": [1, 0, 2], "Id": "minecraft:command_block", "Data": {"Command": "say hi", "auto": 1}},
+        ])
+
+    def test_block_entity_id_has_no_block_state(self):
+        blocks = BlockBuffer()
+        command_block(blocks, Coordinates(0, 0, 0), "say hi", "minecraft:chain_command_block[facing=east]")
+        entities = schematic.to_nbt(blocks)["Schematic"]["Blocks"]["BlockEntities"]
+        self.assertEqual(entities[0]["Id"], "minecraft:chain_command_block")
+
+    def test_empty(self):
+        result = schematic.to_nbt(BlockBuffer())["Schematic"]
+        self.assertEqual((result["Width"], result["Height"], result["Length"]), (0, 0, 0))
+        self.assertNotIn("BlockEntities", result["Blocks"])
+        self.assertNotIn("Offset", result)
+
+    def test_negative_coordinates(self):
+        blocks = BlockBuffer()
+        blocks.add(Coordinates(0, -1, 0), "minecraft:stone")
+        with self.assertRaises(ValueError):
+            schematic.to_nbt(blocks)
+
+    def test_varint(self):
+        self.assertEqual(schematic.varint(1), b"\x01")
+        self.assertEqual(schematic.varint(300), b"\xac\x02")
+        self.assertEqual(read_varints(b"".join(map(schematic.varint, [0, 127, 128, 1 << 20]))), [0, 127, 128, 1 << 20])
+
+    def test_unsigned_short(self):
+        self.assertEqual(schematic.unsigned_short(40000), -25536)
+        self.assertEqual(schematic.unsigned_short(0x7fff), 0x7fff)
+        with self.assertRaises(ValueError):
+            schematic.unsigned_short(0x10000)
@@ -0,0 +1,62 @@
+import unittest
+
+from computer.codegen.chain_context import ChainContext
+from computer.codegen.command import Command, Score, ScoreOperation, ScoreSet, Temporary
+from computer.codegen.session import BuildSession
+from computer.codegen.variable import allocate_temporaries
+
+X = Score("x", "vars")
+
+
+class AllocateTemporariesTest(unittest.TestCase):
+    def setUp(self):
+        self.enterContext(BuildSession())
+        self.ctx = ChainContext()
+
+    def temporary(self, name: str, home=None) -> Temporary:
+        return Temporary(name, "vars", self.ctx if home is None else home)
+
+    def allocate(self, *commands: Command) -> None:
+        self.ctx.contents = list(commands)
+        allocate_temporaries(self.ctx)
+
+    def test_shares_names_when_not_live_at_once(self):
+        a, b = self.temporary("a"), self.temporary("b")
+        self.allocate(ScoreSet(a, 1), ScoreOperation(X, "+=", a), ScoreSet(b, 2), ScoreOperation(X, "+=", b))
+        self.assertEqual((a.player, b.player), ("tmp0", "tmp0"))
+        self.assertFalse(a.pinned or b.pinned)
+
+    def test_overlapping_temporaries_get_different_names(self):
+        a, b = self.temporary("a"), self.temporary("b")
+        self.allocate(ScoreSet(a, 1), ScoreSet(b, 2), ScoreOperation(a, "+=", b), ScoreOperation(X, "=", a))
+        self.assertEqual((a.player, b.player), ("tmp0", "tmp1"))
+
+    def test_pool_is_shared_between_chains(self):
+        a = self.temporary("a")
+        self.allocate(ScoreSet(a, 1), ScoreOperation(X, "=", a))
+        self.ctx = ChainContext()
+        b = self.temporary("b")
+        self.allocate(ScoreSet(b, 1), ScoreOperation(X, "=", b))
+        self.assertEqual(b.player, "tmp0")
+
+    def test_named_temporaries_are_left_alone(self):
+        a = self.temporary("a")
+        self.allocate(ScoreSet(a, 1), ScoreOperation(X, "=", a))
+        self.allocate(ScoreSet(a, 1), ScoreOperation(X, "=", a))
+        self.assertEqual(a.player, "tmp0")
+
+    def test_pins_temporaries_live_across_a_barrier(self):
+        a = self.temporary("a")
+        self.allocate(ScoreSet(a, 1), Command("function computer:other"), ScoreOperation(X, "=", a))
+        self.assertTrue(a.pinned)
+        self.assertEqual(a.player, "a")
+
+    def test_pins_temporaries_read_before_they_are_set(self):
+        a = self.temporary("a")
+        self.allocate(ScoreOperation(X, "=", a), ScoreSet(a, 1))
+        self.assertTrue(a.pinned)
+
+    def test_pins_temporaries_of_other_contexts(self):
+        a, b = self.temporary("a", ChainContext()), self.temporary("a")
+        self.allocate(ScoreSet(a, 1), ScoreOperation(X, "=", a), ScoreSet(b, 1), ScoreOperation(X, "=", b))
+        self.assertEqual((a.player, b.player), ("a", "tmp0"))